@@ -8,42 +8,158 @@ containing stigmatizing language.
 # Import from core for backward compatibility
 from .core import (
     initialize,
+    warmup,
     classify_if_drug,
     classify_if_stigma,
+    classify_drug_and_stigma,
     analyze_text_llm,
     rewrite_to_destigma,
     get_emotion,
-    analyze_and_rewrite_text
+    analyze_and_rewrite_text,
+    classify_if_drug_many,
+    classify_if_stigma_many,
+    analyze_and_rewrite_many,
+    aclassify_if_drug,
+    aclassify_if_stigma,
+    aanalyze_text_llm,
+    arewrite_to_destigma,
+    aanalyze_and_rewrite_text,
+    aanalyze_and_rewrite_many
 )
 
 # Import main classes for direct access
 from .clients import LLMClient, OpenAIClient, TogetherClient, ClaudeClient, get_client
-from .classifiers import BaseClassifier, DrugClassifier, StigmaClassifier
+from .clients import (
+    AsyncLLMClient, AsyncOpenAIClient, AsyncTogetherClient, AsyncClaudeClient, get_async_client,
+    get_last_usage, get_last_confidence, request_confidence, LLMClientError
+)
+from .classifiers import BaseClassifier, DrugClassifier, StigmaClassifier, CombinedClassifier
 from .analyzers import TextAnalyzer, StyleAnalyzer, EmotionAnalyzer, LLMBasedAnalyzer
 from .rewriters import TextRewriter, DestigmatizingRewriter
-from .utils import get_model_mapping, get_default_model, determine_client_type, load_user_model_configs
+from .prefilter import LexiconPrefilter, DEFAULT_DRUG_LEXICON
+from .cache import CachedClient, CompletionCache, prompt_fingerprint
+from .pipeline import Pipeline
+from .cascade import CascadeClassifier, CascadePolicy
+from .packing import PackedClassifier
+from .dedup import Deduplicator, normalize_text
+from .frame import destigmatize_frame, destigmatize_file, read_frame, write_frame
+from .batch_jobs import (
+    BatchJobRunner, BatchJobError, BatchRequest, BatchBackend, OpenAIBatchBackend,
+    AnthropicBatchBackend, LocalBatchBackend, run_batch_job
+)
+from .recording import RecordingClient, ReplayClient, ReplayMissError
+from .retry import (
+    RetryPolicy, RetryBudget, DEFAULT_RETRY_POLICY, DEFAULT_RETRY_BUDGET, is_retryable
+)
+from .concurrency import AIMDController, AdaptiveConcurrencyClient, is_overload_error
+from .ratelimit import RateLimitedClient, RateLimiter, TokenBucket, get_rate_limiter, reset_rate_limiters
+from .instrumentation import Instrumentation, StageEvent, MetricsAggregator, Histogram, STAGES
+from .batch import BatchResult, run_batch, run_async_batch
+from .utils import (
+    get_model_mapping, get_default_model, determine_client_type, load_user_model_configs, reload_config,
+    get_generation_settings, DEFAULT_STAGE_SETTINGS
+)
 
 __all__ = [
     # Core functions (backward compatibility)
     'initialize',
+    'warmup',
     'classify_if_drug',
     'classify_if_stigma',
+    'classify_drug_and_stigma',
     'analyze_text_llm',
     'rewrite_to_destigma',
     'get_emotion',
     'analyze_and_rewrite_text',
     
+    # Reusable pipeline
+    'Pipeline',
+    
+    # Batch functions
+    'classify_if_drug_many',
+    'classify_if_stigma_many',
+    'analyze_and_rewrite_many',
+    'BatchResult',
+    'run_batch',
+    'run_async_batch',
+    
+    # Async functions
+    'aclassify_if_drug',
+    'aclassify_if_stigma',
+    'aanalyze_text_llm',
+    'arewrite_to_destigma',
+    'aanalyze_and_rewrite_text',
+    'aanalyze_and_rewrite_many',
+    
     # Client classes
     'LLMClient',
     'OpenAIClient',
     'TogetherClient',
     'ClaudeClient',
     'get_client',
+    'AsyncLLMClient',
+    'AsyncOpenAIClient',
+    'AsyncTogetherClient',
+    'AsyncClaudeClient',
+    'get_async_client',
+    'get_last_usage',
+    'get_last_confidence',
+    'request_confidence',
+    'LLMClientError',
+    'CachedClient',
+    'CompletionCache',
+    'prompt_fingerprint',
+    'RecordingClient',
+    'ReplayClient',
+    'ReplayMissError',
+    'RateLimitedClient',
+    'RateLimiter',
+    'TokenBucket',
+    'get_rate_limiter',
+    'reset_rate_limiters',
+    'RetryPolicy',
+    'RetryBudget',
+    'DEFAULT_RETRY_POLICY',
+    'DEFAULT_RETRY_BUDGET',
+    'is_retryable',
+    'AIMDController',
+    'AdaptiveConcurrencyClient',
+    'is_overload_error',
+    'FakeProviderServer',
+    'BatchJobRunner',
+    'BatchJobError',
+    'BatchRequest',
+    'BatchBackend',
+    'OpenAIBatchBackend',
+    'AnthropicBatchBackend',
+    'LocalBatchBackend',
+    'run_batch_job',
+    'Deduplicator',
+    'normalize_text',
+    'destigmatize_frame',
+    'destigmatize_file',
+    'read_frame',
+    'write_frame',
     
     # Classifier classes
     'BaseClassifier',
     'DrugClassifier',
     'StigmaClassifier',
+    'CombinedClassifier',
+    'CascadeClassifier',
+    'CascadePolicy',
+    'PackedClassifier',
+    
+    # Instrumentation
+    'Instrumentation',
+    'StageEvent',
+    'MetricsAggregator',
+    'Histogram',
+    'STAGES',
+    
+    # Prefilter
+    'LexiconPrefilter',
+    'DEFAULT_DRUG_LEXICON',
     
     # Analyzer classes
     'TextAnalyzer',
@@ -57,5 +173,17 @@ __all__ = [
     
     'get_model_mapping',
     'get_default_model',
-    'load_user_model_configs'
-]
\ No newline at end of file
+    'load_user_model_configs',
+    'reload_config',
+    'get_generation_settings',
+    'DEFAULT_STAGE_SETTINGS'
+]
+
+
+def __getattr__(name):
+    # The stand-in server pulls in http.server, so it is only imported when
+    # first used, e.g. by tests and the benchmark
+    if name == "FakeProviderServer":
+        from .fake_server import FakeProviderServer
+        return FakeProviderServer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,24 +1,93 @@
 """Text analyzers for style and emotion detection."""
 
-import nltk
-from typing import Dict, Any, Optional
-from nltk.tokenize import sent_tokenize, word_tokenize
-from nltk import pos_tag
+import asyncio
+import itertools
+import threading
+import multiprocessing
+from collections import Counter
+from typing import Dict, Any, Iterable, Iterator, List, Optional
 import string
-try:
-    from lexicalrichness import LexicalRichness
-except ImportError:
-    print("Warning: lexicalrichness package not installed. Some text analysis features will be limited.")
-    # Provide a simple fallback if the package is not available
-    class LexicalRichness:
-        def __init__(self, text):
-            self.text = text
-        def mtld(self, threshold=0.72):
-            words = self.text.split()
-            return len(set(words)) / max(1, len(words))  # Simple type-token ratio
 
 from abc import ABC, abstractmethod
+from .batch import run_in_background
 from .clients import LLMClient
+from .instrumentation import stage
+from .utils import get_generation_settings, generation_kwargs
+
+
+# NLTK resources needed by StyleAnalyzer. Each entry lists alternative
+# resource names, newest first, since NLTK renamed them in 3.8.2.
+NLTK_RESOURCES = [
+    [("tokenizers/punkt_tab", "punkt_tab"), ("tokenizers/punkt", "punkt")],
+    [("taggers/averaged_perceptron_tagger_eng", "averaged_perceptron_tagger_eng"),
+     ("taggers/averaged_perceptron_tagger", "averaged_perceptron_tagger")],
+]
+
+_nltk_lock = threading.Lock()
+_nltk_ready = False
+_lexical_richness_cls = None
+
+
+def ensure_nltk_resources() -> None:
+    """Locate (downloading if needed) the NLTK resources used for style analysis.
+    
+    The lookup runs once per process; later calls return immediately.
+    """
+    global _nltk_ready
+    if _nltk_ready:
+        return
+    with _nltk_lock:
+        if _nltk_ready:
+            return
+        import nltk
+        for alternatives in NLTK_RESOURCES:
+            if _find_nltk_resource(nltk, alternatives):
+                continue
+            # Download if needed
+            for _, package in alternatives:
+                nltk.download(package)
+                if _find_nltk_resource(nltk, alternatives):
+                    break
+        _nltk_ready = True
+
+
+def _find_nltk_resource(nltk: Any, alternatives: List[tuple]) -> bool:
+    """Return True if any of the alternative resource names is installed."""
+    for path, _ in alternatives:
+        try:
+            nltk.data.find(path)
+            return True
+        except LookupError:
+            continue
+    return False
+
+
+def get_lexical_richness() -> Any:
+    """Return the LexicalRichness class, importing it on first use."""
+    global _lexical_richness_cls
+    if _lexical_richness_cls is None:
+        try:
+            from lexicalrichness import LexicalRichness
+        except ImportError:
+            print("Warning: lexicalrichness package not installed. Some text analysis features will be limited.")
+            # Provide a simple fallback if the package is not available
+            class LexicalRichness:
+                def __init__(self, text):
+                    self.text = text
+                def mtld(self, threshold=0.72):
+                    words = self.text.split()
+                    return len(set(words)) / max(1, len(words))  # Simple type-token ratio
+        _lexical_richness_cls = LexicalRichness
+    return _lexical_richness_cls
+
+
+def warmup_style_analysis() -> None:
+    """Load the NLTK tokenizer, tagger and lexical richness models ahead of time."""
+    ensure_nltk_resources()
+    from nltk import pos_tag_sents
+    from nltk.tokenize import sent_tokenize, word_tokenize
+    pos_tag_sents([word_tokenize(sent_tokenize("Warm up the models.")[0])])
+    get_lexical_richness()
 
 
 class TextAnalyzer(ABC):
@@ -37,6 +106,52 @@ class TextAnalyzer(ABC):
         pass
 
 
+PASSIVE_AUXILIARIES = frozenset(["was", "were"])
+
+
+def style_features(text: str, sentences: List[str],
+                   tagged_sentences: List[List[tuple]]) -> Dict[str, Any]:
+    """Compute style features from a text and its pre-tagged sentences.
+    
+    Args:
+        text: Original text
+        sentences: Sentences of the text
+        tagged_sentences: POS-tagged tokens for each sentence
+        
+    Returns:
+        dict: Style analysis results
+    """
+    # Punctuation analysis, counting every character in a single pass
+    char_counts = Counter(text)
+    common_punctuation = ', '.join([p for p in string.punctuation if p in char_counts])
+
+    # Active vs. Passive Voice: a form of "to be" followed by a past participle
+    passive_sentences = 0
+    for tagged in tagged_sentences:
+        for (word, _), (_, next_tag) in zip(tagged, tagged[1:]):
+            if next_tag == 'VBN' and word.lower() in PASSIVE_AUXILIARIES:
+                passive_sentences += 1
+                break
+    passive_voice_usage = "none" if passive_sentences == 0 else "some"
+
+    # Sentence length variability
+    sentence_lengths = [len(s.split()) for s in sentences]
+    min_length = min(sentence_lengths) if sentence_lengths else 0
+    max_length = max(sentence_lengths) if sentence_lengths else 0
+    average_length = sum(sentence_lengths) / len(sentence_lengths) if sentence_lengths else 0
+
+    # Lexical diversity
+    lex = get_lexical_richness()(text)
+    lex_value = lex.mtld(threshold=0.72)
+
+    return {
+        "punctuation_usage": f"moderate, with {common_punctuation} being most frequent",
+        "passive_voice_usage": passive_voice_usage,
+        "sentence_length_variation": f"ranging from short ({min_length} words) to long ({max_length} words) with an average of {average_length:.1f} words per sentence",
+        "lexical_diversity": f"{lex_value:.2f} (MTLD)"
+    }
+
+
 class StyleAnalyzer(TextAnalyzer):
     """Analyzer for text style features."""
     
@@ -49,57 +164,106 @@ class StyleAnalyzer(TextAnalyzer):
         Returns:
             dict: Style analysis results
         """
-        # Download required NLTK resources if needed
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt')
+        return self.analyze_many([text])[0]
+
+    def analyze_many(self, texts: Iterable[str]) -> List[Dict[str, Any]]:
+        """Analyze stylistic features of many texts in one batch.
         
-        try:
-            nltk.data.find('taggers/averaged_perceptron_tagger')
-        except LookupError:
-            nltk.download('averaged_perceptron_tagger')
+        Every sentence of every text is POS-tagged in a single
+        pos_tag_sents() call.
+        
+        Args:
+            texts: Texts to analyze
             
+        Returns:
+            list: Style analysis results, in input order
+        """
+        ensure_nltk_resources()
+        from nltk import pos_tag_sents
+        from nltk.tokenize import sent_tokenize, word_tokenize
+
+        texts = list(texts)
+        
         # Tokenize sentences and words
-        sentences = sent_tokenize(text)
-        
-        # Punctuation analysis
-        punctuation_counts = {key: text.count(key) for key in string.punctuation}
-        common_punctuation = ', '.join([p for p, count in punctuation_counts.items() if count > 0])
-
-        # Active vs. Passive Voice
-        def is_passive(sentence):
-            tagged = pos_tag(word_tokenize(sentence))
-            passive = False
-            for i in range(len(tagged) - 1):
-                if tagged[i][1] in ['was', 'were'] and tagged[i+1][1] == 'VBN':
-                    passive = True
-            return passive
-
-        passive_sentences = sum(is_passive(sentence) for sentence in sentences)
-        passive_voice_usage = "none" if passive_sentences == 0 else "some"
-
-        # Sentence length variability
-        sentence_lengths = [len(s.split()) for s in sentences]
-        min_length = min(sentence_lengths) if sentence_lengths else 0
-        max_length = max(sentence_lengths) if sentence_lengths else 0
-        average_length = sum(sentence_lengths) / len(sentence_lengths) if sentence_lengths else 0
-
-        # Lexical diversity
-        lex = LexicalRichness(text)
-        lex_value = lex.mtld(threshold=0.72)
+        sentences_per_text = [sent_tokenize(text) for text in texts]
+        tagged = pos_tag_sents([word_tokenize(sentence)
+                                for sentences in sentences_per_text
+                                for sentence in sentences])
+
+        results = []
+        offset = 0
+        for text, sentences in zip(texts, sentences_per_text):
+            tagged_sentences = tagged[offset:offset + len(sentences)]
+            offset += len(sentences)
+            results.append(style_features(text, sentences, tagged_sentences))
+        return results
+
+    @staticmethod
+    def analyze_corpus(texts: Iterable[str], processes: Optional[int] = None,
+                       chunksize: int = 256) -> Iterator[Dict[str, Any]]:
+        """Analyze a large corpus across a pool of worker processes.
+        
+        Texts are sent to workers in chunks, each tagged in one batch by
+        analyze_many(). Results are yielded in input order as soon as each
+        chunk finishes, so the whole corpus never has to fit in memory.
+        Every worker loads the NLTK models once when it starts.
+        
+        Args:
+            texts: Texts to analyze
+            processes: Number of worker processes, defaults to the CPU count;
+                1 analyzes in the current process
+            chunksize: Number of texts sent to a worker per task
+            
+        Yields:
+            dict: Style analysis results, in input order
+        """
+        if chunksize < 1:
+            raise ValueError("chunksize must be at least 1")
+        
+        chunks = _chunked(texts, chunksize)
+        if processes == 1:
+            for chunk in chunks:
+                yield from _analyze_style_chunk(chunk)
+            return
+        
+        with multiprocessing.Pool(processes=processes,
+                                  initializer=_init_style_worker) as pool:
+            for chunk_results in pool.imap(_analyze_style_chunk, chunks):
+                yield from chunk_results
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yield successive lists of at most size items."""
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _init_style_worker() -> None:
+    """Preload NLTK models in a worker process."""
+    try:
+        warmup_style_analysis()
+    except Exception as e:
+        # Errors are raised again, per task, by the analysis itself
+        print(f"Warning: could not preload style analysis models: {e}")
 
-        return {
-            "punctuation_usage": f"moderate, with {common_punctuation} being most frequent",
-            "passive_voice_usage": passive_voice_usage,
-            "sentence_length_variation": f"ranging from short ({min_length} words) to long ({max_length} words) with an average of {average_length:.1f} words per sentence",
-            "lexical_diversity": f"{lex_value:.2f} (MTLD)"
-        }
+
+def _analyze_style_chunk(texts: List[str]) -> List[Dict[str, Any]]:
+    """Analyze a chunk of texts in a worker process."""
+    return StyleAnalyzer().analyze_many(texts)
 
 
 class EmotionAnalyzer(TextAnalyzer):
     """Analyzer for detecting emotions in text."""
     
+    prompt = """
+        Please play the role of an emotion recognition expert. Please provide the most likely emotion that the following text conveys.
+        Only one emotion should be provided.
+        """
+    
     def __init__(self, client: Any):
         """Initialize with an LLM client.
         
@@ -107,6 +271,7 @@ class EmotionAnalyzer(TextAnalyzer):
             client: LLM client instance
         """
         self.client = client
+        self.generation = get_generation_settings("emotion")
         
     def analyze(self, text: str, model: Optional[str] = None) -> Dict[str, Any]:
         """Detect emotions in the provided text.
@@ -118,18 +283,10 @@ class EmotionAnalyzer(TextAnalyzer):
         Returns:
             dict: Emotion analysis results
         """
-        prompt = """
-        Please play the role of an emotion recognition expert. Please provide the most likely emotion that the following text conveys.
-        Only one emotion should be provided.
-        """
-        
         try:
             result = self.client.create_completion(
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": text}
-                ],
-                model=model
+                messages=self.build_messages(text),
+                **generation_kwargs(self.generation, model, self.client)
             )
             emotion = result.lower().strip()
             
@@ -140,6 +297,40 @@ class EmotionAnalyzer(TextAnalyzer):
             print(f"Error detecting emotion: {e}")
             return {"primary_emotion": "unknown"}
 
+    def build_messages(self, text: str) -> List[Dict[str, str]]:
+        """Build the messages for an emotion request.
+        
+        Args:
+            text: Text to analyze
+            
+        Returns:
+            list: Messages to send to the LLM
+        """
+        return [
+            {"role": "system", "content": self.prompt},
+            {"role": "user", "content": text}
+        ]
+
+    async def aanalyze(self, text: str, model: Optional[str] = None) -> Dict[str, Any]:
+        """Detect emotions in the provided text using an async client.
+        
+        Args:
+            text: Text to analyze
+            model: Model to use for analysis
+            
+        Returns:
+            dict: Emotion analysis results
+        """
+        try:
+            result = await self.client.acreate_completion(
+                messages=self.build_messages(text),
+                **generation_kwargs(self.generation, model, self.client)
+            )
+            return {"primary_emotion": result.lower().strip()}
+        except Exception as e:
+            print(f"Error detecting emotion: {e}")
+            return {"primary_emotion": "unknown"}
+
 
 class LLMBasedAnalyzer(TextAnalyzer):
     """Text analyzer that uses LLM for more advanced analysis."""
@@ -159,6 +350,9 @@ class LLMBasedAnalyzer(TextAnalyzer):
     def analyze(self, text: str, model: Optional[str] = None) -> Dict[str, Any]:
         """Perform comprehensive text analysis using multiple methods.
         
+        Style and emotion analysis do not depend on each other and run
+        concurrently.
+        
         Args:
             text: Text to analyze
             model: Model to use for LLM analysis
@@ -166,11 +360,14 @@ class LLMBasedAnalyzer(TextAnalyzer):
         Returns:
             dict: Combined analysis results
         """
-        # Get style analysis
-        style_results = self.style_analyzer.analyze(text)
+        # Style analysis is local CPU work, so it runs on a stage thread
+        # while this thread waits for the emotion request
+        style_future = run_in_background(self._style, text)
         
         # Get emotion analysis
-        emotion_results = self.emotion_analyzer.analyze(text, model=model)
+        with stage("emotion"):
+            emotion_results = self.emotion_analyzer.analyze(text, model=model)
+        style_results = style_future.result()
         
         # Combine results
         combined_results = {
@@ -179,3 +376,37 @@ class LLMBasedAnalyzer(TextAnalyzer):
         }
         
         return combined_results
+
+    def _style(self, text: str) -> Dict[str, Any]:
+        with stage("style"):
+            return self.style_analyzer.analyze(text)
+
+    async def aanalyze(self, text: str, model: Optional[str] = None) -> Dict[str, Any]:
+        """Perform comprehensive text analysis using an async client.
+        
+        Style analysis is CPU-bound, so it runs in the default executor while
+        the emotion request is awaited.
+        
+        Args:
+            text: Text to analyze
+            model: Model to use for LLM analysis
+            
+        Returns:
+            dict: Combined analysis results
+        """
+        loop = asyncio.get_running_loop()
+        
+        async def _style() -> Dict[str, Any]:
+            with stage("style"):
+                return await loop.run_in_executor(None, self.style_analyzer.analyze, text)
+        
+        async def _emotion() -> Dict[str, Any]:
+            with stage("emotion"):
+                return await self.emotion_analyzer.aanalyze(text, model=model)
+        
+        style_results, emotion_results = await asyncio.gather(_style(), _emotion())
+        
+        return {
+            **style_results,
+            "top_emotions": emotion_results["primary_emotion"]
+        }
@@ -0,0 +1,141 @@
+"""Helpers for running pipeline calls over many texts concurrently."""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class BatchResult:
+    """Outcome of a single item in a batch call."""
+
+    __slots__ = ("index", "input", "value", "error")
+
+    def __init__(self, index: int, input: Any, value: Any = None,
+                 error: Optional[BaseException] = None):
+        """Initialize a batch result.
+
+        Args:
+            index: Position of the item in the input
+            input: The item that was processed
+            value: Result of the call, None if it failed
+            error: Exception raised by the call, None if it succeeded
+        """
+        self.index = index
+        self.input = input
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """Return True if the call succeeded."""
+        return self.error is None
+
+    def __repr__(self) -> str:
+        if self.ok:
+            return f"BatchResult(index={self.index}, value={self.value!r})"
+        return f"BatchResult(index={self.index}, error={self.error!r})"
+
+
+def run_batch(func: Callable[[Any], Any], items: Iterable[Any],
+              max_workers: int = DEFAULT_MAX_WORKERS) -> List[BatchResult]:
+    """Apply a function to every item using a bounded thread pool.
+
+    Failures are recorded on the corresponding result instead of being
+    raised, so one bad item does not abort the rest of the batch.
+
+    Args:
+        func: Callable taking a single item
+        items: Iterable of items to process
+        max_workers: Maximum number of calls in flight at once
+
+    Returns:
+        list: One BatchResult per item, in input order
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+
+    items = list(items)
+    results = [BatchResult(i, item) for i, item in enumerate(items)]
+
+    def _call(result: BatchResult) -> None:
+        try:
+            result.value = func(result.input)
+        except Exception as e:
+            result.error = e
+
+    if max_workers == 1 or len(items) <= 1:
+        for result in results:
+            _call(result)
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        # Consume the iterator so every call has finished before returning
+        list(executor.map(_call, results))
+
+    return results
+
+
+async def run_async_batch(func: Callable[[Any], Awaitable[Any]], items: Iterable[Any],
+                          max_concurrency: int = DEFAULT_MAX_WORKERS) -> List[BatchResult]:
+    """Await a coroutine function for every item with bounded concurrency.
+
+    Args:
+        func: Coroutine function taking a single item
+        items: Iterable of items to process
+        max_concurrency: Maximum number of coroutines in flight at once
+
+    Returns:
+        list: One BatchResult per item, in input order
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results = [BatchResult(i, item) for i, item in enumerate(items)]
+
+    async def _call(result: BatchResult) -> None:
+        async with semaphore:
+            try:
+                result.value = await func(result.input)
+            except Exception as e:
+                result.error = e
+
+    await asyncio.gather(*(_call(result) for result in results))
+    return results
+
+
+_stage_executor: Optional[ThreadPoolExecutor] = None
+_stage_executor_lock = threading.Lock()
+
+# Threads shared by every stage running alongside its caller's thread
+STAGE_THREADS = 32
+
+
+def run_in_background(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    """Start a call on the shared stage thread pool and return its future.
+
+    The call runs in a copy of the caller's context, so it reports to the
+    caller's active instrumentation. Calls on the pool never wait for one
+    another, so a saturated pool only delays them.
+
+    Args:
+        func: Callable to run
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        Future: Future of the call's result
+    """
+    global _stage_executor
+    if _stage_executor is None:
+        with _stage_executor_lock:
+            if _stage_executor is None:
+                _stage_executor = ThreadPoolExecutor(max_workers=STAGE_THREADS,
+                                                     thread_name_prefix="destigmatizer-stage")
+    context = contextvars.copy_context()
+    return _stage_executor.submit(context.run, func, *args, **kwargs)
@@ -0,0 +1,499 @@
+"""Offline batch-job mode using the OpenAI Batch and Anthropic Message Batches APIs.
+
+Provider batch APIs trade interactive latency (results arrive within
+hours) for lower prices and separate, higher rate limits, which suits
+nightly backfills. BatchJobRunner runs the same stages as
+analyze_and_rewrite_text(), one provider batch per stage: drug results
+gate the stigma batch, and stigma results gate the emotion and rewrite
+batches.
+"""
+
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .analyzers import StyleAnalyzer, EmotionAnalyzer
+from .batch import BatchResult, run_batch, DEFAULT_MAX_WORKERS
+from .classifiers import DrugClassifier, StigmaClassifier
+from .clients import (LLMClient, AsyncLLMClient, detect_client_type, _openai_params,
+                      _claude_params, _to_claude_messages)
+from .dedup import Deduplicator, expand_results
+from .pipeline import Pipeline, split_stigma_result
+from .rewriters import DestigmatizingRewriter
+from .utils import get_model_mapping, generation_kwargs
+
+
+class BatchJobError(Exception):
+    """Raised when a provider batch job fails, expires or times out."""
+
+
+class BatchRequest:
+    """A single completion request in a batch job."""
+
+    __slots__ = ("custom_id", "messages", "model", "temperature", "max_tokens", "stop")
+
+    def __init__(self, custom_id: str, messages: List[Dict[str, str]], model: Optional[str],
+                 temperature: float = 0, max_tokens: int = 1000,
+                 stop: Optional[List[str]] = None):
+        """Initialize a request.
+
+        Args:
+            custom_id: Identifier used to match the result to the request
+            messages: List of message dictionaries
+            model: Provider-specific model name
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
+        """
+        self.custom_id = custom_id
+        self.messages = messages
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.stop = stop
+
+
+def _provider_sdk(client: Any) -> Optional[Any]:
+    """Return the provider SDK client behind an LLM client.
+
+    Wrappers such as CachedClient and RateLimitedClient are unwrapped
+    through their client attribute until a provider client (e.g.
+    OpenAIClient) yields its SDK client. Anything that is not an LLM
+    client is taken to be an SDK client already.
+
+    Args:
+        client: LLM client, possibly wrapped, or provider SDK client
+
+    Returns:
+        The SDK client, or None if the client has none (e.g. ReplayClient)
+    """
+    while isinstance(client, (LLMClient, AsyncLLMClient)):
+        client = getattr(client, "client", None)
+    return client
+
+
+class BatchBackend(ABC):
+    """Submits batches of requests to a provider and collects the results."""
+
+    # Most requests the provider accepts in one batch
+    max_requests = 50000
+
+    def __init__(self, client: Any):
+        """Initialize the backend.
+
+        Args:
+            client: LLM client (or provider SDK client) the batches are sent with
+        """
+        self.client = client
+
+    @property
+    def sdk(self) -> Any:
+        """Return the provider SDK client behind the LLM client, see _provider_sdk()."""
+        sdk = _provider_sdk(self.client)
+        if sdk is None:
+            raise BatchJobError(f"{type(self.client).__name__} has no provider SDK client "
+                                f"to submit batches with")
+        return sdk
+
+    @abstractmethod
+    def submit(self, requests: Sequence[BatchRequest]) -> str:
+        """Submit a batch and return its job ID."""
+        pass
+
+    @abstractmethod
+    def status(self, job_id: str) -> str:
+        """Return "in_progress", "completed" or "failed" for a job."""
+        pass
+
+    @abstractmethod
+    def results(self, job_id: str) -> Dict[str, Optional[str]]:
+        """Return the response content of each request of a completed job.
+
+        Returns:
+            dict: Maps custom_id to the response content, None for failed requests
+        """
+        pass
+
+    def run(self, requests: Sequence[BatchRequest], poll_interval: float = 30.0,
+            timeout: Optional[float] = None) -> Dict[str, Optional[str]]:
+        """Submit requests, wait for every job to finish and collect the results.
+
+        Requests beyond max_requests are split across several jobs, all
+        submitted before polling starts.
+
+        Args:
+            requests: Requests to run
+            poll_interval: Seconds between status checks
+            timeout: Seconds to wait before giving up, None to wait indefinitely
+
+        Returns:
+            dict: Maps custom_id to the response content, None for failed
+                requests or requests missing from the results
+
+        Raises:
+            BatchJobError: If a job fails or the timeout is reached
+        """
+        requests = list(requests)
+        if not requests:
+            return {}
+        pending = [self.submit(requests[start:start + self.max_requests])
+                   for start in range(0, len(requests), self.max_requests)]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        results: Dict[str, Optional[str]] = {}
+        while pending:
+            for job_id in list(pending):
+                state = self.status(job_id)
+                if state == "completed":
+                    results.update(self.results(job_id))
+                    pending.remove(job_id)
+                elif state == "failed":
+                    raise BatchJobError(f"Batch job {job_id} failed")
+            if not pending:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise BatchJobError(f"Timed out waiting for batch jobs {', '.join(pending)}")
+            time.sleep(poll_interval)
+        return {request.custom_id: results.get(request.custom_id) for request in requests}
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """Backend for the OpenAI Batch API (Files upload plus /v1/batches)."""
+
+    def __init__(self, client: Any, completion_window: str = "24h"):
+        """Initialize the backend.
+
+        Args:
+            client: OpenAIClient or openai.OpenAI instance
+            completion_window: Time frame the batch must complete within
+        """
+        super().__init__(client)
+        self.completion_window = completion_window
+
+    def submit(self, requests: Sequence[BatchRequest]) -> str:
+        lines = []
+        for request in requests:
+            body = {"model": request.model, "messages": request.messages,
+                    **_openai_params(request.temperature, request.max_tokens, request.stop)}
+            lines.append(json.dumps({"custom_id": request.custom_id, "method": "POST",
+                                     "url": "/v1/chat/completions", "body": body}))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        uploaded = self.sdk.files.create(file=("destigmatizer_batch.jsonl", data), purpose="batch")
+        batch = self.sdk.batches.create(input_file_id=uploaded.id,
+                                        endpoint="/v1/chat/completions",
+                                        completion_window=self.completion_window)
+        return batch.id
+
+    def status(self, job_id: str) -> str:
+        batch = self.sdk.batches.retrieve(job_id)
+        if batch.status == "completed":
+            return "completed"
+        if batch.status in ("expired", "cancelled"):
+            # Requests finished before expiry are still in the output file
+            return "completed" if batch.output_file_id else "failed"
+        if batch.status == "failed":
+            return "failed"
+        return "in_progress"
+
+    def results(self, job_id: str) -> Dict[str, Optional[str]]:
+        batch = self.sdk.batches.retrieve(job_id)
+        results: Dict[str, Optional[str]] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.sdk.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                content = None
+                if response.get("status_code") == 200:
+                    try:
+                        content = response["body"]["choices"][0]["message"]["content"]
+                    except (KeyError, IndexError, TypeError):
+                        content = None
+                results[entry["custom_id"]] = content
+        return results
+
+
+class AnthropicBatchBackend(BatchBackend):
+    """Backend for the Anthropic Message Batches API."""
+
+    max_requests = 100000
+
+    def __init__(self, client: Any, prompt_caching: Optional[bool] = None):
+        """Initialize the backend.
+
+        Args:
+            client: ClaudeClient or anthropic.Anthropic instance
+            prompt_caching: Mark the static prompt prefix for Anthropic's
+                prompt cache, defaults to the ClaudeClient's setting
+        """
+        super().__init__(client)
+        if prompt_caching is None:
+            prompt_caching = getattr(client, "prompt_caching", False)
+        self.prompt_caching = prompt_caching
+
+    def submit(self, requests: Sequence[BatchRequest]) -> str:
+        entries = []
+        for request in requests:
+            system, messages = _to_claude_messages(request.messages, self.prompt_caching)
+            params = {"model": request.model, "messages": messages,
+                      **_claude_params(request.temperature, request.max_tokens, request.stop)}
+            if system is not None:
+                params["system"] = system
+            entries.append({"custom_id": request.custom_id, "params": params})
+        return self.sdk.messages.batches.create(requests=entries).id
+
+    def status(self, job_id: str) -> str:
+        batch = self.sdk.messages.batches.retrieve(job_id)
+        return "completed" if batch.processing_status == "ended" else "in_progress"
+
+    def results(self, job_id: str) -> Dict[str, Optional[str]]:
+        results: Dict[str, Optional[str]] = {}
+        for entry in self.sdk.messages.batches.results(job_id):
+            content = None
+            if entry.result.type == "succeeded":
+                content = entry.result.message.content[0].text
+            results[entry.custom_id] = content
+        return results
+
+
+class LocalBatchBackend(BatchBackend):
+    """Backend that runs each batch at once through an ordinary LLM client.
+
+    Useful for providers without a batch API and for testing job flows.
+    """
+
+    max_requests = 1000000
+
+    def __init__(self, client: Any, max_workers: int = DEFAULT_MAX_WORKERS):
+        """Initialize the backend.
+
+        Args:
+            client: Any synchronous LLM client
+            max_workers: Maximum number of requests in flight at once
+        """
+        super().__init__(client)
+        self.max_workers = max_workers
+        self._jobs: Dict[str, Dict[str, Optional[str]]] = {}
+
+    def submit(self, requests: Sequence[BatchRequest]) -> str:
+        outcomes = run_batch(
+            lambda request: self.client.create_completion(
+                messages=request.messages, model=request.model,
+                temperature=request.temperature, max_tokens=request.max_tokens,
+                stop=request.stop
+            ),
+            requests,
+            max_workers=self.max_workers
+        )
+        job_id = f"local-{len(self._jobs)}"
+        self._jobs[job_id] = {request.custom_id: outcome.value
+                              for request, outcome in zip(requests, outcomes)}
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        return "completed"
+
+    def results(self, job_id: str) -> Dict[str, Optional[str]]:
+        return self._jobs.pop(job_id)
+
+
+def get_batch_backend(client: Any) -> BatchBackend:
+    """Return the batch backend matching a client's provider.
+
+    Args:
+        client: LLM client instance
+
+    Returns:
+        BatchBackend: OpenAI or Anthropic batch backend, LocalBatchBackend
+            for other providers and for clients without a provider SDK
+            client, such as ReplayClient
+    """
+    if _provider_sdk(client) is None:
+        return LocalBatchBackend(client)
+    client_type = detect_client_type(client)
+    if client_type == "openai":
+        return OpenAIBatchBackend(client)
+    if client_type == "claude":
+        return AnthropicBatchBackend(client)
+    return LocalBatchBackend(client)
+
+
+class BatchJobRunner:
+    """Runs the classify, analyze and rewrite workflow as provider batch jobs.
+
+    Each stage sends one batch for every post that reached it, waits for
+    the results and uses them to decide which posts go on to the next
+    stage, exactly as analyze_and_rewrite_text() does for a single post.
+    """
+
+    def __init__(self, client: Any, backend: Optional[BatchBackend] = None,
+                 model: Optional[str] = None, prefilter: Optional[Any] = None,
+                 poll_interval: float = 30.0, timeout: Optional[float] = None,
+                 verbose: bool = False, dedup: Optional[Deduplicator] = None):
+        """Build the runner.
+
+        Args:
+            client: LLM client whose prompts, settings and provider are used
+            backend: Batch backend, chosen from the client type if None
+            model: Model to use for all stages
+            prefilter: Optional LexiconPrefilter; posts without drug terms are
+                labeled non-drug-related without being sent
+            poll_interval: Seconds between job status checks
+            timeout: Seconds to wait for each stage, None to wait indefinitely
+            verbose: Print the progress of each stage
+            dedup: Optional Deduplicator; only one representative per group
+                of duplicate posts is sent
+        """
+        self.client = client
+        self.backend = backend if backend is not None else get_batch_backend(client)
+        self.model = model
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.verbose = verbose
+        self.dedup = dedup
+
+        self.drug_classifier = DrugClassifier(client, prefilter=prefilter)
+        self.stigma_classifier = StigmaClassifier(client)
+        self.style_analyzer = StyleAnalyzer()
+        self.emotion_analyzer = EmotionAnalyzer(client)
+        self.rewriter = DestigmatizingRewriter(client)
+
+    def _log(self, message: str) -> None:
+        if self.verbose:
+            print(message)
+
+    def _request(self, custom_id: str, messages: List[Dict[str, str]],
+                 settings: Dict[str, Any]) -> BatchRequest:
+        client_type = detect_client_type(self.client)
+        model = get_model_mapping(self.model, client_type) if self.model is not None else None
+        kwargs = generation_kwargs(settings, model, self.client)
+        if kwargs["model"] is None:
+            kwargs["model"] = get_model_mapping(None, client_type)
+        return BatchRequest(custom_id, messages, **kwargs)
+
+    def _run_stage(self, name: str, requests: List[BatchRequest]) -> Dict[str, Optional[str]]:
+        self._log(f"Stage {name}: {len(requests)} requests")
+        return self.backend.run(requests, poll_interval=self.poll_interval, timeout=self.timeout)
+
+    def run(self, texts: Iterable[str]) -> List[BatchResult]:
+        """Process a corpus through batch jobs.
+
+        Args:
+            texts: Texts to analyze and potentially rewrite
+
+        Returns:
+            list: One BatchResult per text, in input order, whose value is
+                a Pipeline.process()-style record ("text", "drug",
+                "stigma", "explanation", "style", "rewritten", "output")
+        """
+        texts = list(texts)
+        if self.dedup is not None:
+            representatives, positions = self.dedup.collapse(texts)
+            self._log(f"Deduplication: {len(representatives)} of {len(texts)} posts to send")
+            return expand_results(texts, positions, self._run(representatives))
+        return self._run(texts)
+
+    def _run(self, texts: List[str]) -> List[BatchResult]:
+        records = [Pipeline._new_record(text) for text in texts]
+        errors: Dict[int, BaseException] = {}
+
+        # Step 1: drug classification, prefiltered posts are decided locally
+        requests = []
+        for index, text in enumerate(texts):
+            local_result = self.drug_classifier._short_circuit(text)
+            if local_result is not None:
+                records[index]["drug"] = local_result
+            else:
+                requests.append(self._request(f"drug-{index}",
+                                              self.drug_classifier.build_messages(text),
+                                              self.drug_classifier.generation))
+        answers = self._run_stage("drug_classification", requests)
+        for request in requests:
+            index = int(request.custom_id.split("-")[1])
+            answer = answers.get(request.custom_id)
+            records[index]["drug"] = answer.lower().strip() if answer is not None else "skipped"
+
+        # Step 2: stigma classification for drug-related posts
+        drug_related = [i for i, r in enumerate(records) if r["drug"].upper() == "D"]
+        answers = self._run_stage("stigma_classification", [
+            self._request(f"stigma-{i}", self.stigma_classifier.build_messages(texts[i]),
+                          self.stigma_classifier.generation)
+            for i in drug_related
+        ])
+        stigmatizing = []
+        for i in drug_related:
+            answer = answers.get(f"stigma-{i}")
+            records[i]["stigma"] = answer.lower().strip() if answer is not None else "skipped"
+            if records[i]["stigma"].startswith("s") and records[i]["stigma"] != "skipped":
+                records[i]["explanation"] = split_stigma_result(records[i]["stigma"])
+                stigmatizing.append(i)
+
+        # Step 3: style locally, emotion as a batch
+        answers = self._run_stage("emotion", [
+            self._request(f"emotion-{i}", self.emotion_analyzer.build_messages(texts[i]),
+                          self.emotion_analyzer.generation)
+            for i in stigmatizing
+        ])
+        ready = []
+        for i in stigmatizing:
+            try:
+                style = self.style_analyzer.analyze(texts[i])
+            except Exception as e:
+                errors[i] = e
+                continue
+            emotion = answers.get(f"emotion-{i}")
+            style["top_emotions"] = emotion.lower().strip() if emotion is not None else "unknown"
+            records[i]["style"] = style
+            ready.append(i)
+
+        # Step 4: two rewrite passes, the second working on the first's output
+        components = {i: self.rewriter._parse_explanation(records[i]["explanation"]) for i in ready}
+        current = {i: texts[i] for i in ready}
+        for pass_type in (1, 2):
+            answers = self._run_stage(f"rewrite_pass_{pass_type}", [
+                self._request(f"rewrite{pass_type}-{i}",
+                              self.rewriter.build_pass_messages(
+                                  current[i], components[i], records[i]["explanation"],
+                                  str(records[i]["style"]), pass_type),
+                              self.rewriter.generation[pass_type])
+                for i in ready
+            ])
+            for i in ready:
+                answer = answers.get(f"rewrite{pass_type}-{i}")
+                current[i] = answer.lower().strip() if answer is not None else "Error rewriting text"
+        for i in ready:
+            records[i]["rewritten"] = current[i]
+            records[i]["output"] = current[i]
+
+        return [BatchResult(i, text, value=None if i in errors else records[i],
+                            error=errors.get(i))
+                for i, text in enumerate(texts)]
+
+
+def run_batch_job(texts: Iterable[str], client: Any, model: Optional[str] = None,
+                  backend: Optional[BatchBackend] = None, prefilter: Optional[Any] = None,
+                  poll_interval: float = 30.0, timeout: Optional[float] = None,
+                  verbose: bool = False, dedup: Optional[Deduplicator] = None) -> List[BatchResult]:
+    """Analyze and rewrite a corpus with provider batch jobs.
+
+    Args:
+        texts: Texts to analyze and potentially rewrite
+        client: LLM client instance
+        model: Model to use
+        backend: Batch backend, chosen from the client type if None
+        prefilter: Optional LexiconPrefilter to skip posts without drug terms
+        poll_interval: Seconds between job status checks
+        timeout: Seconds to wait for each stage, None to wait indefinitely
+        verbose: Print the progress of each stage
+        dedup: Optional Deduplicator to send one post per group of duplicates
+
+    Returns:
+        list: One BatchResult per text, in input order, see BatchJobRunner.run()
+    """
+    runner = BatchJobRunner(client, backend=backend, model=model, prefilter=prefilter,
+                            poll_interval=poll_interval, timeout=timeout, verbose=verbose,
+                            dedup=dedup)
+    return runner.run(texts)
@@ -0,0 +1,241 @@
+"""End-to-end throughput benchmark against the local stand-in server.
+
+Run with ``python -m destigmatizer.benchmark``. Every scenario pushes the
+same corpus through the full pipeline using a real SDK client pointed at a
+FakeProviderServer, so the numbers include HTTP, JSON and SDK overhead but
+need no API key or network access.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .batch import run_batch, run_async_batch
+from .clients import get_client, get_async_client
+from .concurrency import AIMDController
+from .cascade import CascadePolicy
+from .fake_server import FakeProviderServer
+from .pipeline import Pipeline
+
+
+SCENARIOS = ("sequential", "batch", "async")
+
+# Mix of non-drug, drug-related and stigmatizing posts
+SAMPLE_POSTS = [
+    "Had a great time hiking this weekend, the weather was perfect.",
+    "Does anyone have tips for sleeping better during exam season?",
+    "My doctor switched me to a new blood pressure medication.",
+    "Been sober from opioids for two years now and feeling grateful.",
+    "The junkies downtown are ruining the neighborhood for everyone.",
+    "I tried weed for the first time at a friend's place last night.",
+    "Those addicts will never change, they only care about their next fix.",
+    "Looking for recommendations for a good harm reduction program.",
+    "Our team finally shipped the new release after months of work.",
+    "Crackheads keep hanging around the station, it's disgusting.",
+]
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+
+
+def _summarize(scenario: str, elapsed: float, latencies: List[float], errors: int,
+               peak_memory: Optional[int]) -> Dict[str, Any]:
+    posts = len(latencies)
+    return {
+        "scenario": scenario,
+        "posts": posts,
+        "errors": errors,
+        "seconds": elapsed,
+        "posts_per_sec": posts / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "peak_memory_mb": peak_memory / 2 ** 20 if peak_memory is not None else None
+    }
+
+
+def _measure(scenario: str, body: Callable[[], List[Any]], latencies: List[float],
+             trace_memory: bool) -> Dict[str, Any]:
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        results = body()
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    errors = sum(1 for r in results if not r.ok)
+    return _summarize(scenario, elapsed, latencies, errors, peak)
+
+
+def run_benchmark(posts: Sequence[str], client_type: str = "openai",
+                  scenarios: Sequence[str] = SCENARIOS, concurrency: int = 16,
+                  latency: float = 0.02, latency_sigma: float = 0.0, error_rate: float = 0.0,
+                  combined: bool = False, adaptive: bool = False, model: Optional[str] = None,
+                  trace_memory: bool = True, seed: Optional[int] = 0,
+                  cascade: bool = False, speculative: bool = False) -> List[Dict[str, Any]]:
+    """Benchmark the pipeline against a FakeProviderServer.
+
+    Args:
+        posts: Posts to process in every scenario
+        client_type: Client to drive the server with ("openai", "together" or "claude")
+        scenarios: Scenarios to run, any of SCENARIOS
+        concurrency: Worker threads (batch) or in-flight posts (async)
+        latency: Median server response delay in seconds
+        latency_sigma: Spread of the log-normal delay distribution
+        error_rate: Fraction of requests answered with an error
+        combined: Classify drug reference and stigma in a single request
+        adaptive: Admit LLM requests through an AIMDController whose
+            max_limit is the concurrency, instead of a fixed pool
+        model: Model name sent to the server
+        trace_memory: Measure peak Python memory with tracemalloc
+        seed: Seed for the server's delay and error generator
+        cascade: Classify through a small/medium/large model cascade
+        speculative: Start stigma classification together with drug
+            classification
+
+    Returns:
+        list: One result dict per scenario with "posts", "errors",
+            "seconds", "posts_per_sec", "p50_ms", "p99_ms" and
+            "peak_memory_mb", plus "final_limit" in adaptive mode and
+            "escalation_rate" in cascade mode
+    """
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    reports = []
+    with FakeProviderServer(latency=latency, latency_sigma=latency_sigma,
+                            error_rate=error_rate, seed=seed) as server:
+        base_url = server.base_url_for(client_type)
+        for scenario in scenarios:
+            latencies: List[float] = []
+            controller = None
+            if adaptive:
+                controller = AIMDController(initial=1, max_limit=max(1, concurrency))
+            policy = CascadePolicy() if cascade else None
+
+            if scenario == "async":
+                client = get_async_client(client_type, "benchmark", base_url=base_url)
+                pipeline = Pipeline(client, model=model, combined=combined,
+                                    concurrency=controller, cascade=policy,
+                                    speculative=speculative)
+
+                async def timed_async(text: str) -> str:
+                    start = time.perf_counter()
+                    try:
+                        return await pipeline.arun(text)
+                    finally:
+                        latencies.append(time.perf_counter() - start)
+
+                def body() -> List[Any]:
+                    return asyncio.run(run_async_batch(timed_async, posts,
+                                                       max_concurrency=concurrency))
+            else:
+                client = get_client(client_type, "benchmark", base_url=base_url)
+                pipeline = Pipeline(client, model=model, combined=combined,
+                                    concurrency=controller, cascade=policy,
+                                    speculative=speculative)
+
+                def timed(text: str) -> str:
+                    start = time.perf_counter()
+                    try:
+                        return pipeline.run(text)
+                    finally:
+                        latencies.append(time.perf_counter() - start)
+
+                workers = 1 if scenario == "sequential" else concurrency
+
+                def body() -> List[Any]:
+                    return run_batch(timed, posts, max_workers=workers)
+
+            report = _measure(scenario, body, latencies, trace_memory)
+            if controller is not None:
+                report["final_limit"] = controller.limit
+            if policy is not None:
+                stages = policy.stats().values()
+                calls = sum(entry["calls"] for entry in stages)
+                escalated = sum(entry["escalated"] for entry in stages)
+                report["escalation_rate"] = escalated / calls if calls else 0.0
+            reports.append(report)
+    return reports
+
+
+def format_report(reports: List[Dict[str, Any]]) -> str:
+    """Render benchmark results as a text table."""
+    header = f"{'scenario':<12}{'posts':>7}{'errors':>8}{'posts/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'peak MB':>10}"
+    lines = [header, "-" * len(header)]
+    for r in reports:
+        memory = f"{r['peak_memory_mb']:.1f}" if r["peak_memory_mb"] is not None else "-"
+        lines.append(f"{r['scenario']:<12}{r['posts']:>7}{r['errors']:>8}"
+                     f"{r['posts_per_sec']:>10.1f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+                     f"{memory:>10}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for destigmatizer")
+    parser.add_argument("--client", default="openai", choices=["openai", "together", "claude"],
+                        help="Client type used to drive the stand-in server")
+    parser.add_argument("--posts", type=int, default=200, help="Number of posts per scenario")
+    parser.add_argument("--corpus", help="Text file with one post per line (default: built-in sample)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="Comma-separated scenarios to run")
+    parser.add_argument("--concurrency", type=int, default=16, help="Posts in flight at once")
+    parser.add_argument("--latency", type=float, default=0.02, help="Median response delay (s)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5,
+                        help="Spread of the log-normal delay distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with an error")
+    parser.add_argument("--combined", action="store_true",
+                        help="Classify drug reference and stigma in one request")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Adapt requests in flight with an AIMD controller")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Escalate uncertain classifications from small to larger models")
+    parser.add_argument("--speculative", action="store_true",
+                        help="Classify stigma at the same time as drug reference")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc measurement")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            corpus = [line.strip() for line in f if line.strip()]
+    else:
+        corpus = SAMPLE_POSTS
+    if not corpus:
+        parser.error("corpus is empty")
+    posts = [corpus[i % len(corpus)] for i in range(args.posts)]
+
+    reports = run_benchmark(
+        posts,
+        client_type=args.client,
+        scenarios=[s.strip() for s in args.scenarios.split(",") if s.strip()],
+        concurrency=args.concurrency,
+        latency=args.latency,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        combined=args.combined,
+        adaptive=args.adaptive,
+        cascade=args.cascade,
+        speculative=args.speculative,
+        trace_memory=not args.no_memory
+    )
+    print(json.dumps(reports, indent=2) if args.json else format_report(reports))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
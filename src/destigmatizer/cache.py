@@ -0,0 +1,399 @@
+"""Persistent completion cache for LLM clients."""
+
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Iterator, Optional
+
+from .clients import (LLMClient, detect_client_type, get_last_confidence,
+                      _confidence_requested, _last_confidence)
+from .instrumentation import record_cache_hit
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".reframe", "cache.sqlite")
+
+# Index of the sample being drawn when one request is repeated on purpose,
+# e.g. for self-consistency; None for ordinary requests
+_sample_index: ContextVar[Optional[int]] = ContextVar("destigmatizer_sample_index", default=None)
+
+
+@contextmanager
+def sample_index(index: int) -> Iterator[None]:
+    """Mark completions in this block as the index-th of repeated samples.
+
+    CachedClient mixes the index into its keys, so repeated samples of
+    the same request get separate cache entries instead of all being
+    served the first sample's answer.
+
+    Args:
+        index: Sample number, distinct for each repetition of a request
+    """
+    token = _sample_index.set(index)
+    try:
+        yield
+    finally:
+        _sample_index.reset(token)
+
+
+def _key_variant() -> str:
+    """Return the key suffix for repeated samples and confidence requests.
+
+    Repeated samples of one request need separate entries, and requests
+    made under request_confidence() store their confidence alongside the
+    response, so both are told apart from ordinary requests.
+    """
+    variant = ""
+    index = _sample_index.get()
+    if index is not None:
+        variant += f":sample{index}"
+    if _confidence_requested.get():
+        variant += ":confidence"
+    return variant
+
+
+def prompt_fingerprint() -> str:
+    """Return a short fingerprint of the package's static prompts.
+
+    The fingerprint changes whenever a classifier prompt, its few-shot
+    examples or the emotion prompt is edited, so cached completions made
+    with an older prompt set are never served.
+
+    Returns:
+        str: Hex digest identifying the current prompt version
+    """
+    from .classifiers import DrugClassifier, StigmaClassifier
+    from .analyzers import EmotionAnalyzer
+
+    digest = hashlib.sha256()
+    for cls in (DrugClassifier, StigmaClassifier):
+        digest.update(cls.prompt.encode("utf-8"))
+        digest.update(json.dumps(cls.examples).encode("utf-8"))
+    digest.update(EmotionAnalyzer.prompt.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def completion_key(messages: List[Dict[str, str]], model: Optional[str],
+                   temperature: float, max_tokens: int, namespace: str = "",
+                   stop: Optional[List[str]] = None) -> str:
+    """Compute a content-addressed key for a completion request.
+
+    Args:
+        messages: List of message dictionaries
+        model: Model identifier
+        temperature: Sampling temperature
+        max_tokens: Maximum number of tokens in the response
+        namespace: Extra value mixed into the key, e.g. client type and prompt version
+        stop: Sequences that end the response early; only part of the key
+            when given, so keys of requests without stop sequences are unchanged
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    fields = [namespace, model, temperature, max_tokens, messages]
+    if stop:
+        fields.append(list(stop))
+    payload = json.dumps(
+        fields,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """SQLite-backed store of completions with TTL and LRU eviction.
+
+    Access times are only written back when they are older than
+    touch_interval, so repeated hits on a hot entry do not each cost a
+    write and a commit; recency is tracked to within that interval.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None, touch_interval: float = 60.0):
+        """Open (or create) a cache file.
+
+        Args:
+            path: Path to the SQLite file, or ":memory:"
+            ttl: Seconds after which an entry expires, None to keep forever
+            max_entries: Maximum number of entries kept, least recently used
+                entries are evicted first; None for no limit
+            touch_interval: Seconds an entry's access time may lag behind
+                its latest hit before it is updated
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed)"
+            )
+            self._conn.commit()
+            # Entries written through this connection are counted as they
+            # are added, so eviction never needs to scan the table
+            self._size = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created, accessed FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created, accessed = row
+            if self.ttl is not None and now - created > self.ttl:
+                self._size -= self._conn.execute(
+                    "DELETE FROM completions WHERE key = ?", (key,)
+                ).rowcount
+                self._conn.commit()
+                return None
+            if now - accessed >= self.touch_interval:
+                self._conn.execute(
+                    "UPDATE completions SET accessed = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+            return response
+
+    def set(self, key: str, response: str) -> None:
+        """Store a response, evicting least recently used entries if over capacity."""
+        now = time.time()
+        with self._lock:
+            added = self._conn.execute(
+                "INSERT OR IGNORE INTO completions (key, response, created, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            ).rowcount
+            if added:
+                self._size += 1
+            else:
+                self._conn.execute(
+                    "UPDATE completions SET response = ?, created = ?, accessed = ? WHERE key = ?",
+                    (response, now, now, key)
+                )
+            if self.max_entries is not None and self._size > self.max_entries:
+                # Walks the access-time index from the oldest entry
+                self._size -= self._conn.execute(
+                    "DELETE FROM completions WHERE key IN ("
+                    "SELECT key FROM completions ORDER BY accessed ASC LIMIT ?)",
+                    (self._size - self.max_entries,)
+                ).rowcount
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete all expired entries.
+
+        Returns:
+            int: Number of entries removed
+        """
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM completions WHERE created < ?", (time.time() - self.ttl,)
+            )
+            self._size -= cursor.rowcount
+            self._conn.commit()
+            return cursor.rowcount
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._size = 0
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class CachedClient(LLMClient):
+    """LLM client wrapper that serves repeated requests from a local cache.
+
+    The wrapper is itself an LLMClient, so classifiers, analyzers and the
+    rewriter use the cache transparently when handed a CachedClient.
+    """
+
+    def __init__(self, client: Any, cache: Optional[CompletionCache] = None,
+                 path: str = DEFAULT_CACHE_PATH, ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None, prompt_version: Optional[str] = None,
+                 cache_sampled: bool = False):
+        """Wrap a client with a completion cache.
+
+        Args:
+            client: LLM client instance to wrap
+            cache: Existing CompletionCache to use; one is opened from
+                path, ttl and max_entries if not given
+            path: Path to the SQLite cache file
+            ttl: Seconds after which an entry expires
+            max_entries: Maximum number of cached entries
+            prompt_version: Prompt version mixed into every key, defaults to
+                prompt_fingerprint()
+            cache_sampled: Also cache completions sampled at a temperature
+                above 0; by default they always reach the wrapped client,
+                since replaying one sample defeats the point of sampling
+        """
+        self.client = client
+        if cache is None:
+            cache = CompletionCache(path, ttl=ttl, max_entries=max_entries)
+        self.cache = cache
+        self.prompt_version = prompt_version or prompt_fingerprint()
+        self.cache_sampled = cache_sampled
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def client_type(self) -> str:
+        """Return the type of the wrapped client."""
+        return detect_client_type(self.client)
+
+    def _key(self, messages: List[Dict[str, str]], model: Optional[str],
+             temperature: float, max_tokens: int,
+             stop: Optional[List[str]] = None) -> str:
+        # Confidence requests store their confidence with the response, see _decode()
+        namespace = f"{self.client_type}:{self.prompt_version}{_key_variant()}"
+        return completion_key(messages, model, temperature, max_tokens, namespace, stop)
+
+    def _cacheable(self, temperature: float) -> bool:
+        return temperature <= 0 or self.cache_sampled
+
+    def _decode(self, cached: Optional[str]) -> Optional[str]:
+        """Unpack a cached entry, restoring its confidence if one was requested."""
+        if cached is not None and _confidence_requested.get():
+            cached, confidence = json.loads(cached)
+            _last_confidence.set(confidence)
+        self._record(cached is not None)
+        return cached
+
+    def _encode(self, response: str) -> str:
+        """Pack a response with the confidence of the call if one was requested."""
+        if _confidence_requested.get():
+            return json.dumps([response, get_last_confidence()])
+        return response
+
+    def _record(self, hit: bool) -> None:
+        if hit:
+            record_cache_hit()
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def create_completion(self,
+                         messages: List[Dict[str, str]],
+                         model: Optional[str] = None,
+                         temperature: float = 0,
+                         max_tokens: int = 1000,
+                         stop: Optional[List[str]] = None) -> str:
+        """Return a cached completion, calling the wrapped client on a miss.
+
+        Args:
+            messages: List of message dictionaries
+            model: Model identifier
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
+
+        Returns:
+            str: The generated response content
+        """
+        if not self._cacheable(temperature):
+            return self.client.create_completion(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stop=stop
+            )
+        key = self._key(messages, model, temperature, max_tokens, stop)
+        cached = self._decode(self.cache.get(key))
+        if cached is not None:
+            return cached
+
+        response = self.client.create_completion(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop
+        )
+        self.cache.set(key, self._encode(response))
+        return response
+
+    async def acreate_completion(self,
+                                messages: List[Dict[str, str]],
+                                model: Optional[str] = None,
+                                temperature: float = 0,
+                                max_tokens: int = 1000,
+                                stop: Optional[List[str]] = None) -> str:
+        """Async variant of create_completion() for wrapped async clients.
+
+        The SQLite reads and writes run in the default executor, so a slow
+        disk or a contended lock does not stall the event loop.
+        """
+        if not self._cacheable(temperature):
+            return await self.client.acreate_completion(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stop=stop
+            )
+        loop = asyncio.get_running_loop()
+        key = self._key(messages, model, temperature, max_tokens, stop)
+        cached = self._decode(await loop.run_in_executor(None, self.cache.get, key))
+        if cached is not None:
+            return cached
+
+        response = await self.client.acreate_completion(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop
+        )
+        await loop.run_in_executor(None, self.cache.set, key, self._encode(response))
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit and miss counts for this wrapper.
+
+        Returns:
+            dict: Hits, misses, hit rate and number of stored entries
+        """
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": len(self.cache)
+        }
@@ -0,0 +1,192 @@
+"""Model cascade that escalates uncertain classifications to larger models."""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .batch import BatchResult, run_batch, DEFAULT_MAX_WORKERS
+from .clients import detect_client_type
+from .utils import get_model_mapping
+
+
+# Generic model tiers from the "model_mappings" config, cheapest first
+DEFAULT_TIERS = ("small", "medium", "large")
+
+
+class CascadePolicy:
+    """Tiers, confidence threshold and escalation statistics for a cascade.
+
+    One policy can be shared by several CascadeClassifiers; its statistics
+    are kept per classification stage.
+    """
+
+    def __init__(self, tiers: Sequence[str] = DEFAULT_TIERS, threshold: float = 0.9,
+                 samples: int = 3, sample_temperature: float = 0.7):
+        """Configure the cascade.
+
+        Args:
+            tiers: Generic (e.g. "small") or provider-specific model names,
+                tried in order
+            threshold: Confidence below which the next tier is asked
+            samples: Answers compared for self-consistency when the provider
+                reports no logprobs
+            sample_temperature: Temperature of the extra self-consistency samples
+        """
+        if not tiers:
+            raise ValueError("A cascade needs at least one tier")
+        self.tiers = tuple(tiers)
+        self.threshold = threshold
+        self.samples = samples
+        self.sample_temperature = sample_temperature
+        self._lock = threading.Lock()
+        self._decided: Dict[str, List[int]] = {}
+
+    def record(self, stage: str, tier_index: int) -> None:
+        """Count a classification decided by the tier at tier_index."""
+        with self._lock:
+            counts = self._decided.setdefault(stage, [0] * len(self.tiers))
+            counts[tier_index] += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return escalation statistics per stage.
+
+        Returns:
+            dict: For each stage, "calls", "escalated" (classifications not
+                decided by the first tier), "escalation_rate" and
+                "decided_by" (classifications per tier)
+        """
+        with self._lock:
+            decided = {stage: list(counts) for stage, counts in self._decided.items()}
+        stats = {}
+        for stage, counts in decided.items():
+            calls = sum(counts)
+            escalated = calls - counts[0]
+            stats[stage] = {
+                "calls": calls,
+                "escalated": escalated,
+                "escalation_rate": escalated / calls if calls else 0.0,
+                "decided_by": dict(zip(self.tiers, counts)),
+            }
+        return stats
+
+    def to_prometheus(self) -> str:
+        """Render the per-tier decision counts in the Prometheus text format."""
+        lines = [
+            "# HELP destigmatizer_cascade_decisions_total Classifications decided per cascade tier",
+            "# TYPE destigmatizer_cascade_decisions_total counter",
+        ]
+        for stage, entry in self.stats().items():
+            for tier, count in entry["decided_by"].items():
+                lines.append(
+                    f'destigmatizer_cascade_decisions_total{{stage="{stage}",tier="{tier}"}} {count}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+class CascadeClassifier:
+    """Runs a DrugClassifier or StigmaClassifier through a model cascade.
+
+    Each text is classified by the first tier's model. The answer is kept
+    when its confidence reaches the policy threshold; otherwise the next
+    tier is asked. The last tier's answer is always kept, without scoring.
+    Since most posts are easy, the bulk of traffic stays on the cheapest
+    model.
+    """
+
+    def __init__(self, classifier: Any, policy: Optional[CascadePolicy] = None):
+        """Wrap a classifier.
+
+        Args:
+            classifier: DrugClassifier or StigmaClassifier instance
+            policy: Cascade settings and statistics, a default CascadePolicy if None
+        """
+        self.classifier = classifier
+        self.policy = policy if policy is not None else CascadePolicy()
+
+    @property
+    def stage_name(self) -> str:
+        """Return the stage name of the wrapped classifier."""
+        return self.classifier.stage_name
+
+    def _short_circuit(self, text: str, record: bool = True) -> Optional[str]:
+        """Return the wrapped classifier's locally decided label, if any."""
+        return self.classifier._short_circuit(text, record)
+
+    def _models(self) -> List[str]:
+        client_type = detect_client_type(self.classifier.client)
+        return [get_model_mapping(tier, client_type) for tier in self.policy.tiers]
+
+    def _accept(self, result: str, confidence: float) -> bool:
+        return result != "skipped" and confidence >= self.policy.threshold
+
+    def classify(self, text: str, model: Optional[str] = None, retries: int = 2) -> str:
+        """Classify the text, escalating while the answer is uncertain.
+
+        Args:
+            text: Text to classify
+            model: Ignored; the cascade tiers choose the model. Accepted so
+                the cascade can stand in for the wrapped classifier.
+            retries: Number of retries on failure, per request
+
+        Returns:
+            str: Classification result of the deciding tier
+        """
+        models = self._models()
+        last = len(models) - 1
+        for index, tier_model in enumerate(models):
+            if index == last:
+                result = self.classifier.classify(text, model=tier_model, retries=retries)
+                break
+            result, confidence = self.classifier.classify_with_confidence(
+                text, model=tier_model, retries=retries, samples=self.policy.samples,
+                sample_temperature=self.policy.sample_temperature
+            )
+            if self._accept(result, confidence):
+                break
+        self.policy.record(self.stage_name, index)
+        return result
+
+    async def aclassify(self, text: str, model: Optional[str] = None, retries: int = 2) -> str:
+        """Classify the text through the cascade using an async client.
+
+        Args:
+            text: Text to classify
+            model: Ignored; the cascade tiers choose the model
+            retries: Number of retries on failure, per request
+
+        Returns:
+            str: Classification result of the deciding tier
+        """
+        models = self._models()
+        last = len(models) - 1
+        for index, tier_model in enumerate(models):
+            if index == last:
+                result = await self.classifier.aclassify(text, model=tier_model, retries=retries)
+                break
+            result, confidence = await self.classifier.aclassify_with_confidence(
+                text, model=tier_model, retries=retries, samples=self.policy.samples,
+                sample_temperature=self.policy.sample_temperature
+            )
+            if self._accept(result, confidence):
+                break
+        self.policy.record(self.stage_name, index)
+        return result
+
+    def classify_many(self, texts: Iterable[str], model: Optional[str] = None,
+                      retries: int = 2,
+                      max_workers: int = DEFAULT_MAX_WORKERS) -> List[BatchResult]:
+        """Classify many texts concurrently through the cascade.
+
+        Args:
+            texts: Texts to classify
+            model: Ignored; the cascade tiers choose the model
+            retries: Number of retries on failure, per request
+            max_workers: Maximum number of texts in flight at once
+
+        Returns:
+            list: One BatchResult per text, in input order
+        """
+        return run_batch(
+            lambda text: self.classify(text, retries=retries),
+            texts,
+            max_workers=max_workers
+        )
@@ -1,13 +1,30 @@
 """Text classifiers for drug and stigma detection."""
 
-import time
+import re
+import json
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from .batch import BatchResult, run_batch, DEFAULT_MAX_WORKERS
+from .cache import sample_index
+from .clients import request_confidence, get_last_confidence
+from .instrumentation import stage
+from .retry import DEFAULT_RETRY_POLICY
+from .utils import get_generation_settings, generation_kwargs
 
 
 class BaseClassifier(ABC):
     """Abstract base class for text classifiers."""
     
+    # Few-shot prompt used by subclasses that classify through an LLM
+    prompt = ""
+    examples: List[tuple] = []
+    # Stage name reported to the active instrumentation
+    stage_name = "classification"
+    # Valid answer labels, lower-cased; empty when any answer is accepted
+    labels: Tuple[str, ...] = ()
+    
     def __init__(self, client: Any):
         """Initialize classifier with an LLM client.
         
@@ -15,7 +32,10 @@ class BaseClassifier(ABC):
             client: LLM client instance
         """
         self.client = client
-        self.retry_wait_time = 5  # seconds between retries
+        self.retry_policy = DEFAULT_RETRY_POLICY
+        # max_tokens, stop sequences and temperature for this stage, see
+        # get_generation_settings()
+        self.generation = get_generation_settings(self.stage_name)
         
     @abstractmethod
     def classify(self, text: str, model: Optional[str] = None, retries: int = 2) -> str:
@@ -31,22 +51,229 @@ class BaseClassifier(ABC):
         """
         pass
 
+    @classmethod
+    def prefix_messages(cls) -> Tuple[Dict[str, str], ...]:
+        """Return the static system prompt and few-shot examples.
+        
+        The prefix is built once per class and shared by every call, so the
+        message dictionaries must not be modified.
+        
+        Returns:
+            tuple: Messages preceding the user turn
+        """
+        prefix = cls.__dict__.get("_prefix")
+        if prefix is None:
+            messages = [{"role": "system", "content": cls.prompt}]
+            for example, answer in cls.examples:
+                messages.append({"role": "user", "content": example})
+                messages.append({"role": "system", "content": answer})
+            prefix = tuple(messages)
+            cls._prefix = prefix
+        return prefix
 
-class DrugClassifier(BaseClassifier):
-    """Classifier for drug-related content."""
-    
-    def classify(self, text: str, model: Optional[str] = None, retries: int = 2) -> str:
-        """Classify if text contains drug-related content.
+    def build_messages(self, text: str) -> List[Dict[str, str]]:
+        """Build the few-shot message list for a text.
         
         Args:
             text: Text to classify
-            model: Model to use
+            
+        Returns:
+            list: Messages to send to the LLM
+        """
+        messages = list(self.prefix_messages())
+        messages.append({"role": "user", "content": text})
+        return messages
+
+    def _short_circuit(self, text: str, record: bool = True) -> Optional[str]:
+        """Return a label decided locally without an LLM call, if any.
+        
+        Args:
+            text: Text to classify
+            record: Count the check in the prefilter statistics; False
+                to look ahead at a text that will be classified later
+            
+        Returns:
+            str: Local label, or None if the LLM must be asked
+        """
+        return None
+
+    def _complete(self, text: str, model: Optional[str], retries: int) -> str:
+        """Send the few-shot request for a text, retrying on failure."""
+        with stage(self.stage_name):
+            local_result = self._short_circuit(text)
+            if local_result is not None:
+                return local_result
+            
+            messages = self.build_messages(text)
+            kwargs = generation_kwargs(self.generation, model, self.client)
+            try:
+                result = self.retry_policy.call(
+                    lambda: self.client.create_completion(messages=messages, **kwargs),
+                    attempts=retries
+                )
+            except Exception as e:
+                print(f"An error occurred: {e}. Skipping.")
+                return "skipped"
+            return result.lower().strip()
+
+    async def aclassify(self, text: str, model: Optional[str] = None, retries: int = 2) -> str:
+        """Classify the provided text using an async client.
+        
+        Args:
+            text: Text to classify
+            model: Model to use for classification
             retries: Number of retries on failure
             
         Returns:
-            str: 'D' for drug-related, 'ND' for non-drug-related, 'skipped' on error
+            str: Classification result
         """
-        prompt = """
+        with stage(self.stage_name):
+            local_result = self._short_circuit(text)
+            if local_result is not None:
+                return local_result
+            
+            messages = self.build_messages(text)
+            kwargs = generation_kwargs(self.generation, model, self.client)
+            try:
+                result = await self.retry_policy.acall(
+                    lambda: self.client.acreate_completion(messages=messages, **kwargs),
+                    attempts=retries
+                )
+            except Exception as e:
+                print(f"An error occurred: {e}. Skipping.")
+                return "skipped"
+            return result.lower().strip()
+
+    @staticmethod
+    def answer_label(result: str) -> str:
+        """Return the label of a raw answer, e.g. 's' for "s, labeling: ..."."""
+        return result.split(",", 1)[0].strip()
+
+    def classify_with_confidence(self, text: str, model: Optional[str] = None,
+                                 retries: int = 2, samples: int = 3,
+                                 sample_temperature: float = 0.7) -> Tuple[str, float]:
+        """Classify the provided text and score how sure the model is.
+        
+        The score is the probability of the first answer token when the
+        provider reports logprobs. Otherwise it is the self-consistency of
+        the label: the fraction of samples (the answer plus samples - 1
+        extra completions at sample_temperature) that agree with the answer.
+        
+        Args:
+            text: Text to classify
+            model: Model to use for classification
+            retries: Number of retries on failure
+            samples: Answers compared when logprobs are unavailable
+            sample_temperature: Temperature of the extra samples
+            
+        Returns:
+            tuple: (classification result, confidence between 0 and 1);
+                locally decided labels have confidence 1 and failed
+                requests ('skipped') have confidence 0
+        """
+        with stage(self.stage_name):
+            local_result = self._short_circuit(text)
+            if local_result is not None:
+                return local_result, 1.0
+            
+            messages = self.build_messages(text)
+            kwargs = generation_kwargs(self.generation, model, self.client)
+            try:
+                with request_confidence():
+                    result = self.retry_policy.call(
+                        lambda: self.client.create_completion(messages=messages, **kwargs),
+                        attempts=retries
+                    )
+                    confidence = get_last_confidence()
+            except Exception as e:
+                print(f"An error occurred: {e}. Skipping.")
+                return "skipped", 0.0
+            result = result.lower().strip()
+            if confidence is not None:
+                return result, confidence
+            
+            sample_kwargs = dict(kwargs, temperature=sample_temperature)
+            label = self.answer_label(result)
+            agreeing = 1
+            for index in range(1, samples):
+                try:
+                    with sample_index(index):
+                        sample = self.retry_policy.call(
+                            lambda: self.client.create_completion(messages=messages, **sample_kwargs),
+                            attempts=retries
+                        )
+                except Exception:
+                    continue
+                agreeing += self.answer_label(sample.lower().strip()) == label
+            return result, agreeing / max(1, samples)
+
+    async def aclassify_with_confidence(self, text: str, model: Optional[str] = None,
+                                        retries: int = 2, samples: int = 3,
+                                        sample_temperature: float = 0.7) -> Tuple[str, float]:
+        """Async variant of classify_with_confidence(); extra samples run concurrently."""
+        with stage(self.stage_name):
+            local_result = self._short_circuit(text)
+            if local_result is not None:
+                return local_result, 1.0
+            
+            messages = self.build_messages(text)
+            kwargs = generation_kwargs(self.generation, model, self.client)
+            try:
+                with request_confidence():
+                    result = await self.retry_policy.acall(
+                        lambda: self.client.acreate_completion(messages=messages, **kwargs),
+                        attempts=retries
+                    )
+                    confidence = get_last_confidence()
+            except Exception as e:
+                print(f"An error occurred: {e}. Skipping.")
+                return "skipped", 0.0
+            result = result.lower().strip()
+            if confidence is not None:
+                return result, confidence
+            
+            sample_kwargs = dict(kwargs, temperature=sample_temperature)
+            label = self.answer_label(result)
+            async def draw(index: int) -> str:
+                with sample_index(index):
+                    return await self.retry_policy.acall(
+                        lambda: self.client.acreate_completion(messages=messages, **sample_kwargs),
+                        attempts=retries
+                    )
+            extra = await asyncio.gather(*(draw(index) for index in range(1, samples)),
+                                         return_exceptions=True)
+            agreeing = 1 + sum(1 for sample in extra if isinstance(sample, str)
+                               and self.answer_label(sample.lower().strip()) == label)
+            return result, agreeing / max(1, samples)
+
+    def classify_many(self, texts: Iterable[str], model: Optional[str] = None,
+                      retries: int = 2,
+                      max_workers: int = DEFAULT_MAX_WORKERS) -> List[BatchResult]:
+        """Classify many texts concurrently.
+        
+        Args:
+            texts: Texts to classify
+            model: Model to use for classification
+            retries: Number of retries on failure, per text
+            max_workers: Maximum number of requests in flight at once
+            
+        Returns:
+            list: One BatchResult per text, in input order
+        """
+        return run_batch(
+            lambda text: self.classify(text, model=model, retries=retries),
+            texts,
+            max_workers=max_workers
+        )
+
+
+class DrugClassifier(BaseClassifier):
+    """Classifier for drug-related content."""
+    
+    stage_name = "drug_classification"
+    labels = ("d", "nd")
+    
+    prompt = """
         *Instructions for Labeling Drug References in Social Media Posts*
 
         1. **Objective**: Identify references to drugs or people who use drugs in each post.
@@ -74,47 +301,41 @@ class DrugClassifier(BaseClassifier):
         - Respond with either 'D' (Drug) or 'ND' (Non-Drug) based on these guidelines. No additional commentary is needed.
         """
 
-        # Examples for few-shot learning
-        examples = [
-            ("I'm so high right now, I can't even feel my face. This is the best weed I've ever smoked.", "D"),
-            ("I hope my junkie sister OD's or disappears out of our lives My sister is an alcoholic junkie who has 2 DUIs under her belt as well as loves taking Xanax and alcohol together and wreaking havoc for our family and even strangers.", "D"),
-            ("My mom is going to kick me out. She graciously gave me the choice of getting dropped off in a shelter in either San Diego or the desert area (Palm Springs and surrounding areas). I would choose the desert because that is one of my old stomping grounds. The dope is phenomenal and cheap (3g's for $100) and the homeless population is a majority young people. I can also hustle up $350 and rent a room at a buddy's place. I have a few options that I can look at but I have to figure it out soon.", "D"),
-            ("I cut tonight I cut myself tonight after I've been clean for a few months now and I'm honestly just broken inside. I had a huge fight with my girlfriend, I'm worried we might break up. I just kinda lost control, grabbed my razorblade and cut. I feel like crap and am honestly just lost right now.", "ND"),
-            ("My drinking problem is way worse than anyone knows. I'm an alcoholic and the people around me know that, because I told them. But if I hadn't, they wouldn't have guessed, judging by their reactions of shock and disbelief and the actual ‚are you sure you're not exaggerating, that I got when I came clean a couple years ago.", "ND"),
-            ("My mother died two years ago from cancer of basically all of her internal organs starting in the colon and then liver and spleen and just everywhere. I hadn't seen her in years because she struggled with drug addiction since I was about four or five. We had years together but not enough. I was there the day she died and I wouldn't wish anyone to go through what she did or what our family did when we saw her in that state. My father also had an addiction to pain pills and alcohol. My last few years of high school were ruined because of that. I watched him overdoes on thanksgiving. I watched him try to kill himself with his own hand gun more than once. I watched him aim it at my stepmom when she tried to take it from him. I heard him yell at me while he kicked me and told me that he didn't want me anymore and tried to drag me up the stairs. Maybe these are some of the reasons I drink. Maybe because I barely have a relationship with my dad now and he still hasn't said anything to me today.", "D"),
-            ("Hate my new job I just got hired at Taco Bell a few weeks ago and I really hate it. The only thing that's gets me through it is smoking weed. I wonder if i should just quit or no call no show?", "D"),
-            ("I'm trying not to get emotionally invested again in you because I know all to well how you are. You're an alcoholic and I know there is nothing I can do to save you. It kills me to see you drink like you do but I know how it is, you have to want to stop. As much as I love fucking you and being around you, It's not a good idea to continue being around you. ", "ND"),
-            ("Recently I took a psychological exam for work. To know if I'm fit to work.The doctor looked at my paper and asked 'Do your have urges to hurt/killpeople?' I laughed in my head and lied..", "ND"),
-        ]
-
-        # Build messages for few-shot learning
-        messages = [{"role": "system", "content": prompt}]
-        for example, answer in examples:
-            messages.append({"role": "user", "content": example})
-            messages.append({"role": "system", "content": answer})
+    # Examples for few-shot learning
+    examples = [
+        ("I'm so high right now, I can't even feel my face. This is the best weed I've ever smoked.", "D"),
+        ("I hope my junkie sister OD's or disappears out of our lives My sister is an alcoholic junkie who has 2 DUIs under her belt as well as loves taking Xanax and alcohol together and wreaking havoc for our family and even strangers.", "D"),
+        ("My mom is going to kick me out. She graciously gave me the choice of getting dropped off in a shelter in either San Diego or the desert area (Palm Springs and surrounding areas). I would choose the desert because that is one of my old stomping grounds. The dope is phenomenal and cheap (3g's for $100) and the homeless population is a majority young people. I can also hustle up $350 and rent a room at a buddy's place. I have a few options that I can look at but I have to figure it out soon.", "D"),
+        ("I cut tonight I cut myself tonight after I've been clean for a few months now and I'm honestly just broken inside. I had a huge fight with my girlfriend, I'm worried we might break up. I just kinda lost control, grabbed my razorblade and cut. I feel like crap and am honestly just lost right now.", "ND"),
+        ("My drinking problem is way worse than anyone knows. I'm an alcoholic and the people around me know that, because I told them. But if I hadn't, they wouldn't have guessed, judging by their reactions of shock and disbelief and the actual ‚are you sure you're not exaggerating, that I got when I came clean a couple years ago.", "ND"),
+        ("My mother died two years ago from cancer of basically all of her internal organs starting in the colon and then liver and spleen and just everywhere. I hadn't seen her in years because she struggled with drug addiction since I was about four or five. We had years together but not enough. I was there the day she died and I wouldn't wish anyone to go through what she did or what our family did when we saw her in that state. My father also had an addiction to pain pills and alcohol. My last few years of high school were ruined because of that. I watched him overdoes on thanksgiving. I watched him try to kill himself with his own hand gun more than once. I watched him aim it at my stepmom when she tried to take it from him. I heard him yell at me while he kicked me and told me that he didn't want me anymore and tried to drag me up the stairs. Maybe these are some of the reasons I drink. Maybe because I barely have a relationship with my dad now and he still hasn't said anything to me today.", "D"),
+        ("Hate my new job I just got hired at Taco Bell a few weeks ago and I really hate it. The only thing that's gets me through it is smoking weed. I wonder if i should just quit or no call no show?", "D"),
+        ("I'm trying not to get emotionally invested again in you because I know all to well how you are. You're an alcoholic and I know there is nothing I can do to save you. It kills me to see you drink like you do but I know how it is, you have to want to stop. As much as I love fucking you and being around you, It's not a good idea to continue being around you. ", "ND"),
+        ("Recently I took a psychological exam for work. To know if I'm fit to work.The doctor looked at my paper and asked 'Do your have urges to hurt/killpeople?' I laughed in my head and lied..", "ND"),
+    ]
+    
+    def __init__(self, client: Any, prefilter: Optional[Any] = None):
+        """Initialize classifier with an LLM client.
         
-        messages.append({"role": "user", "content": text})
-
-        while retries > 0:
-            try:
-                result = self.client.create_completion(
-                    messages=messages,
-                    model=model
-                )
-                return result.lower().strip()
-            except Exception as e:
-                print(f"An error occurred: {e}. Retrying...")
-                retries -= 1
-                time.sleep(self.retry_wait_time)
-
-        return "skipped"
-
-
-class StigmaClassifier(BaseClassifier):
-    """Classifier for stigmatizing language related to drug use."""
+        Args:
+            client: LLM client instance
+            prefilter: Optional LexiconPrefilter; posts without any lexicon
+                hit are labeled 'nd' without calling the LLM
+        """
+        super().__init__(client)
+        self.prefilter = prefilter
+    
+    def _short_circuit(self, text: str, record: bool = True) -> Optional[str]:
+        """Label posts with no lexicon hits as non-drug-related."""
+        if self.prefilter is None:
+            return None
+        hit = self.prefilter.matches(text) if record else self.prefilter.is_candidate(text)
+        if not hit:
+            return "nd"
+        return None
     
     def classify(self, text: str, model: Optional[str] = None, retries: int = 2) -> str:
-        """Classify if text contains stigmatizing language.
+        """Classify if text contains drug-related content.
         
         Args:
             text: Text to classify
@@ -122,9 +343,18 @@ class StigmaClassifier(BaseClassifier):
             retries: Number of retries on failure
             
         Returns:
-            str: Classification result with explanation if stigmatizing
+            str: 'D' for drug-related, 'ND' for non-drug-related, 'skipped' on error
         """
-        prompt = """
+        return self._complete(text, model, retries)
+
+
+class StigmaClassifier(BaseClassifier):
+    """Classifier for stigmatizing language related to drug use."""
+    
+    stage_name = "stigma_classification"
+    labels = ("s", "ns")
+    
+    prompt = """
         **Instructions:**
         You are an expert in identifying stigma related to drug use and addiction in social media posts. Your task is to analyze each post and determine if it contains stigmatizing language. 
 
@@ -157,39 +387,189 @@ class StigmaClassifier(BaseClassifier):
         **Task:**
         Read the following post, label it as "S" or "NS", and provide the appropriate explanation:
         """
+
+    # Examples for few-shot learning
+    examples = [
+        ("Once an addict, always an addict. They'll never change.", "S, Labeling: 'addict', Stereotyping: Assumes that people with addiction are incapable of recovery or personal growth, Separation: Creates a sense of hopelessness and perpetuates the idea that people with addiction are fundamentally different, Discrimination: Discourages offering support or opportunities to individuals in recovery due to a belief they'll relapse."),
+        ("He's just a junkie looking for his next fix.", "S, Labeling: 'junkie', a derogatory term, Stereotyping: Reduces the person's identity to their substance use, ignoring other aspects of their life, Separation: Creates a distance between 'us' (non-users) and 'them' (people who use substances), Discrimination: Implies the person is solely motivated by drug use and lacks other values or goals."),
+        ("She's constantly nodding off at work. Probably using again.", "S, Labeling: Implies the person has a substance use disorder by suggesting they are 'using again,' Stereotyping: Generalizes that the person's behavior (nodding off) is solely due to drug use, Separation: Creates a distinction between the person and their colleagues, implying they are unreliable or irresponsible due to assumed substance use, Discrimination: Could lead to unfair treatment at work based on an assumption of relapse."),
+        ("If you hang out with those druggies, you'll end up like them.", "S, Labeling: 'druggies', Stereotyping: Generalizes that all people who use drugs are bad influences and will lead others to the same behavior, Separation: Creates a clear division between 'us' (those who don't use drugs) and 'them' (those who do), Discrimination: Promotes exclusion and fear of people who use drugs, potentially leading to social isolation."),
+        ("My friend is in recovery from opioid use disorder and is doing incredibly well.", "NS"),
+        ("Addiction is a complex disease, but with the right support, people can and do recover.", "NS"),
+        ("I'm concerned about my brother's substance use. I'm learning about available resources to help him.", "NS"),
+        ("I always hide my medication because I feel ashamed of my condition. I'm just an addict, and that's all people will see if they know.", "S, The author internalizes the negative stereotype associated with addiction, labeling themselves pejoratively as 'just an addict.'"),
+        ("Our town's only rehab facility refuses to accept people who have been arrested for drug offenses. They say it's a policy to maintain safety, but it just prevents those who need help the most from getting it.", "S, This post describes a systemic policy that discriminates against individuals with drug offenses, reinforcing stereotypes that they are dangerous. The policy creates a separation by denying these individuals access to rehabilitation."),
+        ("Crack is a better alternative to coffee All coffee does is make you feel less drowsy. When I smoke a bowl of crack in the morning, shit gets me gooooinn, makes me go absolutely bonkers, crazy ridiculous out of the world bonkers ! I'm getting the jitters just thinkin about it", "NS"),
+    ]
+    
+    def classify(self, text: str, model: Optional[str] = None, retries: int = 2) -> str:
+        """Classify if text contains stigmatizing language.
         
-        # Examples for few-shot learning
-        examples = [
-            ("Once an addict, always an addict. They'll never change.", "S, Labeling: 'addict', Stereotyping: Assumes that people with addiction are incapable of recovery or personal growth, Separation: Creates a sense of hopelessness and perpetuates the idea that people with addiction are fundamentally different, Discrimination: Discourages offering support or opportunities to individuals in recovery due to a belief they'll relapse."),
-            ("He's just a junkie looking for his next fix.", "S, Labeling: 'junkie', a derogatory term, Stereotyping: Reduces the person's identity to their substance use, ignoring other aspects of their life, Separation: Creates a distance between 'us' (non-users) and 'them' (people who use substances), Discrimination: Implies the person is solely motivated by drug use and lacks other values or goals."),
-            ("She's constantly nodding off at work. Probably using again.", "S, Labeling: Implies the person has a substance use disorder by suggesting they are 'using again,' Stereotyping: Generalizes that the person's behavior (nodding off) is solely due to drug use, Separation: Creates a distinction between the person and their colleagues, implying they are unreliable or irresponsible due to assumed substance use, Discrimination: Could lead to unfair treatment at work based on an assumption of relapse."),
-            ("If you hang out with those druggies, you'll end up like them.", "S, Labeling: 'druggies', Stereotyping: Generalizes that all people who use drugs are bad influences and will lead others to the same behavior, Separation: Creates a clear division between 'us' (those who don't use drugs) and 'them' (those who do), Discrimination: Promotes exclusion and fear of people who use drugs, potentially leading to social isolation."),
-            ("My friend is in recovery from opioid use disorder and is doing incredibly well.", "NS"),
-            ("Addiction is a complex disease, but with the right support, people can and do recover.", "NS"),
-            ("I'm concerned about my brother's substance use. I'm learning about available resources to help him.", "NS"),
-            ("I always hide my medication because I feel ashamed of my condition. I'm just an addict, and that's all people will see if they know.", "S, The author internalizes the negative stereotype associated with addiction, labeling themselves pejoratively as 'just an addict.'"),
-            ("Our town's only rehab facility refuses to accept people who have been arrested for drug offenses. They say it's a policy to maintain safety, but it just prevents those who need help the most from getting it.", "S, This post describes a systemic policy that discriminates against individuals with drug offenses, reinforcing stereotypes that they are dangerous. The policy creates a separation by denying these individuals access to rehabilitation."),
-            ("Crack is a better alternative to coffee All coffee does is make you feel less drowsy. When I smoke a bowl of crack in the morning, shit gets me gooooinn, makes me go absolutely bonkers, crazy ridiculous out of the world bonkers ! I'm getting the jitters just thinkin about it", "NS"),
-        ]
-        
-        # Build messages for few-shot learning
-        messages = [{"role": "system", "content": prompt}]
-        for example, answer in examples:
-            messages.append({"role": "user", "content": example})
-            messages.append({"role": "system", "content": answer})
+        Args:
+            text: Text to classify
+            model: Model to use
+            retries: Number of retries on failure
+            
+        Returns:
+            str: Classification result with explanation if stigmatizing
+        """
+        return self._complete(text, model, retries)
+
+
+_ATTRIBUTES = ("labeling", "stereotyping", "separation", "discrimination")
+_ATTRIBUTE_SPLIT = re.compile(r",?\s*\b(labeling|stereotyping|separation|discrimination):\s*", re.IGNORECASE)
+
+
+def _split_stigma_answer(answer: str) -> Dict[str, Any]:
+    """Convert a StigmaClassifier-style answer into the combined JSON shape.
+    
+    Args:
+        answer: Answer such as "S, Labeling: ..., Stereotyping: ..." or "NS"
         
-        messages.append({"role": "user", "content": text})
+    Returns:
+        dict: Stigma label and explanation attributes
+    """
+    label, _, rest = answer.partition(", ")
+    explanation: Dict[str, str] = {}
+    parts = _ATTRIBUTE_SPLIT.split(rest)
+    if len(parts) > 1:
+        for name, value in zip(parts[1::2], parts[2::2]):
+            explanation[name.lower()] = value.strip().rstrip(",")
+    elif rest:
+        explanation["summary"] = rest.strip()
+    return {"stigma": label.strip(), "explanation": explanation}
 
-        while retries > 0:
-            try:
-                result = self.client.create_completion(
-                    messages=messages,
-                    model=model
-                )
-                return result.lower().strip()
-            except Exception as e:
-                print(f"An error occurred: {e}. Retrying...")
-                retries -= 1
-                time.sleep(self.retry_wait_time)
-                
-        return "skipped"
+
+def _combined_examples() -> List[tuple]:
+    """Build combined-mode few-shot examples from the single-task examples."""
+    examples = []
+    for text, answer in DrugClassifier.examples:
+        if answer == "ND":
+            examples.append((text, json.dumps({"drug": "ND", "stigma": None, "explanation": {}})))
+    for text, answer in StigmaClassifier.examples:
+        examples.append((text, json.dumps({"drug": "D", **_split_stigma_answer(answer)})))
+    return examples
+
+
+class CombinedClassifier(BaseClassifier):
+    """Classifier that returns the drug label, stigma label and explanation in one call.
+    
+    The few-shot examples are derived from DrugClassifier and StigmaClassifier,
+    so the combined mode stays in step with the two-call prompts.
+    """
+    
+    stage_name = "combined_classification"
+    
+    prompt = """
+        **Instructions:**
+        You label social media posts in two steps and answer with a single JSON object.
+
+        1. **Drug reference ("drug")**:
+        - Label "D" if the post refers to illicit drugs, misused prescription drugs, other abused substances (e.g. inhalants, k2, bath salts), drug use, addiction or substance use disorders.
+        - Tobacco, nicotine or alcohol alone do not count, nor do mental health discussions without an explicit drug reference.
+        - Otherwise label "ND". If the post is ambiguous, label "ND".
+
+        2. **Stigma ("stigma")**, only when "drug" is "D":
+        - Label "S" if the post contains stigmatizing language related to drug use or addiction, otherwise "NS".
+        - For stigma directed at others, explain each attribute in "explanation":
+            * "labeling": derogatory or othering language related to drug use/addiction
+            * "stereotyping": negative generalizations about people who use drugs
+            * "separation": a divide between people who use drugs and those who don't
+            * "discrimination": implied or suggested unfair treatment based on drug use
+        - For self-stigma or structural stigma, give a one-sentence "summary" in "explanation" instead.
+        - When "drug" is "ND", set "stigma" to null.
+
+        **Response format:**
+        {"drug": "D" or "ND", "stigma": "S", "NS" or null, "explanation": {...}}
+        Respond with the JSON object only. No additional commentary is needed.
+        """
+    
+    # Examples for few-shot learning
+    examples = _combined_examples()
+    
+    def __init__(self, client: Any, prefilter: Optional[Any] = None):
+        """Initialize classifier with an LLM client.
+        
+        Args:
+            client: LLM client instance
+            prefilter: Optional LexiconPrefilter; posts without any lexicon
+                hit are labeled 'nd' without calling the LLM
+        """
+        super().__init__(client)
+        self.prefilter = prefilter
+    
+    def _short_circuit(self, text: str, record: bool = True) -> Optional[str]:
+        """Label posts with no lexicon hits as non-drug-related."""
+        if self.prefilter is None:
+            return None
+        hit = self.prefilter.matches(text) if record else self.prefilter.is_candidate(text)
+        if not hit:
+            return json.dumps({"drug": "nd", "stigma": None, "explanation": {}})
+        return None
+    
+    def parse_result(self, result: str) -> Dict[str, Any]:
+        """Parse a combined JSON answer.
+        
+        Args:
+            result: Raw (lower-cased) model output
+            
+        Returns:
+            dict: "drug" ('d', 'nd' or 'skipped'), "stigma" ('s', 'ns' or None),
+                "attributes" (parsed explanation) and "explanation" (the
+                explanation in the StigmaClassifier text format)
+        """
+        skipped = {"drug": "skipped", "stigma": None, "attributes": {}, "explanation": ""}
+        start, end = result.find("{"), result.rfind("}")
+        if start == -1 or end < start:
+            return skipped
+        try:
+            data = json.loads(result[start:end + 1])
+        except json.JSONDecodeError:
+            return skipped
+        
+        drug = str(data.get("drug") or "").lower().strip()
+        if drug not in ("d", "nd"):
+            return skipped
+        stigma = data.get("stigma")
+        stigma = str(stigma).lower().strip() if stigma and drug == "d" else None
+        attributes = data.get("explanation") or {}
+        if not isinstance(attributes, dict):
+            attributes = {"summary": str(attributes)}
+        attributes = {str(k).lower(): str(v) for k, v in attributes.items()}
+        
+        if any(name in attributes for name in _ATTRIBUTES):
+            explanation = ", ".join(f"{name}: {attributes[name]}"
+                                    for name in _ATTRIBUTES if name in attributes)
+        else:
+            explanation = attributes.get("summary", "")
+        
+        return {"drug": drug, "stigma": stigma, "attributes": attributes,
+                "explanation": explanation}
+    
+    def classify(self, text: str, model: Optional[str] = None, retries: int = 2) -> Dict[str, Any]:
+        """Classify drug reference and stigma in a single request.
+        
+        Args:
+            text: Text to classify
+            model: Model to use
+            retries: Number of retries on failure
+            
+        Returns:
+            dict: Parsed result, see parse_result(); "drug" is 'skipped' on
+                error or malformed output
+        """
+        return self.parse_result(self._complete(text, model, retries))
+    
+    async def aclassify(self, text: str, model: Optional[str] = None,
+                        retries: int = 2) -> Dict[str, Any]:
+        """Classify drug reference and stigma in a single request using an async client.
+        
+        Args:
+            text: Text to classify
+            model: Model to use
+            retries: Number of retries on failure
+            
+        Returns:
+            dict: Parsed result, see parse_result()
+        """
+        return self.parse_result(await super().aclassify(text, model=model, retries=retries))
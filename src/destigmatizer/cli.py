@@ -0,0 +1,405 @@
+"""Command-line entry point for bulk processing.
+
+``destigmatizer run posts.jsonl -o results.jsonl`` streams an input JSONL or
+CSV file through the pipeline with a bounded number of posts in flight and
+appends each record's result as soon as it completes. Every written record
+is logged in a checkpoint journal, so rerunning the same command after a
+crash or kill resumes where the previous run stopped.
+
+``destigmatizer frame posts.parquet -o results.parquet`` adds the results as
+columns to a Parquet, Arrow, CSV or JSONL table, see frame.py.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .clients import get_client
+from .concurrency import AIMDController
+from .dedup import Deduplicator
+from .pipeline import Pipeline
+from .prefilter import LexiconPrefilter
+
+
+FORMATS = ("jsonl", "csv")
+
+# Columns written for every record, in order
+RESULT_FIELDS = ("id", "text", "drug", "stigma", "explanation", "style", "rewritten", "output")
+
+
+def detect_format(path: str, explicit: Optional[str] = None) -> str:
+    """Return the file format, from explicit or from the file extension.
+
+    Args:
+        path: File path
+        explicit: Format given on the command line, if any
+
+    Returns:
+        str: 'jsonl' or 'csv'
+    """
+    if explicit:
+        return explicit
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of {path}; pass --input-format or --output-format")
+
+
+def read_records(path: str, fmt: str, text_field: str = "text",
+                 id_field: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """Stream (id, text) pairs from a JSONL or CSV file.
+
+    Records are read one at a time, so memory does not grow with the file.
+    JSONL lines may be objects or bare strings. Without id_field, a
+    record's id is its 1-based position in the file.
+
+    Args:
+        path: Input file
+        fmt: 'jsonl' or 'csv'
+        text_field: Field holding the post text
+        id_field: Field holding a unique record id
+
+    Yields:
+        tuple: (record id, post text)
+    """
+    with open(path, newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+        if fmt == "csv":
+            csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+            rows: Iterator[Any] = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for position, row in enumerate(rows, 1):
+            if isinstance(row, str):
+                yield str(position), row
+                continue
+            if text_field not in row:
+                raise ValueError(f"Record {position} has no '{text_field}' field")
+            record_id = row.get(id_field) if id_field else None
+            yield str(record_id if record_id is not None else position), row[text_field] or ""
+
+
+class Checkpoint:
+    """Append-only journal of records already written to the output file.
+
+    Each journal line holds a record id and the output file's size after
+    that record was written. When resuming, the output is truncated to the
+    last journaled size, so a record written but not journaled before a
+    crash is dropped and processed again rather than duplicated.
+    """
+
+    def __init__(self, path: str):
+        """Initialize the journal.
+
+        Args:
+            path: Journal file path
+        """
+        self.path = path
+        self._file: Optional[Any] = None
+
+    def load(self) -> Tuple[Set[str], int]:
+        """Read the journal, dropping a partially written last line.
+
+        Returns:
+            tuple: (ids already done, output size to truncate to)
+        """
+        done: Set[str] = set()
+        offset = 0
+        valid = 0
+        if not os.path.exists(self.path):
+            return done, offset
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    record_id, size = str(entry["id"]), int(entry["offset"])
+                except (ValueError, KeyError, TypeError):
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                done.add(record_id)
+                offset = size
+                valid += len(line)
+        with open(self.path, "r+b") as f:
+            f.truncate(valid)
+        return done, offset
+
+    def open(self, fresh: bool) -> None:
+        """Open the journal for appending, emptying it first if fresh."""
+        self._file = open(self.path, "wb" if fresh else "ab")
+
+    def record(self, record_id: str, offset: int) -> None:
+        """Log a record as written, with the output size after it."""
+        self._file.write(json.dumps({"id": record_id, "offset": offset}).encode("utf-8") + b"\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        """Flush the journal to disk and close it."""
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+
+class ResultWriter:
+    """Appends result records to a JSONL or CSV file."""
+
+    def __init__(self, path: str, fmt: str):
+        """Initialize the writer.
+
+        Args:
+            path: Output file path
+            fmt: 'jsonl' or 'csv'
+        """
+        self.path = path
+        self.fmt = fmt
+        self._file: Optional[Any] = None
+
+    def open(self, offset: int) -> int:
+        """Open the output, truncated to offset, writing a CSV header if empty.
+
+        Args:
+            offset: Bytes of the existing output to keep
+
+        Returns:
+            int: Output size after opening
+        """
+        if offset and (not os.path.exists(self.path) or os.path.getsize(self.path) < offset):
+            raise ValueError(f"{self.path} is shorter than its checkpoint journal records; "
+                             "restart the run")
+        mode = "r+b" if offset else "wb"
+        self._file = open(self.path, mode)
+        self._file.truncate(offset if mode == "r+b" else 0)
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell() == 0 and self.fmt == "csv":
+            self._write(self._csv_line(RESULT_FIELDS))
+        return self._file.tell()
+
+    @staticmethod
+    def _csv_line(values: Any) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(values)
+        return buffer.getvalue()
+
+    def _write(self, line: str) -> int:
+        self._file.write(line.encode("utf-8"))
+        self._file.flush()
+        return self._file.tell()
+
+    def write(self, record_id: str, record: Dict[str, Any]) -> int:
+        """Append one result record.
+
+        Args:
+            record_id: Id of the input record
+            record: Pipeline.process() record
+
+        Returns:
+            int: Output size after the record
+        """
+        row = {"id": record_id, **record}
+        if self.fmt == "jsonl":
+            return self._write(json.dumps(row, ensure_ascii=False) + "\n")
+        values = []
+        for field in RESULT_FIELDS:
+            value = row.get(field)
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value, ensure_ascii=False)
+            values.append("" if value is None else value)
+        return self._write(self._csv_line(values))
+
+    def close(self) -> None:
+        """Flush the output to disk and close it."""
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+
+def process_file(pipeline: Pipeline, input_path: str, output_path: str,
+                 input_format: Optional[str] = None, output_format: Optional[str] = None,
+                 text_field: str = "text", id_field: Optional[str] = None,
+                 concurrency: int = 16, journal_path: Optional[str] = None,
+                 resume: bool = True, limit: Optional[int] = None,
+                 verbose: bool = False) -> Dict[str, Any]:
+    """Stream a file through a pipeline, checkpointing every written record.
+
+    At most twice concurrency records are read ahead of the writer, so
+    memory stays bounded however large the input is. Results are appended
+    in completion order, not input order. Records whose processing raised
+    are reported but neither written nor journaled, so a rerun retries them.
+
+    Args:
+        pipeline: Pipeline used to process each post
+        input_path: JSONL or CSV input
+        output_path: JSONL or CSV output
+        input_format: 'jsonl' or 'csv', detected from the extension if None
+        output_format: 'jsonl' or 'csv', detected from the extension if None
+        text_field: Input field holding the post text
+        id_field: Input field holding a unique record id, defaults to the
+            record's position in the file
+        concurrency: Maximum number of posts in flight at once
+        journal_path: Checkpoint journal, defaults to output_path + '.journal'
+        resume: Skip records in an existing journal; False starts over
+        limit: Stop after reading this many input records
+        verbose: Print progress as records complete
+
+    Returns:
+        dict: Counts of "written", "resumed" (skipped as already done) and
+            "failed" records, the "failures" by id and the elapsed "seconds"
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    input_format = detect_format(input_path, input_format)
+    output_format = detect_format(output_path, output_format)
+    checkpoint = Checkpoint(journal_path or output_path + ".journal")
+    done, offset = checkpoint.load() if resume else (set(), 0)
+    writer = ResultWriter(output_path, output_format)
+    writer.open(offset)
+    checkpoint.open(fresh=not done)
+
+    stats: Dict[str, Any] = {"written": 0, "resumed": 0, "failed": 0, "failures": {}}
+    started = time.perf_counter()
+    pending: Dict[Future, str] = {}
+
+    def _drain(block_until: int) -> None:
+        while len(pending) > block_until:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                record_id = pending.pop(future)
+                error = future.exception()
+                if error is not None:
+                    stats["failed"] += 1
+                    stats["failures"][record_id] = str(error)
+                    print(f"Record {record_id} failed: {error}", file=sys.stderr)
+                    continue
+                checkpoint.record(record_id, writer.write(record_id, future.result()))
+                stats["written"] += 1
+                if verbose and stats["written"] % 100 == 0:
+                    print(f"{stats['written']} records written")
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for position, (record_id, text) in enumerate(
+                    read_records(input_path, input_format, text_field, id_field), 1):
+                if limit is not None and position > limit:
+                    break
+                if record_id in done:
+                    stats["resumed"] += 1
+                    continue
+                pending[executor.submit(pipeline.process, text)] = record_id
+                _drain(2 * concurrency)
+            _drain(0)
+    finally:
+        writer.close()
+        checkpoint.close()
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the destigmatizer command."""
+    parser = argparse.ArgumentParser(prog="destigmatizer",
+                                     description="Destigmatize drug-related language in bulk")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Process a JSONL or CSV file with checkpointing")
+    run.add_argument("input", help="Input JSONL or CSV file")
+    run.add_argument("--output", "-o", required=True, help="Output JSONL or CSV file")
+    run.add_argument("--input-format", choices=FORMATS, help="Default: from the file extension")
+    run.add_argument("--output-format", choices=FORMATS, help="Default: from the file extension")
+    run.add_argument("--text-field", default="text", help="Input field holding the post text")
+    run.add_argument("--id-field", help="Input field with a unique id (default: record position)")
+    run.add_argument("--journal", help="Checkpoint journal (default: OUTPUT.journal)")
+    run.add_argument("--restart", action="store_true",
+                     help="Ignore an existing journal and start over")
+    run.add_argument("--limit", type=int, help="Process at most this many input records")
+    _add_pipeline_arguments(run)
+    run.add_argument("--verbose", "-v", action="store_true", help="Print progress")
+
+    frame = subparsers.add_parser(
+        "frame", help="Add result columns to a Parquet, Arrow, CSV or JSONL table")
+    frame.add_argument("input", help="Input .parquet, .arrow/.feather, .csv or .jsonl file")
+    frame.add_argument("--output", "-o", required=True, help="Output file, any of the same formats")
+    frame.add_argument("--text-col", default="text", help="Column holding the post text")
+    frame.add_argument("--prefix", default="", help="Prefix for the added column names")
+    _add_pipeline_arguments(frame)
+    frame.add_argument("--packed", action="store_true",
+                       help="Classify many posts per request")
+    frame.add_argument("--dedup", action="store_true",
+                       help="Process one post per group of case, whitespace and quote variants")
+    frame.add_argument("--near-duplicates", type=float, metavar="THRESHOLD",
+                       help="Also group near-duplicate posts at this MinHash similarity")
+    return parser
+
+
+def _add_pipeline_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--client", choices=["openai", "together", "claude"],
+                        help="Client type (default: detected from API keys)")
+    parser.add_argument("--api-key", help="API key (default: environment or secrets.json)")
+    parser.add_argument("--base-url", help="Alternative API endpoint")
+    parser.add_argument("--model", help="Model or generic model name for every stage")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per request")
+    parser.add_argument("--concurrency", type=int, default=16, help="Posts in flight at once")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Adapt requests in flight with an AIMD controller")
+    parser.add_argument("--prefilter", action="store_true",
+                        help="Label posts without drug terms locally")
+    parser.add_argument("--combined", action="store_true",
+                        help="Classify drug reference and stigma in one request")
+
+
+def _build_pipeline(args: argparse.Namespace) -> Pipeline:
+    client = get_client(args.client, args.api_key, base_url=args.base_url)
+    controller = AIMDController(initial=1, max_limit=args.concurrency) if args.adaptive else None
+    near = getattr(args, "near_duplicates", None)
+    dedup = None
+    if getattr(args, "dedup", False) or near is not None:
+        dedup = Deduplicator(near_duplicates=near is not None, threshold=near or 0.85)
+    return Pipeline(client, model=args.model, retries=args.retries,
+                    prefilter=LexiconPrefilter() if args.prefilter else None,
+                    combined=args.combined, concurrency=controller,
+                    packed=getattr(args, "packed", False), dedup=dedup)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point."""
+    args = build_parser().parse_args(argv)
+    pipeline = _build_pipeline(args)
+
+    if args.command == "frame":
+        from .frame import destigmatize_file
+        frame = destigmatize_file(args.input, args.output, args.text_col, pipeline=pipeline,
+                                  max_workers=args.concurrency, prefix=args.prefix)
+        failed = int(frame[args.prefix + "error"].notna().sum())
+        print(f"{len(frame)} rows written, {failed} failed")
+        return 1 if failed else 0
+
+    stats = process_file(
+        pipeline, args.input, args.output,
+        input_format=args.input_format,
+        output_format=args.output_format,
+        text_field=args.text_field,
+        id_field=args.id_field,
+        concurrency=args.concurrency,
+        journal_path=args.journal,
+        resume=not args.restart,
+        limit=args.limit,
+        verbose=args.verbose
+    )
+    print(f"{stats['written']} written, {stats['resumed']} already done, "
+          f"{stats['failed']} failed in {stats['seconds']:.1f}s")
+    if stats["failed"]:
+        print("Rerun the same command to retry failed records.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
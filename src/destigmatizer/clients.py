@@ -2,9 +2,252 @@
 
 import os
 import json
+import math
 import time
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from .instrumentation import record_usage
+from .retry import error_status, retry_after
+
+
+class LLMClientError(Exception):
+    """Error raised by a client when a provider request fails.
+    
+    Keeps the HTTP status and Retry-After hint of the underlying SDK error,
+    so retry and concurrency policies can tell transient failures from
+    fatal ones.
+    """
+    
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        """Initialize the error.
+        
+        Args:
+            message: Error message
+            status_code: HTTP status of the failed request, if known
+            retry_after: Seconds the provider asked to wait, if given
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+    
+    @classmethod
+    def wrap(cls, provider: str, error: Exception) -> 'LLMClientError':
+        """Wrap an SDK error, copying its status and Retry-After hint."""
+        return cls(f"Error creating completion with {provider}: {str(error)}",
+                   status_code=error_status(error), retry_after=retry_after(error))
+
+
+def _to_claude_messages(messages: List[Dict[str, str]],
+                        cache_prefix: bool = False) -> Tuple[Any, List[Dict[str, Any]]]:
+    """Split messages into Claude's separate system prompt and message list.
+    
+    The first system message becomes Claude's system prompt. Later system
+    messages are few-shot answers and are sent as assistant turns.
+    
+    Args:
+        messages: List of message dictionaries
+        cache_prefix: Mark the system prompt and the last message before the
+            final user turn with cache_control, so the static prefix is
+            served from Anthropic's prompt cache
+        
+    Returns:
+        tuple: (system, claude_messages)
+    """
+    # Extract system message if present
+    system_message = next((m["content"] for m in messages if m["role"] == "system"), None)
+    
+    # Prepare the messages for Claude API by restructuring
+    claude_messages = []
+    seen_system = False
+    for m in messages:
+        if m["role"] == "system" and not seen_system:
+            seen_system = True
+            continue  # Skip the system prompt as we handle it separately
+        claude_messages.append({
+            "role": "assistant" if m["role"] == "system" else m["role"],
+            "content": m["content"]
+        })
+    
+    if not cache_prefix:
+        return system_message, claude_messages
+    
+    cache_control = {"type": "ephemeral"}
+    system = None
+    if system_message is not None:
+        system = [{"type": "text", "text": system_message, "cache_control": cache_control}]
+    if len(claude_messages) > 1:
+        last_prefix = claude_messages[-2]
+        claude_messages[-2] = {
+            "role": last_prefix["role"],
+            "content": [{"type": "text", "text": last_prefix["content"],
+                         "cache_control": cache_control}]
+        }
+    return system, claude_messages
+
+
+# Token usage of the most recent completion in the current thread or task
+_last_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar("destigmatizer_last_usage",
+                                                               default=None)
+
+
+def get_last_usage() -> Optional[Dict[str, int]]:
+    """
+    Return token usage reported by the provider for the latest completion.
+    
+    Usage is tracked per thread and per asyncio task, so concurrent callers
+    each see their own request.
+    
+    Returns:
+        dict: "input_tokens", "output_tokens", "cached_tokens" (input tokens
+            served from the provider's prompt cache) and
+            "cache_creation_tokens"; None if no usage was reported
+    """
+    return _last_usage.get()
+
+
+def _record_usage(usage: Optional[Dict[str, int]]) -> None:
+    """Store normalized usage for get_last_usage() and the active instrumentation."""
+    _last_usage.set(usage)
+    record_usage(usage)
+
+
+def _openai_usage(response: Any) -> Optional[Dict[str, int]]:
+    """Normalize usage from an OpenAI-compatible chat completion response."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached is None:
+        cached = getattr(usage, "cached_tokens", None)
+    return {
+        "input_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "output_tokens": getattr(usage, "completion_tokens", None) or 0,
+        "cached_tokens": cached or 0,
+        "cache_creation_tokens": 0
+    }
+
+
+def _claude_usage(response: Any) -> Optional[Dict[str, int]]:
+    """Normalize usage from an Anthropic messages response."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    cached = getattr(usage, "cache_read_input_tokens", None) or 0
+    created = getattr(usage, "cache_creation_input_tokens", None) or 0
+    return {
+        # Anthropic reports cached input separately from input_tokens
+        "input_tokens": (getattr(usage, "input_tokens", None) or 0) + cached + created,
+        "output_tokens": getattr(usage, "output_tokens", None) or 0,
+        "cached_tokens": cached,
+        "cache_creation_tokens": created
+    }
+
+
+# Whether completions in the current thread or task should report token
+# logprobs, and the confidence derived from the most recent one
+_confidence_requested: ContextVar[bool] = ContextVar("destigmatizer_confidence_requested",
+                                                     default=False)
+_last_confidence: ContextVar[Optional[float]] = ContextVar("destigmatizer_last_confidence",
+                                                           default=None)
+
+
+@contextmanager
+def request_confidence() -> Iterator[None]:
+    """
+    Ask clients to report a confidence score for completions in this block.
+    
+    OpenAI-compatible clients then request token logprobs, and
+    get_last_confidence() returns the probability of the first answer
+    token. Clients without logprobs support (e.g. Claude) leave it None.
+    """
+    token = _confidence_requested.set(True)
+    _last_confidence.set(None)
+    try:
+        yield
+    finally:
+        _confidence_requested.reset(token)
+
+
+def get_last_confidence() -> Optional[float]:
+    """
+    Return the confidence of the latest completion requested under request_confidence().
+    
+    Returns:
+        float: Probability (0-1) of the first non-whitespace answer token,
+            None if the provider returned no logprobs
+    """
+    return _last_confidence.get()
+
+
+def _record_confidence(response: Any) -> None:
+    """Store the first answer token's probability from an OpenAI-compatible response."""
+    if not _confidence_requested.get():
+        return
+    confidence = None
+    try:
+        logprobs = getattr(response.choices[0], "logprobs", None)
+        content = getattr(logprobs, "content", None)
+        if content:
+            first = next((t for t in content if str(t.token).strip()), content[0])
+            confidence = math.exp(first.logprob)
+        elif getattr(logprobs, "token_logprobs", None):
+            # Together reports parallel lists of tokens and logprobs
+            pairs = list(zip(logprobs.tokens, logprobs.token_logprobs))
+            first = next((p for p in pairs if str(p[0]).strip()), pairs[0])
+            confidence = math.exp(first[1])
+    except (AttributeError, IndexError, TypeError, ValueError):
+        confidence = None
+    _last_confidence.set(confidence)
+
+
+def _openai_params(temperature: float, max_tokens: int,
+                   stop: Optional[List[str]], logprobs: Any = True) -> Dict[str, Any]:
+    """Build generation keyword arguments for an OpenAI-compatible request."""
+    params: Dict[str, Any] = {"temperature": temperature, "max_tokens": max_tokens}
+    if stop:
+        # OpenAI accepts at most four stop sequences
+        params["stop"] = list(stop)[:4]
+    if _confidence_requested.get():
+        params["logprobs"] = logprobs
+    return params
+
+
+def _claude_params(temperature: float, max_tokens: int,
+                   stop: Optional[List[str]]) -> Dict[str, Any]:
+    """Build generation keyword arguments for an Anthropic messages request."""
+    params: Dict[str, Any] = {"temperature": temperature, "max_tokens": max_tokens}
+    # Anthropic rejects stop sequences made only of whitespace
+    sequences = [s for s in (stop or []) if s.strip()]
+    if sequences:
+        params["stop_sequences"] = sequences
+    return params
+
+
+def _resolve_api_key(env_var: str, api_key: Optional[str] = None) -> Optional[str]:
+    """Resolve an API key from the argument, environment or secrets.json.
+    
+    Args:
+        env_var: Environment variable (and secrets.json key) holding the key
+        api_key: Explicitly provided API key
+        
+    Returns:
+        str: API key if found, None otherwise
+    """
+    if api_key is None:
+        api_key = os.environ.get(env_var)
+        if api_key is None:
+            try:
+                with open("secrets.json") as f:
+                    secrets = json.load(f)
+                    api_key = secrets.get(env_var)
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                pass
+    return api_key
 
 
 class LLMClient(ABC):
@@ -21,7 +264,8 @@ class LLMClient(ABC):
                          messages: List[Dict[str, str]], 
                          model: Optional[str] = None, 
                          temperature: float = 0, 
-                         max_tokens: int = 1000) -> str:
+                         max_tokens: int = 1000,
+                         stop: Optional[List[str]] = None) -> str:
         """Generate a completion from the LLM.
         
         Args:
@@ -29,6 +273,7 @@ class LLMClient(ABC):
             model: Model identifier
             temperature: Sampling temperature
             max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
             
         Returns:
             str: The generated response content
@@ -44,14 +289,16 @@ class LLMClient(ABC):
 class OpenAIClient(LLMClient):
     """Client for OpenAI API."""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
         """Initialize OpenAI client.
         
         Args:
             api_key: OpenAI API key
+            base_url: Alternative API endpoint, e.g. a local stand-in server;
+                the SDK default is used if None
         """
         from openai import OpenAI
-        self.client = OpenAI(api_key=api_key)
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
     
     @property
     def client_type(self) -> str:
@@ -62,7 +309,8 @@ class OpenAIClient(LLMClient):
                          messages: List[Dict[str, str]], 
                          model: Optional[str] = None, 
                          temperature: float = 0, 
-                         max_tokens: int = 1000) -> str:
+                         max_tokens: int = 1000,
+                         stop: Optional[List[str]] = None) -> str:
         """Generate a completion from OpenAI.
         
         Args:
@@ -70,6 +318,7 @@ class OpenAIClient(LLMClient):
             model: OpenAI model to use
             temperature: Sampling temperature
             max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
             
         Returns:
             str: The generated response content
@@ -78,42 +327,37 @@ class OpenAIClient(LLMClient):
             response = self.client.chat.completions.create(
                 messages=messages,
                 model=model,
-                temperature=temperature
+                **_openai_params(temperature, max_tokens, stop)
             )
+            _record_usage(_openai_usage(response))
+            _record_confidence(response)
             return response.choices[0].message.content
         except Exception as e:
-            raise Exception(f"Error creating completion with OpenAI: {str(e)}")
+            raise LLMClientError.wrap("OpenAI", e) from e
     
     @classmethod
-    def from_env(cls, api_key: Optional[str] = None) -> 'OpenAIClient':
+    def from_env(cls, api_key: Optional[str] = None,
+                 base_url: Optional[str] = None) -> 'OpenAIClient':
         """Create an OpenAI client instance using environment variables or provided API key."""
-        if api_key is None:
-            api_key = os.environ.get("OPENAI_API_KEY")
-            if api_key is None:
-                try:
-                    with open("secrets.json") as f:
-                        secrets = json.load(f)
-                        api_key = secrets.get("OPENAI_API_KEY")
-                except (FileNotFoundError, json.JSONDecodeError, KeyError):
-                    pass
-                    
+        api_key = _resolve_api_key("OPENAI_API_KEY", api_key)
         if api_key is None:
             raise ValueError("No OpenAI API key found in environment or secrets file")
-            
-        return cls(api_key)
+        return cls(api_key, base_url=base_url)
 
 
 class TogetherClient(LLMClient):
     """Client for Together API."""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
         """Initialize Together client.
         
         Args:
             api_key: Together API key
+            base_url: Alternative API endpoint, e.g. a local stand-in server;
+                the SDK default is used if None
         """
         from together import Together
-        self.client = Together(api_key=api_key)
+        self.client = Together(api_key=api_key, base_url=base_url)
     
     @property
     def client_type(self) -> str:
@@ -124,7 +368,8 @@ class TogetherClient(LLMClient):
                          messages: List[Dict[str, str]], 
                          model: Optional[str] = None, 
                          temperature: float = 0, 
-                         max_tokens: int = 1000) -> str:
+                         max_tokens: int = 1000,
+                         stop: Optional[List[str]] = None) -> str:
         """Generate a completion from Together.
         
         Args:
@@ -132,6 +377,7 @@ class TogetherClient(LLMClient):
             model: Together model to use
             temperature: Sampling temperature
             max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
             
         Returns:
             str: The generated response content
@@ -140,42 +386,42 @@ class TogetherClient(LLMClient):
             response = self.client.chat.completions.create(
                 messages=messages,
                 model=model,
-                temperature=temperature
+                **_openai_params(temperature, max_tokens, stop, logprobs=1)
             )
+            _record_usage(_openai_usage(response))
+            _record_confidence(response)
             return response.choices[0].message.content
         except Exception as e:
-            raise Exception(f"Error creating completion with Together: {str(e)}")
+            raise LLMClientError.wrap("Together", e) from e
     
     @classmethod
-    def from_env(cls, api_key: Optional[str] = None) -> 'TogetherClient':
+    def from_env(cls, api_key: Optional[str] = None,
+                 base_url: Optional[str] = None) -> 'TogetherClient':
         """Create a Together client instance using environment variables or provided API key."""
-        if api_key is None:
-            api_key = os.environ.get("TOGETHER_API_KEY")
-            if api_key is None:
-                try:
-                    with open("secrets.json") as f:
-                        secrets = json.load(f)
-                        api_key = secrets.get("TOGETHER_API_KEY")
-                except (FileNotFoundError, json.JSONDecodeError, KeyError):
-                    pass
-                    
+        api_key = _resolve_api_key("TOGETHER_API_KEY", api_key)
         if api_key is None:
             raise ValueError("No Together API key found in environment or secrets file")
-            
-        return cls(api_key)
+        return cls(api_key, base_url=base_url)
 
 
 class ClaudeClient(LLMClient):
     """Client for Anthropic's Claude API."""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, prompt_caching: bool = False,
+                 base_url: Optional[str] = None):
         """Initialize Claude client.
         
         Args:
             api_key: Anthropic API key
+            base_url: Alternative API endpoint, e.g. a local stand-in server;
+                the SDK default is used if None
+            prompt_caching: Mark the static system prompt and few-shot
+                examples with cache_control so they are served from
+                Anthropic's prompt cache
         """
         import anthropic
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.client = anthropic.Anthropic(api_key=api_key, base_url=base_url)
+        self.prompt_caching = prompt_caching
     
     @property
     def client_type(self) -> str:
@@ -186,7 +432,8 @@ class ClaudeClient(LLMClient):
                          messages: List[Dict[str, str]], 
                          model: Optional[str] = None, 
                          temperature: float = 0, 
-                         max_tokens: int = 1000) -> str:
+                         max_tokens: int = 1000,
+                         stop: Optional[List[str]] = None) -> str:
         """Generate a completion from Claude.
         
         Args:
@@ -194,95 +441,321 @@ class ClaudeClient(LLMClient):
             model: Claude model to use
             temperature: Sampling temperature
             max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
             
         Returns:
             str: The generated response content
         """
         try:
-            # Extract system message if present
-            system_message = next((m["content"] for m in messages if m["role"] == "system"), None)
-            
-            # Prepare the messages for Claude API by restructuring
-            claude_messages = []
-            for m in messages:
-                if m["role"] == "system":
-                    continue  # Skip system messages as we handle them separately
-                claude_messages.append({
-                    "role": m["role"],
-                    "content": m["content"]
-                })
+            system_message, claude_messages = _to_claude_messages(messages, self.prompt_caching)
             
             response = self.client.messages.create(
                 model=model,
                 system=system_message,
                 messages=claude_messages,
-                temperature=temperature,
-                max_tokens=max_tokens
+                **_claude_params(temperature, max_tokens, stop)
             )
+            _record_usage(_claude_usage(response))
             return response.content[0].text
         except Exception as e:
-            raise Exception(f"Error creating completion with Claude: {str(e)}")
+            raise LLMClientError.wrap("Claude", e) from e
     
     @classmethod
-    def from_env(cls, api_key: Optional[str] = None) -> 'ClaudeClient':
+    def from_env(cls, api_key: Optional[str] = None, prompt_caching: bool = False,
+                 base_url: Optional[str] = None) -> 'ClaudeClient':
         """Create a Claude client instance using environment variables or provided API key."""
-        if api_key is None:
-            api_key = os.environ.get("ANTHROPIC_API_KEY")
-            if api_key is None:
-                try:
-                    with open("secrets.json") as f:
-                        secrets = json.load(f)
-                        api_key = secrets.get("ANTHROPIC_API_KEY")
-                except (FileNotFoundError, json.JSONDecodeError, KeyError):
-                    pass
-                    
+        api_key = _resolve_api_key("ANTHROPIC_API_KEY", api_key)
         if api_key is None:
             raise ValueError("No Anthropic API key found in environment or secrets file")
+        return cls(api_key, prompt_caching=prompt_caching, base_url=base_url)
+
+
+class AsyncLLMClient(ABC):
+    """Abstract base class for asyncio-native LLM clients."""
+    
+    @property
+    @abstractmethod
+    def client_type(self) -> str:
+        """Return the type of this client."""
+        pass
+    
+    @abstractmethod
+    async def acreate_completion(self, 
+                                messages: List[Dict[str, str]], 
+                                model: Optional[str] = None, 
+                                temperature: float = 0, 
+                                max_tokens: int = 1000,
+                                stop: Optional[List[str]] = None) -> str:
+        """Generate a completion from the LLM without blocking the event loop.
+        
+        Args:
+            messages: List of message dictionaries
+            model: Model identifier
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
+            
+        Returns:
+            str: The generated response content
+        """
+        pass
+    
+    @classmethod
+    def from_env(cls, api_key: Optional[str] = None) -> 'AsyncLLMClient':
+        """Create a client instance using environment variables or provided API key."""
+        pass
+
+
+class AsyncOpenAIClient(AsyncLLMClient):
+    """Async client for OpenAI API."""
+    
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
+        """Initialize async OpenAI client.
+        
+        Args:
+            api_key: OpenAI API key
+            base_url: Alternative API endpoint, e.g. a local stand-in server;
+                the SDK default is used if None
+        """
+        from openai import AsyncOpenAI
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+    
+    @property
+    def client_type(self) -> str:
+        """Return the type of this client."""
+        return "openai"
+    
+    async def acreate_completion(self, 
+                                messages: List[Dict[str, str]], 
+                                model: Optional[str] = None, 
+                                temperature: float = 0, 
+                                max_tokens: int = 1000,
+                                stop: Optional[List[str]] = None) -> str:
+        """Generate a completion from OpenAI.
+        
+        Args:
+            messages: List of message dictionaries
+            model: OpenAI model to use
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
             
-        return cls(api_key)
+        Returns:
+            str: The generated response content
+        """
+        try:
+            response = await self.client.chat.completions.create(
+                messages=messages,
+                model=model,
+                **_openai_params(temperature, max_tokens, stop)
+            )
+            _record_usage(_openai_usage(response))
+            _record_confidence(response)
+            return response.choices[0].message.content
+        except Exception as e:
+            raise LLMClientError.wrap("OpenAI", e) from e
+    
+    @classmethod
+    def from_env(cls, api_key: Optional[str] = None,
+                 base_url: Optional[str] = None) -> 'AsyncOpenAIClient':
+        """Create an async OpenAI client using environment variables or provided API key."""
+        api_key = _resolve_api_key("OPENAI_API_KEY", api_key)
+        if api_key is None:
+            raise ValueError("No OpenAI API key found in environment or secrets file")
+        return cls(api_key, base_url=base_url)
 
 
-def get_client(client_type: str = None, api_key: str = None) -> LLMClient:
+class AsyncTogetherClient(AsyncLLMClient):
+    """Async client for Together API."""
+    
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
+        """Initialize async Together client.
+        
+        Args:
+            api_key: Together API key
+            base_url: Alternative API endpoint, e.g. a local stand-in server;
+                the SDK default is used if None
+        """
+        from together import AsyncTogether
+        self.client = AsyncTogether(api_key=api_key, base_url=base_url)
+    
+    @property
+    def client_type(self) -> str:
+        """Return the type of this client."""
+        return "together"
+    
+    async def acreate_completion(self, 
+                                messages: List[Dict[str, str]], 
+                                model: Optional[str] = None, 
+                                temperature: float = 0, 
+                                max_tokens: int = 1000,
+                                stop: Optional[List[str]] = None) -> str:
+        """Generate a completion from Together.
+        
+        Args:
+            messages: List of message dictionaries
+            model: Together model to use
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
+            
+        Returns:
+            str: The generated response content
+        """
+        try:
+            response = await self.client.chat.completions.create(
+                messages=messages,
+                model=model,
+                **_openai_params(temperature, max_tokens, stop, logprobs=1)
+            )
+            _record_usage(_openai_usage(response))
+            _record_confidence(response)
+            return response.choices[0].message.content
+        except Exception as e:
+            raise LLMClientError.wrap("Together", e) from e
+    
+    @classmethod
+    def from_env(cls, api_key: Optional[str] = None,
+                 base_url: Optional[str] = None) -> 'AsyncTogetherClient':
+        """Create an async Together client using environment variables or provided API key."""
+        api_key = _resolve_api_key("TOGETHER_API_KEY", api_key)
+        if api_key is None:
+            raise ValueError("No Together API key found in environment or secrets file")
+        return cls(api_key, base_url=base_url)
+
+
+class AsyncClaudeClient(AsyncLLMClient):
+    """Async client for Anthropic's Claude API."""
+    
+    def __init__(self, api_key: str, prompt_caching: bool = False,
+                 base_url: Optional[str] = None):
+        """Initialize async Claude client.
+        
+        Args:
+            api_key: Anthropic API key
+            base_url: Alternative API endpoint, e.g. a local stand-in server;
+                the SDK default is used if None
+            prompt_caching: Mark the static system prompt and few-shot
+                examples with cache_control so they are served from
+                Anthropic's prompt cache
+        """
+        import anthropic
+        self.client = anthropic.AsyncAnthropic(api_key=api_key, base_url=base_url)
+        self.prompt_caching = prompt_caching
+    
+    @property
+    def client_type(self) -> str:
+        """Return the type of this client."""
+        return "claude"
+    
+    async def acreate_completion(self, 
+                                messages: List[Dict[str, str]], 
+                                model: Optional[str] = None, 
+                                temperature: float = 0, 
+                                max_tokens: int = 1000,
+                                stop: Optional[List[str]] = None) -> str:
+        """Generate a completion from Claude.
+        
+        Args:
+            messages: List of message dictionaries
+            model: Claude model to use
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
+            
+        Returns:
+            str: The generated response content
+        """
+        try:
+            system_message, claude_messages = _to_claude_messages(messages, self.prompt_caching)
+            
+            response = await self.client.messages.create(
+                model=model,
+                system=system_message,
+                messages=claude_messages,
+                **_claude_params(temperature, max_tokens, stop)
+            )
+            _record_usage(_claude_usage(response))
+            return response.content[0].text
+        except Exception as e:
+            raise LLMClientError.wrap("Claude", e) from e
+    
+    @classmethod
+    def from_env(cls, api_key: Optional[str] = None, prompt_caching: bool = False,
+                 base_url: Optional[str] = None) -> 'AsyncClaudeClient':
+        """Create an async Claude client using environment variables or provided API key."""
+        api_key = _resolve_api_key("ANTHROPIC_API_KEY", api_key)
+        if api_key is None:
+            raise ValueError("No Anthropic API key found in environment or secrets file")
+        return cls(api_key, prompt_caching=prompt_caching, base_url=base_url)
+
+
+def get_client(client_type: str = None, api_key: str = None,
+               base_url: Optional[str] = None, prompt_caching: bool = False) -> LLMClient:
     """Factory function to create the appropriate client based on type.
     
     Args:
         client_type: Type of client ("openai", "together", or "claude")
         api_key: API key to use
+        base_url: Alternative API endpoint, e.g. a local stand-in server
+        prompt_caching: Mark the static prompt prefix for Anthropic prompt
+            caching; only used by Claude clients
         
     Returns:
         LLMClient: An instance of the appropriate client
     """
     if client_type is None:
-        # Try to determine from environment variables
-        if os.environ.get("OPENAI_API_KEY"):
-            client_type = "openai"
-        elif os.environ.get("TOGETHER_API_KEY"):
-            client_type = "together"
-        elif os.environ.get("ANTHROPIC_API_KEY"):
-            client_type = "claude"
-        else:
-            # Check secrets.json
-            try:
-                with open("secrets.json") as f:
-                    secrets = json.load(f)
-                    if secrets.get("OPENAI_API_KEY"):
-                        client_type = "openai"
-                    elif secrets.get("TOGETHER_API_KEY"):
-                        client_type = "together"
-                    elif secrets.get("ANTHROPIC_API_KEY"):
-                        client_type = "claude"
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass
+        for candidate, env_var in (("openai", "OPENAI_API_KEY"),
+                                   ("together", "TOGETHER_API_KEY"),
+                                   ("claude", "ANTHROPIC_API_KEY")):
+            if _resolve_api_key(env_var):
+                client_type = candidate
+                break
+    
+    if client_type is None:
+        raise ValueError("Could not determine client type from environment variables or secrets")
+    
+    if client_type.lower() == "openai":
+        return OpenAIClient.from_env(api_key, base_url=base_url)
+    elif client_type.lower() == "together":
+        return TogetherClient.from_env(api_key, base_url=base_url)
+    elif client_type.lower() == "claude":
+        return ClaudeClient.from_env(api_key, prompt_caching=prompt_caching, base_url=base_url)
+    else:
+        raise ValueError(f"Unsupported client type: {client_type}")
+
+
+def get_async_client(client_type: str = None, api_key: str = None,
+                     base_url: Optional[str] = None, prompt_caching: bool = False) -> AsyncLLMClient:
+    """Factory function to create the appropriate async client based on type.
+    
+    Args:
+        client_type: Type of client ("openai", "together", or "claude")
+        api_key: API key to use
+        base_url: Alternative API endpoint, e.g. a local stand-in server
+        prompt_caching: Mark the static prompt prefix for Anthropic prompt
+            caching; only used by Claude clients
+        
+    Returns:
+        AsyncLLMClient: An instance of the appropriate async client
+    """
+    if client_type is None:
+        for candidate, env_var in (("openai", "OPENAI_API_KEY"),
+                                   ("together", "TOGETHER_API_KEY"),
+                                   ("claude", "ANTHROPIC_API_KEY")):
+            if _resolve_api_key(env_var):
+                client_type = candidate
+                break
     
     if client_type is None:
         raise ValueError("Could not determine client type from environment variables or secrets")
     
     if client_type.lower() == "openai":
-        return OpenAIClient.from_env(api_key)
+        return AsyncOpenAIClient.from_env(api_key, base_url=base_url)
     elif client_type.lower() == "together":
-        return TogetherClient.from_env(api_key)
+        return AsyncTogetherClient.from_env(api_key, base_url=base_url)
     elif client_type.lower() == "claude":
-        return ClaudeClient.from_env(api_key)
+        return AsyncClaudeClient.from_env(api_key, prompt_caching=prompt_caching, base_url=base_url)
     else:
         raise ValueError(f"Unsupported client type: {client_type}")
 
@@ -297,7 +770,7 @@ def detect_client_type(client: Any) -> str:
     Returns:
         str: Detected client type ("openai", "together", "claude", or "unknown")
     """
-    if isinstance(client, LLMClient):
+    if isinstance(client, (LLMClient, AsyncLLMClient)):
         return client.client_type
     
     # For backward compatibility with raw clients
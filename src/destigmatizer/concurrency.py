@@ -0,0 +1,288 @@
+"""Adaptive (AIMD) concurrency control driven by provider feedback."""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from .clients import LLMClient, detect_client_type
+from .retry import error_status, _error_chain
+
+
+# HTTP statuses that signal an overloaded or degraded provider
+OVERLOAD_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+_OVERLOAD_MARKERS = ("rate limit", "rate_limit", "too many requests", "overloaded",
+                     "timed out", "timeout", "temporarily unavailable")
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """Return True if an error means the provider is overloaded.
+
+    The HTTP status is looked up on the error and its causes; errors
+    without one are checked for timeouts and well-known overload wording.
+
+    Args:
+        error: Exception raised by a completion call
+
+    Returns:
+        bool: Whether the error is a 429, 5xx, timeout or similar
+    """
+    status = error_status(error)
+    if status is not None:
+        return status in OVERLOAD_STATUSES
+    if any(isinstance(e, (TimeoutError, asyncio.TimeoutError)) for e in _error_chain(error)):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in _OVERLOAD_MARKERS)
+
+
+class AIMDController:
+    """Additive-increase, multiplicative-decrease limit on in-flight requests.
+
+    Every successful request with healthy latency raises the limit by
+    increase / limit, i.e. by roughly `increase` per full window of
+    requests. An overload error or a latency spike multiplies the limit by
+    decrease_factor, at most once per window: only requests started after
+    the previous decrease can trigger the next one.
+
+    Latency spikes are judged against a separate baseline per request
+    kind (see release()), so a slow rewrite is not mistaken for a spike
+    by comparison with fast classification calls.
+
+    The controller gates both threads (acquire) and coroutines (aacquire).
+    """
+
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 256,
+                 increase: float = 1.0, decrease_factor: float = 0.5,
+                 latency_tolerance: float = 2.0, min_spike: float = 0.05,
+                 smoothing: float = 0.1):
+        """Configure the controller.
+
+        Args:
+            initial: Starting limit
+            min_limit: Lowest limit the controller backs off to
+            max_limit: Highest limit the controller grows to
+            increase: Additive increase per window of successful requests
+            decrease_factor: Multiplier applied to the limit on overload
+            latency_tolerance: A success slower than this multiple of the
+                smoothed baseline latency of its kind counts as a latency spike
+            min_spike: A spike must also exceed the baseline by this many
+                seconds, so jitter on very fast responses is ignored
+            smoothing: Weight of each new sample in the baseline latency
+        """
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= initial <= max_limit")
+        if not 0 < decrease_factor < 1:
+            raise ValueError("decrease_factor must be between 0 and 1")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.min_spike = min_spike
+        self.smoothing = smoothing
+
+        self._limit = float(initial)
+        self.in_flight = 0
+        self.baselines: Dict[Hashable, float] = {}
+        self.increases = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def limit(self) -> int:
+        """Current number of requests allowed in flight."""
+        return int(self._limit)
+
+    def acquire(self) -> float:
+        """Block until a request may start.
+
+        Returns:
+            float: Start time to pass back to release()
+        """
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+        return time.monotonic()
+
+    async def aacquire(self) -> float:
+        """Wait, without blocking the event loop, until a request may start.
+
+        Returns:
+            float: Start time to pass back to release()
+        """
+        while True:
+            with self._cond:
+                if self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return time.monotonic()
+                loop = asyncio.get_running_loop()
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def _wake(self) -> None:
+        # Called with the lock held
+        self._cond.notify_all()
+        for loop, waiter in self._async_waiters:
+            loop.call_soon_threadsafe(_resolve, waiter)
+        self._async_waiters.clear()
+
+    def release(self, started: float, error: Optional[BaseException] = None,
+                key: Hashable = None) -> None:
+        """Finish a request and adjust the limit from its outcome.
+
+        Args:
+            started: Value returned by acquire() or aacquire()
+            error: Exception raised by the request, None on success
+            key: Kind of request, e.g. (model, max_tokens); its latency is
+                compared only with the baseline of earlier requests of the
+                same kind
+        """
+        latency = time.monotonic() - started
+        with self._cond:
+            self.in_flight -= 1
+            if error is not None:
+                if is_overload_error(error):
+                    self._decrease(started)
+            else:
+                baseline = self.baselines.get(key)
+                if baseline is not None and latency > max(baseline * self.latency_tolerance,
+                                                          baseline + self.min_spike):
+                    self._decrease(started)
+                else:
+                    self._increase()
+                # The baseline keeps adapting, so a provider that is slower
+                # for good stops counting as a spike
+                if baseline is None:
+                    self.baselines[key] = latency
+                else:
+                    self.baselines[key] = baseline + self.smoothing * (latency - baseline)
+            self._wake()
+
+    def _increase(self) -> None:
+        if self._limit < self.max_limit:
+            self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+            self.increases += 1
+
+    def _decrease(self, started: float) -> None:
+        # Requests already in flight at the last decrease belong to the
+        # window that was just penalized
+        if started < self._last_decrease:
+            return
+        self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+        self._last_decrease = time.monotonic()
+        self.decreases += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current limit, requests in flight, baselines and adjustment counts."""
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "baseline_latency": dict(self.baselines),
+                "increases": self.increases,
+                "decreases": self.decreases
+            }
+
+    def to_prometheus(self, prefix: str = "destigmatizer") -> str:
+        """Render the limit and in-flight count as Prometheus gauges."""
+        stats = self.stats()
+        return "\n".join([
+            f"# HELP {prefix}_concurrency_limit Requests currently allowed in flight.",
+            f"# TYPE {prefix}_concurrency_limit gauge",
+            f"{prefix}_concurrency_limit {stats['limit']}",
+            f"# HELP {prefix}_concurrency_in_flight Requests currently in flight.",
+            f"# TYPE {prefix}_concurrency_in_flight gauge",
+            f"{prefix}_concurrency_in_flight {stats['in_flight']}",
+        ]) + "\n"
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AdaptiveConcurrencyClient(LLMClient):
+    """LLM client wrapper that admits requests through an AIMDController."""
+
+    def __init__(self, client: Any, controller: Optional[AIMDController] = None):
+        """Wrap a client.
+
+        Args:
+            client: LLM client instance to wrap
+            controller: Controller to share; a default one is created if None
+        """
+        self.client = client
+        self.controller = controller if controller is not None else AIMDController()
+
+    @property
+    def client_type(self) -> str:
+        """Return the type of the wrapped client."""
+        return detect_client_type(self.client)
+
+    def create_completion(self,
+                         messages: List[Dict[str, str]],
+                         model: Optional[str] = None,
+                         temperature: float = 0,
+                         max_tokens: int = 1000,
+                         stop: Optional[List[str]] = None) -> str:
+        """Wait for a free slot, then call the wrapped client.
+
+        Args:
+            messages: List of message dictionaries
+            model: Model identifier
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
+
+        Returns:
+            str: The generated response content
+        """
+        # Stages differ in max_tokens, so this separates e.g. rewrites
+        # from classification calls
+        key = (model, max_tokens)
+        started = self.controller.acquire()
+        error: Optional[BaseException] = None
+        try:
+            return self.client.create_completion(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stop=stop
+            )
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # Also runs on cancellation, so the slot is never leaked
+            self.controller.release(started, error, key)
+
+    async def acreate_completion(self,
+                                messages: List[Dict[str, str]],
+                                model: Optional[str] = None,
+                                temperature: float = 0,
+                                max_tokens: int = 1000,
+                                stop: Optional[List[str]] = None) -> str:
+        """Async variant of create_completion() for wrapped async clients."""
+        key = (model, max_tokens)
+        started = await self.controller.aacquire()
+        error: Optional[BaseException] = None
+        try:
+            return await self.client.acreate_completion(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stop=stop
+            )
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.controller.release(started, error, key)
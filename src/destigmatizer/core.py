@@ -1,16 +1,28 @@
 """Core functionality for the reframe package."""
 
-from typing import Tuple, Dict, Any, Optional, Union
+from typing import Tuple, Dict, Any, Iterable, List, Optional, Union
+from .batch import BatchResult, DEFAULT_MAX_WORKERS
 from .clients import get_client
-from .classifiers import DrugClassifier, StigmaClassifier
+from .cache import CachedClient
+from .ratelimit import RateLimitedClient
+from .concurrency import AIMDController
+from .prefilter import LexiconPrefilter
+from .classifiers import DrugClassifier, StigmaClassifier, CombinedClassifier
 from .analyzers import StyleAnalyzer, EmotionAnalyzer, LLMBasedAnalyzer
 from .rewriters import DestigmatizingRewriter
+from .pipeline import Pipeline
+from .instrumentation import Instrumentation
 from .clients import detect_client_type
-from .utils import get_model_mapping
+from .analyzers import warmup_style_analysis
+from .utils import get_model_mapping, load_user_model_configs
 
 
 def initialize(api_key: Optional[str] = None, client: Optional[Any] = None, 
-              client_type: Optional[str] = None) -> Any:
+              client_type: Optional[str] = None, cache_path: Optional[str] = None,
+              cache_ttl: Optional[float] = None,
+              cache_max_entries: Optional[int] = None,
+              base_url: Optional[str] = None, rpm: Optional[float] = None,
+              tpm: Optional[float] = None, prompt_caching: bool = False) -> Any:
     """
     Initialize and return a client for the Reframe library.
     
@@ -18,6 +30,18 @@ def initialize(api_key: Optional[str] = None, client: Optional[Any] = None,
         api_key: API key for the language model service
         client: Pre-configured client instance
         client_type: Type of client ("openai", "together", or "claude")
+        cache_path: Path to a SQLite completion cache; if given, the client
+            is wrapped in a CachedClient
+        cache_ttl: Seconds after which cached completions expire
+        cache_max_entries: Maximum number of cached completions
+        base_url: Alternative API endpoint for the created client, e.g. a
+            local stand-in server
+        rpm: Requests-per-minute budget; if rpm or tpm is given, the client
+            is wrapped in a RateLimitedClient sharing the process-wide
+            limiter for its provider and model
+        tpm: Tokens-per-minute budget
+        prompt_caching: Mark the static prompt prefix for Anthropic prompt
+            caching when a Claude client is created
         
     Returns:
         Any: Client instance
@@ -26,15 +50,35 @@ def initialize(api_key: Optional[str] = None, client: Optional[Any] = None,
         ValueError: If neither api_key nor client is provided, or if client_type is unsupported
     """
     if client:
-        return client
+        pass
     elif api_key:
-        return get_client(client_type, api_key)
+        client = get_client(client_type, api_key, base_url=base_url,
+                            prompt_caching=prompt_caching)
     else:
         raise ValueError("Either api_key or client must be provided")
+    
+    if rpm or tpm:
+        client = RateLimitedClient(client, rpm=rpm, tpm=tpm)
+    if cache_path:
+        client = CachedClient(client, path=cache_path, ttl=cache_ttl,
+                              max_entries=cache_max_entries)
+    return client
+
+
+def warmup() -> None:
+    """
+    Preload everything the pipeline would otherwise load on first use.
+    
+    Locates (downloading if needed) the NLTK tokenizer and tagger, loads
+    them and the lexical richness module, and reads the user config. Call
+    this once at worker start-up to keep that cost off the first request.
+    """
+    warmup_style_analysis()
+    load_user_model_configs()
 
 
 def classify_if_drug(text: str, client: Any, model: Optional[str] = None,
-                    retries: int = 2) -> str:
+                    retries: int = 2, prefilter: Optional[LexiconPrefilter] = None) -> str:
     """
     Classify if text contains drug-related content.
     
@@ -43,11 +87,13 @@ def classify_if_drug(text: str, client: Any, model: Optional[str] = None,
         client: Client instance
         model: Model to use
         retries: Number of retries on failure
+        prefilter: Optional LexiconPrefilter; posts without drug terms are
+            labeled non-drug-related without an LLM call
         
     Returns:
         str: 'D' for drug-related, 'ND' for non-drug-related, 'skipped' on error
     """
-    drug_classifier = DrugClassifier(client)
+    drug_classifier = DrugClassifier(client, prefilter=prefilter)
     return drug_classifier.classify(text, model=model, retries=retries)
 
 
@@ -69,6 +115,73 @@ def classify_if_stigma(text: str, client: Any, model: Optional[str] = None,
     return stigma_classifier.classify(text, model=model, retries=retries)
 
 
+def classify_drug_and_stigma(text: str, client: Any, model: Optional[str] = None,
+                             retries: int = 2,
+                             prefilter: Optional[LexiconPrefilter] = None) -> Dict[str, Any]:
+    """
+    Classify drug reference and stigma in a single LLM request.
+    
+    Args:
+        text: Text content to classify
+        client: Client instance
+        model: Model to use
+        retries: Number of retries on failure
+        prefilter: Optional LexiconPrefilter; posts without drug terms are
+            labeled non-drug-related without an LLM call
+        
+    Returns:
+        dict: "drug" ('d', 'nd' or 'skipped'), "stigma" ('s', 'ns' or None),
+            "attributes" and "explanation" (StigmaClassifier text format)
+    """
+    combined_classifier = CombinedClassifier(client, prefilter=prefilter)
+    return combined_classifier.classify(text, model=model, retries=retries)
+
+
+def classify_if_drug_many(texts: Iterable[str], client: Any, model: Optional[str] = None,
+                          retries: int = 2,
+                          max_workers: int = DEFAULT_MAX_WORKERS,
+                          prefilter: Optional[LexiconPrefilter] = None) -> List[BatchResult]:
+    """
+    Classify many texts for drug-related content concurrently.
+    
+    Args:
+        texts: Text contents to classify
+        client: Client instance
+        model: Model to use
+        retries: Number of retries on failure, per text
+        max_workers: Maximum number of requests in flight at once
+        prefilter: Optional LexiconPrefilter; posts without drug terms are
+            labeled non-drug-related without an LLM call
+        
+    Returns:
+        list: One BatchResult per text, in input order
+    """
+    drug_classifier = DrugClassifier(client, prefilter=prefilter)
+    return drug_classifier.classify_many(texts, model=model, retries=retries,
+                                         max_workers=max_workers)
+
+
+def classify_if_stigma_many(texts: Iterable[str], client: Any, model: Optional[str] = None,
+                            retries: int = 2,
+                            max_workers: int = DEFAULT_MAX_WORKERS) -> List[BatchResult]:
+    """
+    Classify many texts for stigmatizing language concurrently.
+    
+    Args:
+        texts: Text contents to classify
+        client: Client instance
+        model: Model to use
+        retries: Number of retries on failure, per text
+        max_workers: Maximum number of requests in flight at once
+        
+    Returns:
+        list: One BatchResult per text, in input order
+    """
+    stigma_classifier = StigmaClassifier(client)
+    return stigma_classifier.classify_many(texts, model=model, retries=retries,
+                                           max_workers=max_workers)
+
+
 def analyze_text_llm(text: str, client: Any, model: Optional[str] = None) -> Dict[str, Any]:
     """
     Analyze text style and emotion.
@@ -137,7 +250,11 @@ def rewrite_to_destigma(text: str, explanation: str, style_instruct: str,
         retries=retries
     )
     
-def analyze_and_rewrite_text(text: str, client: Any, model: Optional[str] = None, retries: int = 2) -> str:
+def analyze_and_rewrite_text(text: str, client: Any, model: Optional[str] = None, retries: int = 2,
+                             prefilter: Optional[LexiconPrefilter] = None,
+                             combined: bool = False,
+                             instrumentation: Optional[Instrumentation] = None,
+                             speculative: bool = False) -> str:
     """
     Analyze and rewrite text in a single workflow.
     
@@ -147,60 +264,223 @@ def analyze_and_rewrite_text(text: str, client: Any, model: Optional[str] = None
     3. If stigmatizing, analyze the text style and emotion
     4. If stigmatizing, rewrite to remove stigmatizing language
     
+    Independent stages overlap: style analysis runs while the emotion
+    request is in flight and, with speculative, stigma classification
+    starts together with drug classification.
+    
     Args:
         text: Text to analyze and potentially rewrite
         client: Client instance (from reframe.initialize())
         model: Model to use for all operations
         retries: Number of retries on failure
+        prefilter: Optional LexiconPrefilter; posts without drug terms are
+            labeled non-drug-related without an LLM call
+        combined: Perform steps 1 and 2 in a single request with
+            CombinedClassifier, falling back to separate requests if the
+            combined answer cannot be parsed
+        instrumentation: Optional Instrumentation receiving per-stage timing,
+            token, retry and cache-hit events
+        speculative: Classify stigma at the same time as drug reference,
+            discarding the stigma result for non-drug-related posts
         
     Returns:
         str: The rewritten text if stigmatizing and drug-related,
              otherwise returns the original text
     """
-    # Step 1: Classify if drug-related
-    print("Step 1: Classifying drug-related content...")
-    drug_result = classify_if_drug(text, client, model, retries)
-    
-    # If not drug-related, return the original text
-    if drug_result != 'D':
-        print("Text is not drug-related. Skipping further analysis.")
-        return text
+    pipeline = Pipeline(client, model=model, retries=retries, prefilter=prefilter,
+                        combined=combined, verbose=True, instrumentation=instrumentation,
+                        speculative=speculative)
+    return pipeline.run(text)
+
+
+def analyze_and_rewrite_many(texts: Iterable[str], client: Any, model: Optional[str] = None,
+                             retries: int = 2,
+                             max_workers: Optional[int] = None,
+                             prefilter: Optional[LexiconPrefilter] = None,
+                             combined: bool = False,
+                             instrumentation: Optional[Instrumentation] = None,
+                             concurrency: Optional[AIMDController] = None,
+                             speculative: bool = False) -> List[BatchResult]:
+    """
+    Run the analyze-and-rewrite workflow over many texts concurrently.
     
-    # Step 2: Classify if stigmatizing
-    print("Step 2: Checking for stigmatizing language...")
-    stigma_result = classify_if_stigma(text, client, model, retries)
+    Each text goes through the same steps as analyze_and_rewrite_text().
     
-    # Check if text is stigmatizing (starts with 's')
-    is_stigmatizing = stigma_result.startswith('s')
+    Args:
+        texts: Texts to analyze and potentially rewrite
+        client: Client instance (from reframe.initialize())
+        model: Model to use for all operations
+        retries: Number of retries on failure, per request
+        max_workers: Maximum number of texts in flight at once, defaults to
+            the controller's max_limit with adaptive concurrency and to
+            DEFAULT_MAX_WORKERS otherwise
+        prefilter: Optional LexiconPrefilter; posts without drug terms are
+            labeled non-drug-related without an LLM call
+        combined: Classify drug reference and stigma in a single request
+        instrumentation: Optional Instrumentation receiving per-stage timing,
+            token, retry and cache-hit events
+        concurrency: Optional AIMDController that adapts the number of
+            LLM requests in flight to provider latency and errors
+        speculative: Classify stigma at the same time as drug reference
+        
+    Returns:
+        list: One BatchResult per text, in input order
+    """
+    pipeline = Pipeline(client, model=model, retries=retries, prefilter=prefilter,
+                        combined=combined, instrumentation=instrumentation,
+                        concurrency=concurrency, speculative=speculative)
+    return pipeline.run_many(texts, max_workers=max_workers)
+
+
+async def aclassify_if_drug(text: str, client: Any, model: Optional[str] = None,
+                            retries: int = 2,
+                            prefilter: Optional[LexiconPrefilter] = None) -> str:
+    """
+    Classify if text contains drug-related content using an async client.
     
-    # If not stigmatizing, return the original text
-    if not is_stigmatizing:
-        print("No stigmatizing content detected. Skipping further analysis.")
-        return text
+    Args:
+        text: Text content to classify
+        client: Async client instance
+        model: Model to use
+        retries: Number of retries on failure
+        prefilter: Optional LexiconPrefilter; posts without drug terms are
+            labeled non-drug-related without an LLM call
+        
+    Returns:
+        str: 'D' for drug-related, 'ND' for non-drug-related, 'skipped' on error
+    """
+    drug_classifier = DrugClassifier(client, prefilter=prefilter)
+    return await drug_classifier.aclassify(text, model=model, retries=retries)
+
+
+async def aclassify_if_stigma(text: str, client: Any, model: Optional[str] = None,
+                              retries: int = 2) -> str:
+    """
+    Classify if text contains stigmatizing language using an async client.
     
-    # Step 3: Analyze text style
-    print("Step 3: Analyzing text style and emotion...")
-    style_result = analyze_text_llm(text, client, model)
+    Args:
+        text: Text content to classify
+        client: Async client instance
+        model: Model to use
+        retries: Number of retries on failure
         
-    # Step 4: Rewrite to remove stigma
-    print("Step 4: Rewriting stigmatizing content...")
-    # Extract explanation part from stigma classification
-    if ', ' in stigma_result:
-        _, explanation = stigma_result.split(', ', 1)
-    else:
-        explanation = stigma_result
+    Returns:
+        str: Classification result with explanation if stigmatizing
+    """
+    stigma_classifier = StigmaClassifier(client)
+    return await stigma_classifier.aclassify(text, model=model, retries=retries)
+
+
+async def aanalyze_text_llm(text: str, client: Any, model: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Analyze text style and emotion using an async client.
     
-    # Convert style result to string for the rewriter
-    style_instruct = str(style_result)
+    Args:
+        text: Text to analyze
+        client: Async client instance
+        model: Model to use
+        
+    Returns:
+        dict: Analysis results
+    """
+    style_analyzer = StyleAnalyzer()
+    emotion_analyzer = EmotionAnalyzer(client)
+    analyzer = LLMBasedAnalyzer(client, emotion_analyzer, style_analyzer)
+    return await analyzer.aanalyze(text, model=model)
+
+
+async def arewrite_to_destigma(text: str, explanation: str, style_instruct: str,
+                               model: Optional[str] = None, client: Any = None,
+                               retries: int = 2) -> str:
+    """
+    Rewrite text to remove stigmatizing language using an async client.
     
-    # Rewrite the text
-    rewritten_text = rewrite_to_destigma(
+    Args:
+        text: Text to rewrite
+        explanation: Explanation of stigma from classifier
+        style_instruct: Style instructions to maintain
+        model: Model to use
+        client: Async client instance
+        retries: Number of retries on failure
+        
+    Returns:
+        str: Rewritten text
+    """
+    rewriter = DestigmatizingRewriter(client)
+    return await rewriter.arewrite(
         text=text,
         explanation=explanation,
         style_instruct=style_instruct,
         model=model,
-        client=client,
         retries=retries
     )
+
+
+async def aanalyze_and_rewrite_text(text: str, client: Any, model: Optional[str] = None,
+                                    retries: int = 2,
+                                    prefilter: Optional[LexiconPrefilter] = None,
+                                    combined: bool = False,
+                                    instrumentation: Optional[Instrumentation] = None,
+                                    speculative: bool = False) -> str:
+    """
+    Analyze and rewrite text in a single workflow using an async client.
+    
+    Runs the same steps as analyze_and_rewrite_text() without blocking
+    the event loop.
+    
+    Args:
+        text: Text to analyze and potentially rewrite
+        client: Async client instance (from get_async_client())
+        model: Model to use for all operations
+        retries: Number of retries on failure
+        prefilter: Optional LexiconPrefilter; posts without drug terms are
+            labeled non-drug-related without an LLM call
+        combined: Classify drug reference and stigma in a single request
+        instrumentation: Optional Instrumentation receiving per-stage timing,
+            token, retry and cache-hit events
+        speculative: Classify stigma at the same time as drug reference,
+            discarding the stigma result for non-drug-related posts
+        
+    Returns:
+        str: The rewritten text if stigmatizing and drug-related,
+             otherwise returns the original text
+    """
+    pipeline = Pipeline(client, model=model, retries=retries, prefilter=prefilter,
+                        combined=combined, instrumentation=instrumentation,
+                        speculative=speculative)
+    return await pipeline.arun(text)
+
+
+async def aanalyze_and_rewrite_many(texts: Iterable[str], client: Any, model: Optional[str] = None,
+                                    retries: int = 2,
+                                    max_concurrency: int = 100,
+                                    prefilter: Optional[LexiconPrefilter] = None,
+                                    combined: bool = False,
+                                    instrumentation: Optional[Instrumentation] = None,
+                                    concurrency: Optional[AIMDController] = None,
+                                    speculative: bool = False) -> List[BatchResult]:
+    """
+    Run the async analyze-and-rewrite workflow over many texts.
     
-    return rewritten_text
+    Args:
+        texts: Texts to analyze and potentially rewrite
+        client: Async client instance (from get_async_client())
+        model: Model to use for all operations
+        retries: Number of retries on failure, per request
+        max_concurrency: Maximum number of texts in flight at once
+        prefilter: Optional LexiconPrefilter; posts without drug terms are
+            labeled non-drug-related without an LLM call
+        combined: Classify drug reference and stigma in a single request
+        instrumentation: Optional Instrumentation receiving per-stage timing,
+            token, retry and cache-hit events
+        concurrency: Optional AIMDController that adapts the number of
+            LLM requests in flight to provider latency and errors
+        speculative: Classify stigma at the same time as drug reference
+        
+    Returns:
+        list: One BatchResult per text, in input order
+    """
+    pipeline = Pipeline(client, model=model, retries=retries, prefilter=prefilter,
+                        combined=combined, instrumentation=instrumentation,
+                        concurrency=concurrency, speculative=speculative)
+    return await pipeline.arun_many(texts, max_concurrency=max_concurrency)
@@ -0,0 +1,239 @@
+"""Collapsing exact and near-duplicate posts before any LLM call.
+
+Forum and Reddit dumps repeat the same post as reposts, quotes and case or
+whitespace variants. A Deduplicator assigns every post to a group and
+only each group's first post, its representative, is processed; the
+representative's result is then copied to every member of the group.
+"""
+
+import hashlib
+import operator
+import random
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from .batch import BatchResult
+
+
+_QUOTE_MARKERS = re.compile(r"^\s*(?:>\s*)+", re.MULTILINE)
+# Mersenne prime modulus for the MinHash permutations
+_PRIME = (1 << 61) - 1
+# Representatives kept per LSH bucket and candidates compared per post;
+# templated posts that collide without being similar enough would
+# otherwise make grouping quadratic
+_MAX_BUCKET = 32
+_MAX_CANDIDATES = 8
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a post for duplicate detection.
+
+    Applies Unicode NFKC normalization, removes leading '>' quote markers,
+    case-folds and collapses whitespace.
+
+    Args:
+        text: Post text
+
+    Returns:
+        str: Normalized text
+    """
+    text = unicodedata.normalize("NFKC", text)
+    text = _QUOTE_MARKERS.sub("", text)
+    return " ".join(text.casefold().split())
+
+
+def text_hash(normalized: str) -> str:
+    """Return a stable hash of normalized text, used to group exact duplicates."""
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _lsh_shape(num_perm: int, threshold: float, recall: float = 0.95) -> Tuple[int, int]:
+    """Choose (bands, rows) for locality-sensitive hashing of signatures.
+
+    Two signatures become candidates when they agree on every row of any
+    band, which happens with probability 1 - (1 - s^rows)^bands for
+    Jaccard similarity s. The widest bands that still make pairs at
+    threshold candidates with probability recall are chosen; candidates
+    are checked against the threshold afterwards, so extra candidates only
+    cost a comparison.
+    """
+    for rows in range(num_perm, 0, -1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            return bands, rows
+    return num_perm, 1
+
+
+class Deduplicator:
+    """Groups exact and, optionally, near-duplicate posts.
+
+    Exact duplicates share the hash of their normalized text. Near
+    duplicates are found with MinHash signatures over word shingles and
+    locality-sensitive hashing: a post joins the first earlier
+    representative whose estimated Jaccard similarity reaches threshold.
+    Posts are only compared with representatives, never with other
+    members, so a group cannot drift through a chain of small edits.
+    """
+
+    def __init__(self, near_duplicates: bool = False, threshold: float = 0.85,
+                 num_perm: int = 64, shingle_size: int = 3, seed: int = 1,
+                 normalizer: Callable[[str], str] = normalize_text):
+        """Initialize the deduplicator.
+
+        Args:
+            near_duplicates: Also group posts whose estimated word-shingle
+                Jaccard similarity is at least threshold
+            threshold: Similarity needed to join a group, between 0 and 1
+            num_perm: Number of MinHash permutations per signature
+            shingle_size: Number of words per shingle
+            seed: Seed for the MinHash permutations
+            normalizer: Function normalizing text before hashing
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        self.near_duplicates = near_duplicates
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.normalizer = normalizer
+        rng = random.Random(seed)
+        self._permutations = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME))
+                              for _ in range(num_perm)]
+        self.bands, self.rows = _lsh_shape(num_perm, threshold)
+        self._lock = threading.Lock()
+        self.inputs = 0
+        self.exact_collapsed = 0
+        self.near_collapsed = 0
+
+    def signature(self, normalized: str) -> Tuple[int, ...]:
+        """Return the MinHash signature of normalized text.
+
+        Args:
+            normalized: Text returned by the normalizer
+
+        Returns:
+            tuple: num_perm minimum hash values
+        """
+        words = normalized.split()
+        size = self.shingle_size
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+                  for s in shingles]
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._permutations)
+
+    @staticmethod
+    def similarity(first: Sequence[int], second: Sequence[int]) -> float:
+        """Estimate Jaccard similarity as the fraction of agreeing signature values."""
+        return sum(map(operator.eq, first, second)) / len(first)
+
+    def group(self, texts: Sequence[str]) -> List[int]:
+        """Assign every text to a group.
+
+        Args:
+            texts: Texts to group
+
+        Returns:
+            list: For each text, the index of its group's representative,
+                the group's first text (a representative maps to itself)
+        """
+        by_hash: Dict[str, int] = {}
+        buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        signatures: Dict[int, Tuple[int, ...]] = {}
+        assignment: List[int] = []
+        exact = near = 0
+
+        for index, text in enumerate(texts):
+            normalized = self.normalizer(text)
+            key = text_hash(normalized)
+            if key in by_hash:
+                assignment.append(by_hash[key])
+                exact += 1
+                continue
+            representative = index
+            if self.near_duplicates:
+                signature = self.signature(normalized)
+                bands = [(band, signature[band * self.rows:(band + 1) * self.rows])
+                         for band in range(self.bands)]
+                # Candidates sharing the most bands are the most similar ones
+                collisions = Counter(c for band in bands for c in buckets.get(band, ()))
+                candidates = sorted(collisions, key=lambda c: (-collisions[c], c))
+                for candidate in candidates[:_MAX_CANDIDATES]:
+                    if self.similarity(signature, signatures[candidate]) >= self.threshold:
+                        representative = candidate
+                        near += 1
+                        break
+                if representative == index:
+                    signatures[index] = signature
+                    for band in bands:
+                        bucket = buckets.setdefault(band, [])
+                        if len(bucket) < _MAX_BUCKET:
+                            bucket.append(index)
+            by_hash[key] = representative
+            assignment.append(representative)
+
+        with self._lock:
+            self.inputs += len(texts)
+            self.exact_collapsed += exact
+            self.near_collapsed += near
+        return assignment
+
+    def collapse(self, texts: Sequence[str]) -> Tuple[List[str], List[int]]:
+        """Reduce texts to one representative per group.
+
+        Args:
+            texts: Texts to deduplicate
+
+        Returns:
+            tuple: (representative texts in first-seen order, for each input
+                text the position of its representative in that list)
+        """
+        assignment = self.group(texts)
+        positions: Dict[int, int] = {}
+        representatives: List[str] = []
+        for index, representative in enumerate(assignment):
+            if representative == index:
+                positions[index] = len(representatives)
+                representatives.append(texts[index])
+        return representatives, [positions[r] for r in assignment]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of texts seen and of exact and near duplicates collapsed."""
+        with self._lock:
+            collapsed = self.exact_collapsed + self.near_collapsed
+            return {
+                "inputs": self.inputs,
+                "exact_duplicates": self.exact_collapsed,
+                "near_duplicates": self.near_collapsed,
+                "collapsed_rate": collapsed / self.inputs if self.inputs else 0.0,
+            }
+
+
+def expand_results(texts: Sequence[str], positions: Sequence[int],
+                   results: Sequence[BatchResult]) -> List[BatchResult]:
+    """Copy representatives' results back to every text of their group.
+
+    Records are copied per text with "text" set to that text. Texts that
+    were not rewritten keep their own text as "output"; rewritten texts
+    get their representative's rewrite.
+
+    Args:
+        texts: Original texts
+        positions: Position of each text's representative, from collapse()
+        results: One BatchResult per representative
+
+    Returns:
+        list: One BatchResult per original text, in input order
+    """
+    expanded = []
+    for index, (text, position) in enumerate(zip(texts, positions)):
+        result = results[position]
+        value = result.value
+        if result.ok and isinstance(value, dict):
+            value = dict(value, text=text)
+            if value.get("rewritten") is None:
+                value["output"] = text
+        expanded.append(BatchResult(index, text, value=value, error=result.error))
+    return expanded
@@ -0,0 +1,486 @@
+"""Local stand-in LLM server for offline benchmarks and tests.
+
+The server speaks the OpenAI-compatible chat completions schema (used by
+the OpenAI and Together clients) and the Anthropic messages schema, and
+answers every request with a canned classification, emotion or rewrite
+after a configurable delay. It also implements the OpenAI Files and Batch
+endpoints and the Anthropic Message Batches endpoints, so batch jobs can
+be tested offline.
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from .prefilter import LexiconPrefilter
+
+
+# Terms the stand-in treats as stigmatizing, mapped to their replacement
+STIGMA_TERMS = {
+    "junkies": "people who use drugs",
+    "junkie": "person who uses drugs",
+    "addicts": "people with a substance use disorder",
+    "addict": "person with a substance use disorder",
+    "crackheads": "people who use crack",
+    "crackhead": "person who uses crack",
+    "druggies": "people who use drugs",
+    "druggie": "person who uses drugs",
+    "tweakers": "people who use meth",
+    "tweaker": "person who uses meth",
+}
+_STIGMA_PATTERN = re.compile(r"\b(" + "|".join(sorted(STIGMA_TERMS, key=len, reverse=True)) + r")\b",
+                             re.IGNORECASE)
+_PACKED_POST = re.compile(r"^\[(\d+)\] (.*)$", re.MULTILINE)
+
+
+def canned_completion(system: str, text: str, prefilter: LexiconPrefilter) -> str:
+    """Return the stand-in answer for a request.
+
+    The kind of request is recognized from the system prompt, the same way
+    the test FakeClient does.
+
+    Args:
+        system: System prompt of the request
+        text: Last user message of the request
+        prefilter: Lexicon used to decide whether a post is drug-related
+
+    Returns:
+        str: Response content
+    """
+    if "several posts at once" in system:
+        # Packed requests number one post per line and expect "[n] answer" lines
+        system = system.split("**Multiple posts:**", 1)[0]
+        return "\n".join(f"[{number}] {canned_completion(system, post, prefilter)}"
+                         for number, post in _PACKED_POST.findall(text))
+    stigma = _STIGMA_PATTERN.search(text)
+    if "two steps and answer with a single JSON object" in system:
+        if not prefilter.matches(text):
+            return '{"drug": "ND", "stigma": null, "explanation": {}}'
+        if stigma:
+            return json.dumps({
+                "drug": "D", "stigma": "S",
+                "explanation": {
+                    "labeling": f"'{stigma.group(0)}'",
+                    "stereotyping": "implies people who use drugs are dangerous",
+                    "separation": "sets people who use drugs apart",
+                    "discrimination": "suggests exclusion"
+                }
+            })
+        return '{"drug": "D", "stigma": "NS", "explanation": {}}'
+    if "Labeling Drug References" in system:
+        return "D" if prefilter.matches(text) else "ND"
+    if "identifying stigma" in system:
+        if stigma:
+            return (f"S, Labeling: '{stigma.group(0)}', Stereotyping: implies people who use "
+                    "drugs are dangerous, Separation: sets people who use drugs apart, "
+                    "Discrimination: suggests exclusion")
+        return "NS"
+    if "emotion recognition" in system:
+        return "anger" if stigma else "neutral"
+    # Rewrite passes send "post;explanation;style"
+    post = text.split(";", 1)[0]
+    return _STIGMA_PATTERN.sub(lambda m: STIGMA_TERMS[m.group(0).lower()], post)
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _canned_logprobs(content: str) -> Dict[str, Any]:
+    """Return OpenAI-style logprobs for a canned answer, one token per word."""
+    tokens = content.split(" ") if content else [""]
+    return {"content": [{"token": token, "logprob": -0.05, "bytes": None, "top_logprobs": []}
+                        for token in tokens]}
+
+
+class FakeProviderServer:
+    """Threaded HTTP server imitating the OpenAI and Anthropic APIs.
+
+    Use it as a context manager, or call start() and stop(). Point clients
+    at it with base_url=server.openai_base_url (OpenAI and Together) or
+    base_url=server.anthropic_base_url (Claude); any API key is accepted.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 latency_sigma: float = 0.0, error_rate: float = 0.0, error_status: int = 500,
+                 seed: Optional[int] = None, batch_delay: float = 0.0):
+        """Configure the server.
+
+        Args:
+            host: Interface to bind
+            port: Port to bind, 0 picks a free port
+            latency: Median response delay in seconds
+            latency_sigma: Spread of the log-normal delay distribution; 0
+                makes every delay equal to latency
+            error_rate: Fraction of requests answered with an error
+            error_status: HTTP status used for injected errors
+            seed: Seed for the delay and error random generator
+            batch_delay: Seconds a batch job stays in progress before its
+                results are available
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._prefilter = LexiconPrefilter()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.batch_delay = batch_delay
+        self._batch_lock = threading.Lock()
+        self._files: Dict[str, bytes] = {}
+        self._batches: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def url(self) -> str:
+        """Root URL of the running server."""
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def openai_base_url(self) -> str:
+        """base_url for the OpenAI and Together clients."""
+        return self.url + "/v1"
+
+    @property
+    def anthropic_base_url(self) -> str:
+        """base_url for the Claude clients."""
+        return self.url
+
+    def base_url_for(self, client_type: str) -> str:
+        """Return the base_url to use for a client type."""
+        return self.anthropic_base_url if client_type == "claude" else self.openai_base_url
+
+    def _draw(self) -> Tuple[float, bool]:
+        with self._random_lock:
+            if self.latency <= 0:
+                delay = 0.0
+            elif self.latency_sigma > 0:
+                delay = self._random.lognormvariate(math.log(self.latency), self.latency_sigma)
+            else:
+                delay = self.latency
+            fail = self.error_rate > 0 and self._random.random() < self.error_rate
+        return delay, fail
+
+    def _record(self, failed: bool) -> None:
+        with self._stats_lock:
+            self.requests += 1
+            if failed:
+                self.errors += 1
+
+    def handle(self, path: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Produce the status and JSON body for a request.
+
+        Args:
+            path: Request path
+            body: Decoded JSON request body
+
+        Returns:
+            tuple: (status, response body)
+        """
+        delay, fail = self._draw()
+        if delay:
+            time.sleep(delay)
+        self._record(fail)
+        return self.respond(path, body, fail)
+
+    def respond(self, path: str, body: Dict[str, Any], fail: bool = False) -> Tuple[int, Dict[str, Any]]:
+        """Build the response to a completion request without any delay.
+
+        Args:
+            path: Request path, ending in /chat/completions or /messages
+            body: Decoded JSON request body
+            fail: Answer with an injected error
+
+        Returns:
+            tuple: (status, response body)
+        """
+        anthropic_api = path.rstrip("/").endswith("/messages")
+        if fail:
+            message = "Injected error from the stand-in server"
+            if anthropic_api:
+                return self.error_status, {"type": "error",
+                                           "error": {"type": "api_error", "message": message}}
+            return self.error_status, {"error": {"message": message, "type": "server_error",
+                                                 "code": None, "param": None}}
+
+        messages: List[Dict[str, Any]] = body.get("messages", [])
+        if anthropic_api:
+            system = _text_of(body.get("system"))
+        else:
+            system = next((_text_of(m.get("content")) for m in messages
+                           if m.get("role") == "system"), "")
+        text = _text_of(messages[-1].get("content")) if messages else ""
+        content = canned_completion(system, text, self._prefilter)
+
+        prompt_tokens = _estimate_tokens(system) + sum(
+            _estimate_tokens(_text_of(m.get("content"))) for m in messages
+        )
+        completion_tokens = _estimate_tokens(content)
+        model = body.get("model") or "stand-in"
+        if anthropic_api:
+            return 200, {
+                "id": f"msg_{uuid.uuid4().hex}",
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [{"type": "text", "text": content}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {"input_tokens": prompt_tokens, "output_tokens": completion_tokens}
+            }
+        return 200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+                "logprobs": _canned_logprobs(content) if body.get("logprobs") else None
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": 0}
+            }
+        }
+
+    def _run_items(self, items: List[Tuple[str, str, Dict[str, Any]]]) -> List[Tuple[str, int, Dict[str, Any]]]:
+        """Answer the requests of a batch, injecting errors but no delay."""
+        results = []
+        for custom_id, path, body in items:
+            _, fail = self._draw()
+            self._record(fail)
+            status, payload = self.respond(path, body, fail)
+            results.append((custom_id, status, payload))
+        return results
+
+    def _finish_batch(self, batch: Dict[str, Any]) -> None:
+        """Run a batch whose delay has passed and store its results."""
+        if batch["done"] or time.time() < batch["ready_at"]:
+            return
+        results = self._run_items(batch["items"])
+        failed = sum(1 for _, status, _ in results if status != 200)
+        now = int(time.time())
+        if batch["kind"] == "openai":
+            output, errors = [], []
+            for custom_id, status, payload in results:
+                line = json.dumps({"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": custom_id,
+                                   "response": {"status_code": status, "body": payload},
+                                   "error": None})
+                (output if status == 200 else errors).append(line)
+            info = batch["info"]
+            info["output_file_id"] = self._store_file("\n".join(output).encode("utf-8"))
+            if errors:
+                info["error_file_id"] = self._store_file("\n".join(errors).encode("utf-8"))
+            info.update(status="completed", completed_at=now,
+                        request_counts={"total": len(results), "completed": len(results) - failed,
+                                        "failed": failed})
+        else:
+            lines = []
+            for custom_id, status, payload in results:
+                if status == 200:
+                    result = {"type": "succeeded", "message": payload}
+                else:
+                    result = {"type": "errored", "error": payload}
+                lines.append(json.dumps({"custom_id": custom_id, "result": result}))
+            batch["results"] = "\n".join(lines).encode("utf-8")
+            info = batch["info"]
+            info.update(processing_status="ended", ended_at=_iso(now),
+                        results_url=f"{self.url}/v1/messages/batches/{info['id']}/results",
+                        request_counts={"processing": 0, "succeeded": len(results) - failed,
+                                        "errored": failed, "canceled": 0, "expired": 0})
+        batch["done"] = True
+
+    def _store_file(self, data: bytes) -> str:
+        file_id = f"file-{uuid.uuid4().hex}"
+        self._files[file_id] = data
+        return file_id
+
+    def _upload(self, raw: bytes, content_type: str) -> Tuple[int, Any]:
+        """Store a file sent as multipart form data to /v1/files."""
+        message = BytesParser(policy=default_policy).parsebytes(
+            b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + raw
+        )
+        data, filename, purpose = b"", "upload.jsonl", "batch"
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name == "file":
+                data = part.get_payload(decode=True) or b""
+                filename = part.get_filename() or filename
+            elif name == "purpose":
+                purpose = part.get_content().strip()
+        with self._batch_lock:
+            file_id = self._store_file(data)
+        return 200, {"id": file_id, "object": "file", "bytes": len(data),
+                     "created_at": int(time.time()), "filename": filename,
+                     "purpose": purpose, "status": "processed"}
+
+    def _create_openai_batch(self, body: Dict[str, Any]) -> Tuple[int, Any]:
+        with self._batch_lock:
+            data = self._files.get(body.get("input_file_id", ""))
+            if data is None:
+                return 404, {"error": {"message": "No such file", "type": "invalid_request_error"}}
+            items = []
+            for line in data.decode("utf-8").splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    items.append((entry["custom_id"], entry["url"], entry["body"]))
+            batch_id = f"batch_{uuid.uuid4().hex}"
+            info = {"id": batch_id, "object": "batch", "endpoint": body.get("endpoint"),
+                    "errors": None, "input_file_id": body["input_file_id"],
+                    "completion_window": body.get("completion_window", "24h"),
+                    "status": "in_progress", "output_file_id": None, "error_file_id": None,
+                    "created_at": int(time.time()),
+                    "request_counts": {"total": len(items), "completed": 0, "failed": 0}}
+            self._batches[batch_id] = {"kind": "openai", "info": info, "items": items,
+                                       "ready_at": time.time() + self.batch_delay, "done": False}
+            return 200, dict(info)
+
+    def _create_message_batch(self, body: Dict[str, Any]) -> Tuple[int, Any]:
+        items = [(request["custom_id"], "/v1/messages", request["params"])
+                 for request in body.get("requests", [])]
+        with self._batch_lock:
+            batch_id = f"msgbatch_{uuid.uuid4().hex}"
+            now = int(time.time())
+            info = {"id": batch_id, "type": "message_batch", "processing_status": "in_progress",
+                    "request_counts": {"processing": len(items), "succeeded": 0, "errored": 0,
+                                       "canceled": 0, "expired": 0},
+                    "created_at": _iso(now), "expires_at": _iso(now + 86400),
+                    "ended_at": None, "cancel_initiated_at": None, "archived_at": None,
+                    "results_url": None}
+            self._batches[batch_id] = {"kind": "anthropic", "info": info, "items": items,
+                                       "ready_at": time.time() + self.batch_delay, "done": False}
+            return 200, dict(info)
+
+    def route(self, method: str, path: str, raw: bytes,
+              content_type: str = "application/json") -> Tuple[int, Any]:
+        """Dispatch a request to the completion or batch endpoints.
+
+        Args:
+            method: HTTP method
+            path: Request path without the query string
+            raw: Request body
+            content_type: Content-Type header of the request
+
+        Returns:
+            tuple: (status, JSON-serializable payload or raw bytes)
+        """
+        path = path.rstrip("/")
+        if method == "POST" and path.endswith("/files"):
+            return self._upload(raw, content_type)
+        body: Dict[str, Any] = {}
+        if method == "POST":
+            try:
+                body = json.loads(raw or b"{}")
+            except json.JSONDecodeError:
+                return 400, {"error": {"message": "Invalid JSON body"}}
+            if path.endswith("/messages/batches"):
+                return self._create_message_batch(body)
+            if path.endswith("/batches"):
+                return self._create_openai_batch(body)
+            if path.endswith(("/chat/completions", "/messages")):
+                return self.handle(path, body)
+            return 404, {"error": {"message": f"Unknown path {path}"}}
+
+        parts = path.split("/")
+        with self._batch_lock:
+            if path.endswith("/content") and len(parts) >= 2 and parts[-2] in self._files:
+                return 200, self._files[parts[-2]]
+            batch_id = parts[-2] if path.endswith("/results") else parts[-1]
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return 404, {"error": {"message": f"Unknown path {path}"}}
+            self._finish_batch(batch)
+            if path.endswith("/results"):
+                if not batch["done"]:
+                    return 404, {"error": {"message": "Batch has not ended"}}
+                return 200, batch["results"]
+            return 200, dict(batch["info"])
+
+    def start(self) -> 'FakeProviderServer':
+        """Start serving in a background thread."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length)
+                self._send(*server.route("POST", self.path.split("?", 1)[0], raw,
+                                         self.headers.get("Content-Type", "application/json")))
+
+            def do_GET(self) -> None:
+                self._send(*server.route("GET", self.path.split("?", 1)[0], b""))
+
+            def _send(self, status: int, payload: Any) -> None:
+                if isinstance(payload, bytes):
+                    data, content_type = payload, "application/octet-stream"
+                else:
+                    data, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 256
+
+        self._server = Server((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'FakeProviderServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.stop()
+        return False
+
+
+def _iso(timestamp: float) -> str:
+    """Format a Unix timestamp as an RFC 3339 string."""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+def _text_of(content: Any) -> str:
+    """Flatten a message content string or list of content blocks."""
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
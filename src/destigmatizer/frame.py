@@ -0,0 +1,186 @@
+"""Column-wise processing of pandas DataFrames and Arrow tables.
+
+pandas and pyarrow are optional; they are imported on first use, so the
+rest of the package works without them.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from .dedup import Deduplicator
+from .pipeline import Pipeline
+
+
+# Columns added by destigmatize_frame(), before any prefix
+FRAME_COLUMNS = ("drug", "stigma", "explanation", "style", "emotion", "rewritten", "output", "error")
+
+_ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+
+
+def _require(module: str) -> Any:
+    """Import an optional dependency, explaining how to install it if missing."""
+    try:
+        return __import__(module)
+    except ImportError as e:
+        raise ImportError(f"{module} is required for DataFrame processing; "
+                          f"install it with 'pip install destigmatizer[frame]'") from e
+
+
+def _columns(text: Any, record: Optional[Dict[str, Any]], error: Optional[str]) -> Dict[str, Any]:
+    """Flatten a Pipeline.process() record into frame columns."""
+    if record is None:
+        return {"drug": None, "stigma": None, "explanation": None, "style": None,
+                "emotion": None, "rewritten": None, "output": text, "error": error}
+    style = dict(record["style"]) if record["style"] else None
+    emotion = style.pop("top_emotions", None) if style else None
+    return {
+        "drug": record["drug"],
+        "stigma": record["stigma"],
+        "explanation": record["explanation"],
+        # Stored as JSON so the column has one type and round-trips through Parquet
+        "style": json.dumps(style, ensure_ascii=False) if style else None,
+        "emotion": emotion,
+        "rewritten": record["rewritten"],
+        "output": record["output"],
+        "error": None,
+    }
+
+
+def destigmatize_frame(df: Any, text_col: str, client: Any = None, model: Optional[str] = None,
+                       pipeline: Optional[Pipeline] = None, max_workers: Optional[int] = None,
+                       prefix: str = "", prefilter: Optional[Any] = None,
+                       combined: bool = False, packed: bool = False,
+                       dedup: Optional[Deduplicator] = None) -> Any:
+    """Run the workflow over a text column and add every stage's output as columns.
+
+    Each distinct text is processed once, however many rows share it, and
+    the distinct texts run concurrently through Pipeline.process_many().
+    With a Deduplicator, case, whitespace and quote variants (and near
+    duplicates, if enabled) are collapsed as well.
+    Rows whose text is missing keep None in the new columns.
+
+    Args:
+        df: pandas DataFrame or pyarrow Table
+        text_col: Column holding the post texts
+        client: LLM client instance, used when pipeline is None
+        model: Model to use for all operations, used when pipeline is None
+        pipeline: Prebuilt Pipeline; overrides client, model, prefilter,
+            combined, packed and dedup
+        max_workers: Maximum number of texts in flight at once
+        prefix: Prefix for the added column names, e.g. "reframe_"
+        prefilter: Optional LexiconPrefilter, see Pipeline
+        combined: Classify drug reference and stigma in one request
+        packed: Classify many posts per request, see Pipeline
+        dedup: Optional Deduplicator, see Pipeline
+
+    Returns:
+        A copy of df, of the same type, with the columns in FRAME_COLUMNS
+        (each with prefix) added: "drug", "stigma", "explanation", "style"
+        (JSON), "emotion", "rewritten", "output" (rewritten or original
+        text) and "error" (the exception message if a text failed)
+    """
+    pd = _require("pandas")
+    arrow_input = type(df).__module__.startswith("pyarrow")
+    frame = df.to_pandas() if arrow_input else df.copy()
+    if text_col not in frame.columns:
+        raise KeyError(f"Column '{text_col}' not found")
+    if text_col in (prefix + column for column in FRAME_COLUMNS):
+        raise ValueError(f"Output columns would overwrite '{text_col}'; pass a prefix")
+    if pipeline is None:
+        if client is None:
+            raise ValueError("Pass a client or a pipeline")
+        pipeline = Pipeline(client, model=model, prefilter=prefilter, combined=combined,
+                            packed=packed, dedup=dedup)
+
+    texts = frame[text_col]
+    present = texts.notna()
+    unique: List[str] = list(pd.unique(texts[present].astype(str)))
+    results = pipeline.process_many(unique, max_workers=max_workers)
+    by_text = {
+        text: _columns(text, r.value if r.ok else None, None if r.ok else str(r.error))
+        for text, r in zip(unique, results)
+    }
+
+    rows = [by_text[str(text)] if has_text else _columns(None, None, None)
+            for text, has_text in zip(texts, present)]
+    for column in FRAME_COLUMNS:
+        frame[prefix + column] = [row[column] for row in rows]
+
+    if arrow_input:
+        pa = _require("pyarrow")
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    return frame
+
+
+def read_frame(path: str, columns: Optional[List[str]] = None) -> Any:
+    """Read a Parquet, Arrow IPC/Feather, CSV or JSONL file into a DataFrame.
+
+    Args:
+        path: Input file; the format is taken from the extension
+        columns: Only read these columns (Parquet and Arrow only)
+
+    Returns:
+        pandas.DataFrame: File contents
+    """
+    pd = _require("pandas")
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        _require("pyarrow")
+        return pd.read_parquet(path, columns=columns)
+    if extension in _ARROW_EXTENSIONS:
+        _require("pyarrow")
+        return pd.read_feather(path, columns=columns)
+    if extension == ".csv":
+        return pd.read_csv(path)
+    if extension in (".jsonl", ".ndjson"):
+        return pd.read_json(path, lines=True)
+    raise ValueError(f"Unsupported file format: {path}")
+
+
+def write_frame(df: Any, path: str) -> None:
+    """Write a DataFrame or Arrow table to Parquet, Arrow IPC/Feather, CSV or JSONL.
+
+    Args:
+        df: pandas DataFrame or pyarrow Table
+        path: Output file; the format is taken from the extension
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if type(df).__module__.startswith("pyarrow"):
+        df = df.to_pandas()
+    if extension == ".parquet":
+        _require("pyarrow")
+        df.to_parquet(path, index=False)
+    elif extension in _ARROW_EXTENSIONS:
+        _require("pyarrow")
+        df.reset_index(drop=True).to_feather(path)
+    elif extension == ".csv":
+        df.to_csv(path, index=False)
+    elif extension in (".jsonl", ".ndjson"):
+        df.to_json(path, orient="records", lines=True, force_ascii=False)
+    else:
+        raise ValueError(f"Unsupported file format: {path}")
+
+
+def destigmatize_file(input_path: str, output_path: str, text_col: str, client: Any = None,
+                      model: Optional[str] = None, pipeline: Optional[Pipeline] = None,
+                      max_workers: Optional[int] = None, prefix: str = "") -> Any:
+    """Read a table, run destigmatize_frame() on it and write the result.
+
+    Args:
+        input_path: Parquet, Arrow IPC/Feather, CSV or JSONL input
+        output_path: Output file in any of the same formats
+        text_col: Column holding the post texts
+        client: LLM client instance, used when pipeline is None
+        model: Model to use for all operations, used when pipeline is None
+        pipeline: Prebuilt Pipeline
+        max_workers: Maximum number of texts in flight at once
+        prefix: Prefix for the added column names
+
+    Returns:
+        pandas.DataFrame: The written frame
+    """
+    frame = destigmatize_frame(read_frame(input_path), text_col, client=client, model=model,
+                               pipeline=pipeline, max_workers=max_workers, prefix=prefix)
+    write_frame(frame, output_path)
+    return frame
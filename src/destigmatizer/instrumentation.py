@@ -0,0 +1,391 @@
+"""Per-stage latency, token, retry and cache-hit instrumentation."""
+
+import math
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+# Stage names emitted by the pipeline and its components
+STAGES = (
+    "drug_classification",
+    "stigma_classification",
+    "combined_classification",
+    "style",
+    "emotion",
+    "rewrite_pass_1",
+    "rewrite_pass_2",
+)
+
+# Upper bounds (seconds) of the Prometheus latency buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_active: ContextVar[Optional['Instrumentation']] = ContextVar(
+    "destigmatizer_instrumentation", default=None
+)
+_current_event: ContextVar[Optional['StageEvent']] = ContextVar(
+    "destigmatizer_stage_event", default=None
+)
+
+
+class StageEvent:
+    """Measurements for one run of one pipeline stage."""
+
+    __slots__ = ("stage", "start", "duration", "calls", "input_tokens", "output_tokens",
+                 "cached_tokens", "retries", "cache_hits", "error")
+
+    def __init__(self, stage: str):
+        """Start a new event.
+
+        Args:
+            stage: Name of the stage, see STAGES
+        """
+        self.stage = stage
+        self.start = time.time()
+        self.duration = 0.0
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.error: Optional[BaseException] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the event as a plain dictionary."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return (f"StageEvent(stage={self.stage!r}, duration={self.duration:.4f}, "
+                f"tokens={self.input_tokens}/{self.output_tokens}, retries={self.retries}, "
+                f"cache_hits={self.cache_hits})")
+
+
+class _StageTimer:
+    """Context manager that times a stage and emits its event on exit."""
+
+    __slots__ = ("instrumentation", "event", "_token", "_started")
+
+    def __init__(self, instrumentation: 'Instrumentation', name: str):
+        self.instrumentation = instrumentation
+        self.event = StageEvent(name)
+
+    def __enter__(self) -> StageEvent:
+        self._token = _current_event.set(self.event)
+        self._started = time.perf_counter()
+        return self.event
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.event.duration = time.perf_counter() - self._started
+        self.event.error = exc
+        _current_event.reset(self._token)
+        self.instrumentation.emit(self.event)
+        return False
+
+
+class _NullStage:
+    """No-op stand-in used when no instrumentation is active."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Instrumentation:
+    """Event bus that delivers a StageEvent to subscribers after every stage.
+
+    Activate an instance around pipeline work (Pipeline does this when
+    given instrumentation=...) and every stage run in that thread or
+    asyncio task reports its wall time, provider token usage, retries and
+    completion cache hits.
+    """
+
+    def __init__(self, callbacks: Optional[Iterable[Callable[[StageEvent], Any]]] = None):
+        """Initialize the event bus.
+
+        Args:
+            callbacks: Callables invoked with each StageEvent
+        """
+        self._callbacks: List[Callable[[StageEvent], Any]] = list(callbacks or [])
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[StageEvent], Any]) -> Callable[[StageEvent], Any]:
+        """Register a callback and return it."""
+        with self._lock:
+            self._callbacks.append(callback)
+        return callback
+
+    def unsubscribe(self, callback: Callable[[StageEvent], Any]) -> None:
+        """Remove a previously registered callback."""
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def emit(self, event: StageEvent) -> None:
+        """Deliver an event to every subscriber.
+
+        A failing subscriber is reported and skipped so it cannot break the
+        pipeline.
+        """
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Warning: instrumentation callback failed: {e}")
+
+    def activate(self) -> 'Instrumentation._Activation':
+        """Return a context manager making this the active instrumentation."""
+        return Instrumentation._Activation(self)
+
+    def stage(self, name: str) -> _StageTimer:
+        """Return a context manager that times a stage on this instance."""
+        return _StageTimer(self, name)
+
+    class _Activation:
+        __slots__ = ("instrumentation", "_token")
+
+        def __init__(self, instrumentation: 'Instrumentation'):
+            self.instrumentation = instrumentation
+
+        def __enter__(self) -> 'Instrumentation':
+            self._token = _active.set(self.instrumentation)
+            return self.instrumentation
+
+        def __exit__(self, exc_type, exc, tb) -> bool:
+            _active.reset(self._token)
+            return False
+
+
+def stage(name: str) -> Any:
+    """Time a stage on the active instrumentation, if any.
+
+    Args:
+        name: Name of the stage, see STAGES
+
+    Returns:
+        A context manager; a no-op one when no instrumentation is active
+    """
+    instrumentation = _active.get()
+    if instrumentation is None:
+        return _NULL_STAGE
+    return _StageTimer(instrumentation, name)
+
+
+def record_usage(usage: Optional[Dict[str, int]]) -> None:
+    """Attribute one provider call and its token usage to the current stage."""
+    event = _current_event.get()
+    if event is None:
+        return
+    event.calls += 1
+    if usage:
+        event.input_tokens += usage.get("input_tokens", 0)
+        event.output_tokens += usage.get("output_tokens", 0)
+        event.cached_tokens += usage.get("cached_tokens", 0)
+
+
+def record_retry() -> None:
+    """Count a failed attempt that will be retried in the current stage."""
+    event = _current_event.get()
+    if event is not None:
+        event.retries += 1
+
+
+def record_cache_hit() -> None:
+    """Count a completion served from the local cache in the current stage."""
+    event = _current_event.get()
+    if event is not None:
+        event.cache_hits += 1
+
+
+class Histogram:
+    """Latency histogram with Prometheus buckets and exact recent percentiles.
+
+    Bucket counts, sum and count cover every observation. Percentiles are
+    computed from the most recent max_samples observations.
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS, max_samples: int = 10000):
+        """Initialize an empty histogram.
+
+        Args:
+            buckets: Upper bounds of the cumulative buckets, in seconds
+            max_samples: Number of recent observations kept for percentiles
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._samples: deque = deque(maxlen=max_samples)
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        self.count += 1
+        self.sum += value
+        self._samples.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+
+    def percentile(self, q: float) -> float:
+        """Return the q-th percentile (0-100) of recent observations, nearest rank."""
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        rank = max(1, math.ceil(q / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def summary(self) -> Dict[str, float]:
+        """Return count, mean, p50, p95, p99 and max."""
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": max(self._samples) if self._samples else 0.0
+        }
+
+
+class _StageStats:
+    __slots__ = ("latency", "calls", "input_tokens", "output_tokens", "cached_tokens",
+                 "retries", "cache_hits", "errors")
+
+    def __init__(self, buckets: Iterable[float], max_samples: int):
+        self.latency = Histogram(buckets, max_samples)
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.errors = 0
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsAggregator:
+    """In-memory per-stage aggregation of StageEvents.
+
+    An aggregator is a callable, so it can be subscribed directly:
+    instrumentation.subscribe(MetricsAggregator()).
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS, max_samples: int = 10000,
+                 prefix: str = "destigmatizer"):
+        """Initialize an empty aggregator.
+
+        Args:
+            buckets: Upper bounds of the latency buckets, in seconds
+            max_samples: Recent observations kept per stage for percentiles
+            prefix: Prefix of every exported metric name
+        """
+        self.buckets = tuple(buckets)
+        self.max_samples = max_samples
+        self.prefix = prefix
+        self._stages: Dict[str, _StageStats] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: StageEvent) -> None:
+        """Add an event to the aggregates."""
+        with self._lock:
+            stats = self._stages.get(event.stage)
+            if stats is None:
+                stats = self._stages[event.stage] = _StageStats(self.buckets, self.max_samples)
+            stats.latency.observe(event.duration)
+            stats.calls += event.calls
+            stats.input_tokens += event.input_tokens
+            stats.output_tokens += event.output_tokens
+            stats.cached_tokens += event.cached_tokens
+            stats.retries += event.retries
+            stats.cache_hits += event.cache_hits
+            if event.error is not None:
+                stats.errors += 1
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Return per-stage latency percentiles and counters.
+
+        Returns:
+            dict: Stage name to a dict with "latency" (count, mean, p50, p95,
+                p99, max in seconds), "calls", "input_tokens",
+                "output_tokens", "cached_tokens", "retries", "cache_hits"
+                and "errors"
+        """
+        with self._lock:
+            return {
+                name: {
+                    "latency": stats.latency.summary(),
+                    "calls": stats.calls,
+                    "input_tokens": stats.input_tokens,
+                    "output_tokens": stats.output_tokens,
+                    "cached_tokens": stats.cached_tokens,
+                    "retries": stats.retries,
+                    "cache_hits": stats.cache_hits,
+                    "errors": stats.errors
+                }
+                for name, stats in self._stages.items()
+            }
+
+    def to_prometheus(self) -> str:
+        """Render the aggregates in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text, ready to serve from a /metrics endpoint
+        """
+        p = self.prefix
+        counters = (
+            ("calls", "Provider calls made"),
+            ("input_tokens", "Input tokens reported by the provider"),
+            ("output_tokens", "Output tokens reported by the provider"),
+            ("cached_tokens", "Input tokens served from the provider prompt cache"),
+            ("retries", "Failed attempts that were retried"),
+            ("cache_hits", "Completions served from the local cache"),
+            ("errors", "Stage runs that raised an exception"),
+        )
+        lines = [
+            f"# HELP {p}_stage_duration_seconds Wall time of each pipeline stage.",
+            f"# TYPE {p}_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            stages = sorted(self._stages.items())
+            for name, stats in stages:
+                stage_label = f'stage="{_label(name)}"'
+                hist = stats.latency
+                for bound, count in zip(hist.buckets, hist.bucket_counts):
+                    lines.append(f'{p}_stage_duration_seconds_bucket{{{stage_label},'
+                                 f'le="{_number(float(bound))}"}} {count}')
+                lines.append(f'{p}_stage_duration_seconds_bucket{{{stage_label},le="+Inf"}} '
+                             f'{hist.count}')
+                lines.append(f"{p}_stage_duration_seconds_sum{{{stage_label}}} "
+                             f"{_number(hist.sum)}")
+                lines.append(f"{p}_stage_duration_seconds_count{{{stage_label}}} {hist.count}")
+            for field, help_text in counters:
+                metric = f"{p}_stage_{field}_total"
+                lines.append(f"# HELP {metric} {help_text}.")
+                lines.append(f"# TYPE {metric} counter")
+                for name, stats in stages:
+                    lines.append(f'{metric}{{stage="{_label(name)}"}} {getattr(stats, field)}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Discard all aggregated data."""
+        with self._lock:
+            self._stages.clear()
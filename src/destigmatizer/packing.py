@@ -0,0 +1,317 @@
+"""Packed classification: many posts, numbered, in one LLM request."""
+
+import contextvars
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .batch import BatchResult, run_batch, run_async_batch, DEFAULT_MAX_WORKERS
+from .instrumentation import stage
+from .ratelimit import estimate_tokens
+from .utils import generation_kwargs
+
+
+PACKING_INSTRUCTIONS = """
+        **Multiple posts:**
+        You will receive several posts at once. Each post starts on a new line with its number in square brackets, e.g. [1].
+        Label every post independently, following the instructions above.
+        Answer with exactly one line per post, in the same order, in the form "[number] answer", and nothing else.
+        """
+
+_PACKED_LINE = re.compile(r"^\s*\[(\d+)\]\s*(.+?)\s*$")
+
+
+def format_packed_posts(texts: Sequence[str]) -> str:
+    """Number posts one per line, collapsing whitespace inside each post."""
+    return "\n".join(f"[{number}] {' '.join(text.split())}"
+                     for number, text in enumerate(texts, 1))
+
+
+class PackedClassifier:
+    """Classifies many posts per request with a DrugClassifier or StigmaClassifier.
+
+    The instructions and few-shot examples make up most of the input tokens
+    of a single-post request. Packing N posts after one copy of them
+    spreads that cost over N posts and divides the number of requests, and
+    so the pressure on requests-per-minute limits, by N. Answers are parsed
+    strictly; a pack whose answer is malformed is classified again one post
+    at a time.
+    """
+
+    def __init__(self, classifier: Any, token_budget: int = 4000, max_pack_size: int = 50,
+                 max_output_tokens: int = 4000):
+        """Wrap a classifier.
+
+        Args:
+            classifier: DrugClassifier or StigmaClassifier instance
+            token_budget: Most estimated input tokens per packed request,
+                including the instructions and examples
+            max_pack_size: Most posts per request
+            max_output_tokens: Most tokens the model may generate per
+                request, which also bounds the pack size
+        """
+        self.classifier = classifier
+        self.token_budget = token_budget
+        self.max_pack_size = max_pack_size
+        self.max_output_tokens = max_output_tokens
+        self._prefix: Optional[Tuple[Dict[str, str], ...]] = None
+        self._lock = threading.Lock()
+        self.packs = 0
+        self.packed_posts = 0
+        self.fallbacks = 0
+
+    @property
+    def stage_name(self) -> str:
+        """Return the stage name of the wrapped classifier."""
+        return self.classifier.stage_name
+
+    def prefix_messages(self) -> Tuple[Dict[str, str], ...]:
+        """Return the packed system prompt and few-shot example.
+
+        The classifier's examples are packed into a single numbered example,
+        so the model sees the expected answer format.
+
+        Returns:
+            tuple: Messages preceding the user turn
+        """
+        if self._prefix is None:
+            examples = self.classifier.examples
+            self._prefix = (
+                {"role": "system", "content": self.classifier.prompt + PACKING_INSTRUCTIONS},
+                {"role": "user", "content": format_packed_posts([text for text, _ in examples])},
+                {"role": "system", "content": "\n".join(
+                    f"[{number}] {answer}" for number, (_, answer) in enumerate(examples, 1))},
+            )
+        return self._prefix
+
+    def build_messages(self, texts: Sequence[str]) -> List[Dict[str, str]]:
+        """Build the messages for a pack of posts.
+
+        Args:
+            texts: Posts to classify
+
+        Returns:
+            list: Messages to send to the LLM
+        """
+        messages = list(self.prefix_messages())
+        messages.append({"role": "user", "content": format_packed_posts(texts)})
+        return messages
+
+    def _answer_tokens(self) -> int:
+        # The classifier's own answer budget plus the "[n] " prefix
+        return self.classifier.generation["max_tokens"] + 4
+
+    def pack(self, texts: Sequence[str]) -> List[List[int]]:
+        """Split posts into packs that fit the token budget.
+
+        Posts are packed in order until the next one would push the
+        estimated input over token_budget or the expected output over
+        max_output_tokens, so short posts share a request with many others
+        and long posts with few. Every pack holds at least one post.
+
+        Args:
+            texts: Posts to classify
+
+        Returns:
+            list: Packs, each a list of indices into texts
+        """
+        prefix_tokens = estimate_tokens(list(self.prefix_messages()), 0)
+        max_size = max(1, min(self.max_pack_size,
+                              self.max_output_tokens // self._answer_tokens()))
+        packs: List[List[int]] = []
+        current: List[int] = []
+        used = prefix_tokens
+        for index, text in enumerate(texts):
+            cost = len(text) // 4 + 4
+            if current and (used + cost > self.token_budget or len(current) >= max_size):
+                packs.append(current)
+                current, used = [], prefix_tokens
+            current.append(index)
+            used += cost
+        if current:
+            packs.append(current)
+        return packs
+
+    def parse(self, answer: str, count: int) -> Optional[List[str]]:
+        """Parse a packed answer into one label per post.
+
+        The answer must hold exactly count lines numbered 1 to count in
+        order, each with a valid label for the wrapped classifier.
+
+        Args:
+            answer: Raw model output
+            count: Number of posts in the pack
+
+        Returns:
+            list: Lower-cased answers in post order, None if the answer is malformed
+        """
+        lines = [line for line in answer.strip().splitlines() if line.strip()]
+        if len(lines) != count:
+            return None
+        labels = []
+        for expected, line in enumerate(lines, 1):
+            match = _PACKED_LINE.match(line)
+            if match is None or int(match.group(1)) != expected:
+                return None
+            label = match.group(2).lower().strip()
+            valid = self.classifier.labels
+            if valid and self.classifier.answer_label(label) not in valid:
+                return None
+            labels.append(label)
+        return labels
+
+    def _request_kwargs(self, count: int, model: Optional[str]) -> Dict[str, Any]:
+        kwargs = generation_kwargs(self.classifier.generation, model, self.classifier.client)
+        kwargs["max_tokens"] = min(self.max_output_tokens, self._answer_tokens() * count + 8)
+        # Stop sequences for single answers (e.g. a newline) would cut a packed answer short
+        kwargs["stop"] = None
+        return kwargs
+
+    def _record(self, count: int, fell_back: bool) -> None:
+        with self._lock:
+            self.packs += 1
+            self.packed_posts += count
+            if fell_back:
+                self.fallbacks += 1
+
+    def classify_pack(self, texts: Sequence[str], model: Optional[str] = None,
+                      retries: int = 2) -> List[str]:
+        """Classify a pack of posts in one request.
+
+        Args:
+            texts: Posts to classify
+            model: Model to use for classification
+            retries: Number of retries on failure
+
+        Returns:
+            list: One classification result per post; 'skipped' for every
+                post if the request fails
+        """
+        if len(texts) == 1:
+            return [self.classifier.classify(texts[0], model=model, retries=retries)]
+        messages = self.build_messages(texts)
+        kwargs = self._request_kwargs(len(texts), model)
+        with stage(self.stage_name):
+            try:
+                answer = self.classifier.retry_policy.call(
+                    lambda: self.classifier.client.create_completion(messages=messages, **kwargs),
+                    attempts=retries
+                )
+            except Exception as e:
+                print(f"An error occurred: {e}. Skipping.")
+                self._record(len(texts), False)
+                return ["skipped"] * len(texts)
+        labels = self.parse(answer, len(texts))
+        self._record(len(texts), labels is None)
+        if labels is None:
+            labels = [self.classifier.classify(text, model=model, retries=retries)
+                      for text in texts]
+        return labels
+
+    async def aclassify_pack(self, texts: Sequence[str], model: Optional[str] = None,
+                             retries: int = 2) -> List[str]:
+        """Async variant of classify_pack(); fallback requests run concurrently."""
+        if len(texts) == 1:
+            return [await self.classifier.aclassify(texts[0], model=model, retries=retries)]
+        messages = self.build_messages(texts)
+        kwargs = self._request_kwargs(len(texts), model)
+        with stage(self.stage_name):
+            try:
+                answer = await self.classifier.retry_policy.acall(
+                    lambda: self.classifier.client.acreate_completion(messages=messages, **kwargs),
+                    attempts=retries
+                )
+            except Exception as e:
+                print(f"An error occurred: {e}. Skipping.")
+                self._record(len(texts), False)
+                return ["skipped"] * len(texts)
+        labels = self.parse(answer, len(texts))
+        self._record(len(texts), labels is None)
+        if labels is None:
+            results = await run_async_batch(
+                lambda text: self.classifier.aclassify(text, model=model, retries=retries),
+                texts
+            )
+            labels = [r.value if r.ok else "skipped" for r in results]
+        return labels
+
+    def _plan(self, texts: List[str]) -> Tuple[List[Optional[str]], List[List[int]]]:
+        """Decide locally where possible and pack the remaining posts."""
+        labels: List[Optional[str]] = [self.classifier._short_circuit(text) for text in texts]
+        remaining = [i for i, label in enumerate(labels) if label is None]
+        packs = [[remaining[j] for j in pack]
+                 for pack in self.pack([texts[i] for i in remaining])]
+        return labels, packs
+
+    @staticmethod
+    def _results(texts: List[str], labels: List[Optional[str]], packs: List[List[int]],
+                 outcomes: List[BatchResult]) -> List[BatchResult]:
+        errors: Dict[int, BaseException] = {}
+        for pack, outcome in zip(packs, outcomes):
+            for position, index in enumerate(pack):
+                if outcome.ok:
+                    labels[index] = outcome.value[position]
+                else:
+                    errors[index] = outcome.error
+        return [BatchResult(i, text, value=labels[i], error=errors.get(i))
+                for i, text in enumerate(texts)]
+
+    def classify_many(self, texts: Iterable[str], model: Optional[str] = None,
+                      retries: int = 2,
+                      max_workers: int = DEFAULT_MAX_WORKERS) -> List[BatchResult]:
+        """Classify many posts, packing them into as few requests as the budget allows.
+
+        Args:
+            texts: Posts to classify
+            model: Model to use for classification
+            retries: Number of retries on failure, per request
+            max_workers: Maximum number of packed requests in flight at once
+
+        Returns:
+            list: One BatchResult per post, in input order
+        """
+        texts = list(texts)
+        labels, packs = self._plan(texts)
+        # Workers run in a copy of the caller's context, so packed requests
+        # are reported to the caller's active instrumentation
+        context = contextvars.copy_context()
+        outcomes = run_batch(
+            lambda pack: context.copy().run(
+                self.classify_pack, [texts[i] for i in pack], model, retries),
+            packs,
+            max_workers=max_workers
+        )
+        return self._results(texts, labels, packs, outcomes)
+
+    async def aclassify_many(self, texts: Iterable[str], model: Optional[str] = None,
+                             retries: int = 2, max_concurrency: int = 100) -> List[BatchResult]:
+        """Async variant of classify_many().
+
+        Args:
+            texts: Posts to classify
+            model: Model to use for classification
+            retries: Number of retries on failure, per request
+            max_concurrency: Maximum number of packed requests in flight at once
+
+        Returns:
+            list: One BatchResult per post, in input order
+        """
+        texts = list(texts)
+        labels, packs = self._plan(texts)
+        outcomes = await run_async_batch(
+            lambda pack: self.aclassify_pack([texts[i] for i in pack], model=model,
+                                             retries=retries),
+            packs,
+            max_concurrency=max_concurrency
+        )
+        return self._results(texts, labels, packs, outcomes)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of packed requests, posts packed and fallbacks."""
+        with self._lock:
+            return {
+                "packs": self.packs,
+                "packed_posts": self.packed_posts,
+                "posts_per_pack": self.packed_posts / self.packs if self.packs else 0.0,
+                "fallbacks": self.fallbacks,
+            }
@@ -0,0 +1,471 @@
+"""Reusable pipeline holding prebuilt classifiers, analyzers and rewriter."""
+
+import asyncio
+from contextlib import nullcontext
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .batch import BatchResult, run_batch, run_async_batch, run_in_background, DEFAULT_MAX_WORKERS
+from .classifiers import DrugClassifier, StigmaClassifier, CombinedClassifier
+from .cascade import CascadePolicy, CascadeClassifier
+from .packing import PackedClassifier
+from .dedup import Deduplicator, expand_results
+from .analyzers import StyleAnalyzer, EmotionAnalyzer, LLMBasedAnalyzer
+from .rewriters import DestigmatizingRewriter
+from .instrumentation import Instrumentation
+from .concurrency import AIMDController, AdaptiveConcurrencyClient
+from .retry import RetryPolicy
+
+
+def combined_stigma_result(combined_result: Dict[str, Any]) -> str:
+    """Format a combined classification as a StigmaClassifier result string.
+
+    Args:
+        combined_result: Result of CombinedClassifier.classify()
+
+    Returns:
+        str: Stigma label, followed by the explanation if stigmatizing
+    """
+    stigma = combined_result["stigma"] or "ns"
+    if stigma.startswith("s") and combined_result["explanation"]:
+        return f"{stigma}, {combined_result['explanation']}"
+    return stigma
+
+
+def split_stigma_result(stigma_result: str) -> str:
+    """Return the explanation part of a StigmaClassifier result string."""
+    if ', ' in stigma_result:
+        _, explanation = stigma_result.split(', ', 1)
+        return explanation
+    return stigma_result
+
+
+class Pipeline:
+    """The full classify, analyze and rewrite workflow with reusable components.
+
+    All components are built once, so a single Pipeline can be shared by
+    every worker thread (or coroutine) processing posts with the same
+    client and settings.
+    """
+
+    def __init__(self, client: Any, model: Optional[str] = None, retries: int = 2,
+                 prefilter: Optional[Any] = None, combined: bool = False,
+                 verbose: bool = False, instrumentation: Optional[Instrumentation] = None,
+                 concurrency: Optional[AIMDController] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 cascade: Optional[CascadePolicy] = None, packed: bool = False,
+                 pack_token_budget: int = 4000, dedup: Optional[Deduplicator] = None,
+                 speculative: bool = False):
+        """Build the pipeline components.
+
+        Args:
+            client: LLM client instance (sync or async)
+            model: Model to use for all operations
+            retries: Number of retries on failure
+            prefilter: Optional LexiconPrefilter; posts without drug terms are
+                labeled non-drug-related without an LLM call
+            combined: Classify drug reference and stigma in a single request
+            verbose: Print each step as it runs
+            instrumentation: Optional Instrumentation that receives a
+                StageEvent for every stage run by this pipeline
+            concurrency: Optional AIMDController; every LLM request is
+                admitted through it, so the number in flight adapts to
+                provider latency and errors
+            retry_policy: RetryPolicy for every component, defaults to
+                DEFAULT_RETRY_POLICY
+            cascade: Optional CascadePolicy; drug and stigma classification
+                then start on the cheapest model tier and escalate only
+                uncertain answers, ignoring model
+            packed: In process_many() and aprocess_many(), classify drug
+                reference and stigma for many posts per request before the
+                remaining stages run per post
+            pack_token_budget: Most estimated input tokens per packed request
+            dedup: Optional Deduplicator; the *_many() methods then process
+                one representative per group of duplicate posts and copy its
+                result to the other members
+            speculative: Start stigma classification together with drug
+                classification and discard it if the post is not
+                drug-related, trading extra requests for one round trip
+                less per drug-related post
+        """
+        if packed and cascade is not None:
+            raise ValueError("Packed classification cannot be combined with a cascade")
+        if concurrency is not None:
+            client = AdaptiveConcurrencyClient(client, concurrency)
+        self.client = client
+        self.model = model
+        self.retries = retries
+        self.combined = combined
+        self.verbose = verbose
+        self.instrumentation = instrumentation
+        self.concurrency = concurrency
+        self.cascade = cascade
+        self.dedup = dedup
+        self.speculative = speculative
+
+        self.drug_classifier = DrugClassifier(client, prefilter=prefilter)
+        self.stigma_classifier = StigmaClassifier(client)
+        self.combined_classifier = CombinedClassifier(client, prefilter=prefilter)
+        self.style_analyzer = StyleAnalyzer()
+        self.emotion_analyzer = EmotionAnalyzer(client)
+        self.analyzer = LLMBasedAnalyzer(client, self.emotion_analyzer, self.style_analyzer)
+        self.rewriter = DestigmatizingRewriter(client)
+        if retry_policy is not None:
+            for component in (self.drug_classifier, self.stigma_classifier,
+                              self.combined_classifier, self.rewriter):
+                component.retry_policy = retry_policy
+        self.packed_drug = None
+        self.packed_stigma = None
+        if packed:
+            self.packed_drug = PackedClassifier(self.drug_classifier,
+                                                token_budget=pack_token_budget)
+            self.packed_stigma = PackedClassifier(self.stigma_classifier,
+                                                  token_budget=pack_token_budget)
+        if cascade is not None:
+            self.drug_classifier = CascadeClassifier(self.drug_classifier, cascade)
+            self.stigma_classifier = CascadeClassifier(self.stigma_classifier, cascade)
+
+    def _log(self, message: str) -> None:
+        if self.verbose:
+            print(message)
+
+    def _workers(self, max_workers: Optional[int]) -> int:
+        if max_workers is not None:
+            return max_workers
+        if self.concurrency is not None:
+            return self.concurrency.max_limit
+        return DEFAULT_MAX_WORKERS
+
+    def _activate(self) -> Any:
+        if self.instrumentation is None:
+            return nullcontext()
+        return self.instrumentation.activate()
+
+    @staticmethod
+    def _new_record(text: str) -> Dict[str, Any]:
+        return {
+            "text": text,
+            "drug": None,
+            "stigma": None,
+            "explanation": None,
+            "style": None,
+            "rewritten": None,
+            "output": text
+        }
+
+    @staticmethod
+    def _packed_labels(texts: List[str], drug: List[BatchResult], drug_texts: List[int],
+                       stigma: List[BatchResult]) -> List[Tuple[Optional[str], Optional[str]]]:
+        """Pair each text with its packed drug and stigma labels.
+
+        Failed or skipped labels are left as None, so process() classifies
+        those posts again one at a time.
+        """
+        def _label(result: BatchResult) -> Optional[str]:
+            if not result.ok or result.value == 'skipped':
+                return None
+            return result.value
+
+        labels = [(_label(r), None) for r in drug]
+        for index, result in zip(drug_texts, stigma):
+            labels[index] = (labels[index][0], _label(result))
+        return labels
+
+    @staticmethod
+    def _reindex(texts: List[str], results: List[BatchResult]) -> List[BatchResult]:
+        """Report results against the input texts rather than their indices."""
+        for result in results:
+            result.input = texts[result.index]
+        return results
+
+    @staticmethod
+    def _outputs(results: List[BatchResult]) -> List[BatchResult]:
+        """Replace each successful record with its output text."""
+        for result in results:
+            if result.ok:
+                result.value = result.value["output"]
+        return results
+
+    def process(self, text: str) -> Dict[str, Any]:
+        """Run the workflow on a text and return every stage's output.
+
+        Args:
+            text: Text to analyze and potentially rewrite
+
+        Returns:
+            dict: "text", "drug", "stigma", "explanation", "style",
+                "rewritten" (None for stages that did not run) and "output",
+                the rewritten text or the original text
+        """
+        with self._activate():
+            return self._process(text)
+
+    def _process(self, text: str, drug_result: Optional[str] = None,
+                 stigma_result: Optional[str] = None) -> Dict[str, Any]:
+        record = self._new_record(text)
+
+        # Steps 1 and 2 in a single request when combined mode is enabled
+        if self.combined and drug_result is None:
+            self._log("Steps 1-2: Classifying drug-related and stigmatizing content...")
+            combined_result = self.combined_classifier.classify(
+                text, model=self.model, retries=self.retries
+            )
+            drug_result = combined_result["drug"]
+            if drug_result == 'skipped':
+                self._log("Combined classification failed. Falling back to separate classifiers.")
+            elif drug_result.upper() == 'D':
+                stigma_result = combined_stigma_result(combined_result)
+
+        speculation = None
+        if drug_result is None or drug_result == 'skipped':
+            # Posts the prefilter labels locally are settled at once, so
+            # only speculate when the drug label needs an LLM call
+            if (self.speculative and stigma_result is None
+                    and self.drug_classifier._short_circuit(text, record=False) is None):
+                self._log("Step 2 (speculative): Checking for stigmatizing language...")
+                speculation = run_in_background(self.stigma_classifier.classify, text,
+                                                model=self.model, retries=self.retries)
+            # Step 1: Classify if drug-related
+            self._log("Step 1: Classifying drug-related content...")
+            try:
+                drug_result = self.drug_classifier.classify(
+                    text, model=self.model, retries=self.retries
+                )
+            except BaseException:
+                if speculation is not None:
+                    speculation.cancel()
+                raise
+        record["drug"] = drug_result
+
+        # If not drug-related, return the original text
+        if drug_result.upper() != 'D':
+            if speculation is not None:
+                speculation.cancel()
+            self._log("Text is not drug-related. Skipping further analysis.")
+            return record
+
+        if speculation is not None:
+            stigma_result = speculation.result()
+        elif stigma_result is None:
+            # Step 2: Classify if stigmatizing
+            self._log("Step 2: Checking for stigmatizing language...")
+            stigma_result = self.stigma_classifier.classify(
+                text, model=self.model, retries=self.retries
+            )
+        record["stigma"] = stigma_result
+
+        # If not stigmatizing, return the original text
+        if not stigma_result.lower().startswith('s'):
+            self._log("No stigmatizing content detected. Skipping further analysis.")
+            return record
+        record["explanation"] = split_stigma_result(stigma_result)
+
+        # Step 3: Analyze text style
+        self._log("Step 3: Analyzing text style and emotion...")
+        record["style"] = self.analyzer.analyze(text, model=self.model)
+
+        # Step 4: Rewrite to remove stigma
+        self._log("Step 4: Rewriting stigmatizing content...")
+        record["rewritten"] = self.rewriter.rewrite(
+            text=text,
+            explanation=record["explanation"],
+            style_instruct=str(record["style"]),
+            model=self.model,
+            retries=self.retries
+        )
+        record["output"] = record["rewritten"]
+        return record
+
+    def run(self, text: str) -> str:
+        """Run the workflow on a text.
+
+        Args:
+            text: Text to analyze and potentially rewrite
+
+        Returns:
+            str: The rewritten text if stigmatizing and drug-related,
+                 otherwise the original text
+        """
+        return self.process(text)["output"]
+
+    def process_many(self, texts: Iterable[str],
+                     max_workers: Optional[int] = None) -> List[BatchResult]:
+        """Run process() over many texts concurrently.
+
+        Args:
+            texts: Texts to analyze and potentially rewrite
+            max_workers: Maximum number of texts in flight at once, defaults
+                to the controller's max_limit with adaptive concurrency and
+                to DEFAULT_MAX_WORKERS otherwise
+
+        Returns:
+            list: One BatchResult per text whose value is the process() record
+        """
+        if self.dedup is not None:
+            texts = list(texts)
+            representatives, positions = self.dedup.collapse(texts)
+            return expand_results(texts, positions,
+                                  self._process_many(representatives, max_workers))
+        return self._process_many(texts, max_workers)
+
+    def _process_many(self, texts: Iterable[str],
+                      max_workers: Optional[int]) -> List[BatchResult]:
+        if self.packed_drug is None:
+            return run_batch(self.process, texts, max_workers=self._workers(max_workers))
+        texts = list(texts)
+        workers = self._workers(max_workers)
+        with self._activate():
+            drug = self.packed_drug.classify_many(texts, model=self.model, retries=self.retries,
+                                                  max_workers=workers)
+            drug_texts = [i for i, r in enumerate(drug) if r.ok and r.value.upper() == 'D']
+            stigma = self.packed_stigma.classify_many([texts[i] for i in drug_texts],
+                                                      model=self.model, retries=self.retries,
+                                                      max_workers=workers)
+        labels = self._packed_labels(texts, drug, drug_texts, stigma)
+
+        def _finish(index: int) -> Dict[str, Any]:
+            with self._activate():
+                return self._process(texts[index], *labels[index])
+
+        return self._reindex(texts, run_batch(_finish, range(len(texts)), max_workers=workers))
+
+    def run_many(self, texts: Iterable[str],
+                 max_workers: Optional[int] = None) -> List[BatchResult]:
+        """Run run() over many texts concurrently.
+
+        Args:
+            texts: Texts to analyze and potentially rewrite
+            max_workers: Maximum number of texts in flight at once, defaults
+                to the controller's max_limit with adaptive concurrency and
+                to DEFAULT_MAX_WORKERS otherwise
+
+        Returns:
+            list: One BatchResult per text whose value is the output text
+        """
+        if self.dedup is not None:
+            return self._outputs(self.process_many(texts, max_workers=max_workers))
+        return run_batch(self.run, texts, max_workers=self._workers(max_workers))
+
+    async def aprocess(self, text: str) -> Dict[str, Any]:
+        """Async variant of process() for pipelines built on an async client.
+
+        Args:
+            text: Text to analyze and potentially rewrite
+
+        Returns:
+            dict: Every stage's output, see process()
+        """
+        with self._activate():
+            return await self._aprocess(text)
+
+    async def _aprocess(self, text: str, drug_result: Optional[str] = None,
+                        stigma_result: Optional[str] = None) -> Dict[str, Any]:
+        record = self._new_record(text)
+
+        if self.combined and drug_result is None:
+            combined_result = await self.combined_classifier.aclassify(
+                text, model=self.model, retries=self.retries
+            )
+            drug_result = combined_result["drug"]
+            if drug_result.upper() == 'D':
+                stigma_result = combined_stigma_result(combined_result)
+
+        speculation = None
+        if drug_result is None or drug_result == 'skipped':
+            if (self.speculative and stigma_result is None
+                    and self.drug_classifier._short_circuit(text, record=False) is None):
+                speculation = asyncio.ensure_future(self.stigma_classifier.aclassify(
+                    text, model=self.model, retries=self.retries
+                ))
+            try:
+                drug_result = await self.drug_classifier.aclassify(
+                    text, model=self.model, retries=self.retries
+                )
+            except BaseException:
+                if speculation is not None:
+                    speculation.cancel()
+                raise
+        record["drug"] = drug_result
+        if drug_result.upper() != 'D':
+            if speculation is not None:
+                speculation.cancel()
+            return record
+
+        if speculation is not None:
+            stigma_result = await speculation
+        elif stigma_result is None:
+            stigma_result = await self.stigma_classifier.aclassify(
+                text, model=self.model, retries=self.retries
+            )
+        record["stigma"] = stigma_result
+        if not stigma_result.lower().startswith('s'):
+            return record
+        record["explanation"] = split_stigma_result(stigma_result)
+
+        record["style"] = await self.analyzer.aanalyze(text, model=self.model)
+        record["rewritten"] = await self.rewriter.arewrite(
+            text=text,
+            explanation=record["explanation"],
+            style_instruct=str(record["style"]),
+            model=self.model,
+            retries=self.retries
+        )
+        record["output"] = record["rewritten"]
+        return record
+
+    async def arun(self, text: str) -> str:
+        """Async variant of run()."""
+        return (await self.aprocess(text))["output"]
+
+    async def aprocess_many(self, texts: Iterable[str],
+                            max_concurrency: int = 100) -> List[BatchResult]:
+        """Run aprocess() over many texts with bounded concurrency.
+
+        Args:
+            texts: Texts to analyze and potentially rewrite
+            max_concurrency: Maximum number of texts in flight at once
+
+        Returns:
+            list: One BatchResult per text whose value is the aprocess() record
+        """
+        if self.dedup is not None:
+            texts = list(texts)
+            representatives, positions = self.dedup.collapse(texts)
+            return expand_results(texts, positions,
+                                  await self._aprocess_many(representatives, max_concurrency))
+        return await self._aprocess_many(texts, max_concurrency)
+
+    async def _aprocess_many(self, texts: Iterable[str],
+                             max_concurrency: int) -> List[BatchResult]:
+        if self.packed_drug is None:
+            return await run_async_batch(self.aprocess, texts, max_concurrency=max_concurrency)
+        texts = list(texts)
+        with self._activate():
+            drug = await self.packed_drug.aclassify_many(
+                texts, model=self.model, retries=self.retries, max_concurrency=max_concurrency)
+            drug_texts = [i for i, r in enumerate(drug) if r.ok and r.value.upper() == 'D']
+            stigma = await self.packed_stigma.aclassify_many(
+                [texts[i] for i in drug_texts], model=self.model, retries=self.retries,
+                max_concurrency=max_concurrency)
+        labels = self._packed_labels(texts, drug, drug_texts, stigma)
+
+        async def _finish(index: int) -> Dict[str, Any]:
+            with self._activate():
+                return await self._aprocess(texts[index], *labels[index])
+
+        return self._reindex(texts, await run_async_batch(_finish, range(len(texts)),
+                                                          max_concurrency=max_concurrency))
+
+    async def arun_many(self, texts: Iterable[str],
+                        max_concurrency: int = 100) -> List[BatchResult]:
+        """Run arun() over many texts with bounded concurrency.
+
+        Args:
+            texts: Texts to analyze and potentially rewrite
+            max_concurrency: Maximum number of texts in flight at once
+
+        Returns:
+            list: One BatchResult per text whose value is the output text
+        """
+        if self.dedup is not None:
+            return self._outputs(await self.aprocess_many(texts, max_concurrency=max_concurrency))
+        return await run_async_batch(self.arun, texts, max_concurrency=max_concurrency)
@@ -0,0 +1,148 @@
+"""Local lexicon prefilter that skips the LLM for posts with no drug terms."""
+
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from .utils import load_user_model_configs
+
+
+# Terms ending in "*" match any word starting with the stem
+DEFAULT_DRUG_LEXICON = [
+    # Substances
+    "drug*", "opioid*", "opiate*", "heroin", "fentanyl", "fent", "oxy*", "percocet*",
+    "percs", "vicodin", "hydrocodone", "morphine", "methadone", "suboxone", "subs",
+    "buprenorphine", "naloxone", "narcan", "codeine", "tramadol", "kratom",
+    "cocaine", "coke", "crack", "meth", "methamphetamine*", "amphetamine*", "speed",
+    "adderall", "ritalin", "xanax", "xans", "bars", "benzo*", "valium", "klonopin",
+    "ativan", "cannabis", "marijuana", "weed", "pot", "ganja", "thc", "cbd", "edible*",
+    "dab*", "blunt*", "joint*", "bong*", "kush", "lsd", "acid", "shroom*", "mushroom*",
+    "psilocybin", "psychedelic*", "dmt", "ayahuasca", "mdma", "molly", "ecstasy",
+    "ketamine", "ket", "pcp", "ghb", "k2", "spice", "bath salts", "inhalant*",
+    "huffing", "whippet*", "poppers", "lean", "dope", "smack", "blow", "crystal",
+    "tina", "pill*", "painkiller*", "narcotic*", "substance*",
+    # Use, addiction and related slang
+    "high", "stoned", "baked", "blazed", "tripping", "rolling", "nodding",
+    "junkie*", "junky", "addict*", "druggie*", "crackhead*", "tweaker*", "tweaking",
+    "stoner*", "pothead*", "dealer*", "relapse*", "sober*", "sobriety", "rehab*",
+    "detox*", "withdrawal*", "dopesick", "overdos*",
+    "od", "od'd", "ods", "inject*", "needle*", "shoot up", "shooting up", "snort*",
+    "sniff*", "smok*", "getting high", "sud", "oud", "recovery", "methadone clinic",
+    "harm reduction",
+]
+
+
+def _term_pattern(term: str) -> str:
+    """Translate a lexicon term into a regex fragment."""
+    if term.endswith("*"):
+        return re.escape(term[:-1]) + r"\w*"
+    return re.escape(term)
+
+
+class LexiconPrefilter:
+    """Compiled multi-term matcher used to short-circuit drug classification.
+
+    All terms are compiled into a single case-insensitive regular
+    expression, so each post is scanned once regardless of lexicon size.
+    Posts without any hit can be labeled 'ND' without an LLM call.
+    """
+
+    def __init__(self, terms: Optional[Iterable[str]] = None,
+                 extra_terms: Optional[Iterable[str]] = None):
+        """Compile the lexicon.
+
+        Args:
+            terms: Lexicon to use, defaults to DEFAULT_DRUG_LEXICON
+            extra_terms: Additional terms appended to the lexicon
+        """
+        lexicon = list(terms) if terms is not None else list(DEFAULT_DRUG_LEXICON)
+        if extra_terms:
+            lexicon.extend(extra_terms)
+        lexicon = [t.strip().lower() for t in lexicon if t and t.strip()]
+        if not lexicon:
+            raise ValueError("Prefilter lexicon must contain at least one term")
+
+        self.terms = sorted(set(lexicon), key=len, reverse=True)
+        alternation = "|".join(_term_pattern(t) for t in self.terms)
+        self._pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.passed = 0
+
+    @classmethod
+    def from_config(cls) -> 'LexiconPrefilter':
+        """Create a prefilter from the "prefilter" section of the user config.
+
+        The section may define "terms" to replace the default lexicon and
+        "extra_terms" to extend it.
+
+        Returns:
+            LexiconPrefilter: Configured prefilter
+        """
+        section = load_user_model_configs().get("prefilter", {})
+        return cls(terms=section.get("terms"), extra_terms=section.get("extra_terms"))
+
+    def find_terms(self, text: str) -> List[str]:
+        """Return every lexicon hit in a text, lower-cased.
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            list: Matched terms in order of appearance
+        """
+        return [m.group(0).lower() for m in self._pattern.finditer(text)]
+
+    def is_candidate(self, text: str) -> bool:
+        """Return True if the text contains a lexicon term, without updating report().
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            bool: Whether the text needs a full LLM classification
+        """
+        return self._pattern.search(text) is not None
+
+    def matches(self, text: str) -> bool:
+        """Return True if the text contains at least one lexicon term.
+
+        Each call is counted in report(); use is_candidate() to look
+        ahead at a text that will be classified later.
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            bool: Whether the text needs a full LLM classification
+        """
+        hit = self.is_candidate(text)
+        with self._lock:
+            self.checked += 1
+            if hit:
+                self.passed += 1
+        return hit
+
+    def report(self) -> Dict[str, Any]:
+        """Summarize how many LLM calls the prefilter has saved.
+
+        Returns:
+            dict: Posts checked, posts sent on to the LLM, calls saved and
+                the fraction saved
+        """
+        with self._lock:
+            checked, passed = self.checked, self.passed
+        saved = checked - passed
+        return {
+            "checked": checked,
+            "sent_to_llm": passed,
+            "calls_saved": saved,
+            "saved_fraction": saved / checked if checked else 0.0
+        }
+
+    def reset(self) -> None:
+        """Reset the counters used by report()."""
+        with self._lock:
+            self.checked = 0
+            self.passed = 0
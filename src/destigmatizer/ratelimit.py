@@ -0,0 +1,307 @@
+"""Shared token-bucket rate limiting per provider and model."""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .clients import LLMClient, detect_client_type, get_last_usage, _last_usage
+from .utils import load_user_model_configs
+
+
+class TokenBucket:
+    """Continuously refilling token bucket that hands out reservations.
+
+    A reservation always succeeds immediately and returns how long the
+    caller must wait before using it, so waiting happens outside the lock
+    and works the same from threads (time.sleep) and coroutines
+    (asyncio.sleep). Callers are served in reservation order, which keeps
+    the long-run rate exactly at the configured limit.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """Create a full bucket.
+
+        Args:
+            per_minute: Refill rate, in units per minute
+            capacity: Maximum burst size; defaults to one second's worth
+                of refill so load is spread evenly across the minute
+        """
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive")
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take amount from the bucket, going into debt if needed.
+
+        Args:
+            amount: Units to take
+
+        Returns:
+            float: Seconds to wait before the reservation may be used
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level -= amount
+            if self._level >= 0:
+                return 0.0
+            return -self._level / self.rate
+
+    def refund(self, amount: float) -> None:
+        """Return unused units, e.g. when a request used fewer tokens than reserved."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level + amount)
+
+    @property
+    def level(self) -> float:
+        """Units currently available; negative while callers are waiting."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._level
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget for one provider and model."""
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        """Create the buckets.
+
+        Args:
+            rpm: Requests per minute, None for no request limit
+            tpm: Tokens per minute (input plus output), None for no token limit
+        """
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0.0
+
+    def _reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        with self._lock:
+            self.acquired += 1
+            self.waited += wait
+        return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until a request costing the given tokens fits the budget.
+
+        Args:
+            tokens: Estimated tokens for the request
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        """Async variant of acquire() that yields to the event loop while waiting."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def settle(self, reserved: int, actual: Optional[int]) -> None:
+        """Correct the token budget once the real usage is known.
+
+        Args:
+            reserved: Tokens reserved by acquire()
+            actual: Tokens reported by the provider, None if unknown
+        """
+        if self.tokens is None or actual is None:
+            return
+        if actual < reserved:
+            self.tokens.refund(reserved - actual)
+        elif actual > reserved:
+            self.tokens.reserve(actual - reserved)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of acquisitions and total time spent waiting."""
+        with self._lock:
+            return {"acquired": self.acquired, "waited_seconds": self.waited}
+
+
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def configured_limits(client_type: str, model: Optional[str] = None) -> Dict[str, Any]:
+    """Look up rpm and tpm for a provider and model in the user config.
+
+    The "rate_limits" config section maps client types to model names (or
+    "default") to {"rpm": ..., "tpm": ...}.
+
+    Args:
+        client_type: Client type ("openai", "together" or "claude")
+        model: Model name
+
+    Returns:
+        dict: "rpm" and "tpm", each None if not configured
+    """
+    provider = load_user_model_configs().get("rate_limits", {}).get(client_type, {})
+    limits = provider.get(model or "default") or provider.get("default") or {}
+    return {"rpm": limits.get("rpm"), "tpm": limits.get("tpm")}
+
+
+def get_rate_limiter(client_type: str, model: Optional[str] = None,
+                     rpm: Optional[float] = None, tpm: Optional[float] = None) -> RateLimiter:
+    """Return the process-wide limiter for a provider and model.
+
+    Every client wrapper in the process shares one limiter per provider
+    and model, matching how providers account usage per organization.
+    The limits passed (or configured) on first use create the limiter;
+    later calls return it unchanged.
+
+    Args:
+        client_type: Client type ("openai", "together" or "claude")
+        model: Model name, None for the provider default
+        rpm: Requests per minute, read from the config if None
+        tpm: Tokens per minute, read from the config if None
+
+    Returns:
+        RateLimiter: Shared limiter
+    """
+    key = (client_type, model or "default")
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            if rpm is None and tpm is None:
+                limits = configured_limits(client_type, model)
+                rpm, tpm = limits["rpm"], limits["tpm"]
+            limiter = _limiters[key] = RateLimiter(rpm=rpm, tpm=tpm)
+        return limiter
+
+
+def reset_rate_limiters() -> None:
+    """Forget every shared limiter, e.g. after changing the configured limits."""
+    with _limiters_lock:
+        _limiters.clear()
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: int) -> int:
+    """Estimate the token cost of a request before sending it.
+
+    Providers count max_tokens against the token budget up front, so it is
+    added to a rough input estimate of four characters per token.
+
+    Args:
+        messages: List of message dictionaries
+        max_tokens: Maximum number of tokens in the response
+
+    Returns:
+        int: Estimated tokens
+    """
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // 4 + 4 * len(messages) + max_tokens
+
+
+class RateLimitedClient(LLMClient):
+    """LLM client wrapper that paces requests to the provider's limits.
+
+    Each request reserves one request and its estimated tokens from the
+    shared limiter for the client type and model before it is sent; the
+    reservation is corrected with the usage the provider reports.
+    """
+
+    def __init__(self, client: Any, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 limiter: Optional[RateLimiter] = None):
+        """Wrap a client.
+
+        Args:
+            client: LLM client instance to wrap
+            rpm: Requests per minute for every model used through this client;
+                per-model limits come from the config if neither rpm nor tpm is given
+            tpm: Tokens per minute for every model used through this client
+            limiter: Explicit limiter to use for all requests
+        """
+        self.client = client
+        self.rpm = rpm
+        self.tpm = tpm
+        self.limiter = limiter
+
+    @property
+    def client_type(self) -> str:
+        """Return the type of the wrapped client."""
+        return detect_client_type(self.client)
+
+    def _limiter_for(self, model: Optional[str]) -> RateLimiter:
+        if self.limiter is not None:
+            return self.limiter
+        return get_rate_limiter(self.client_type, model, rpm=self.rpm, tpm=self.tpm)
+
+    @staticmethod
+    def _actual_tokens() -> Optional[int]:
+        usage = get_last_usage()
+        if usage is None:
+            return None
+        return usage["input_tokens"] + usage["output_tokens"]
+
+    def create_completion(self,
+                         messages: List[Dict[str, str]],
+                         model: Optional[str] = None,
+                         temperature: float = 0,
+                         max_tokens: int = 1000,
+                         stop: Optional[List[str]] = None) -> str:
+        """Wait for budget, then call the wrapped client.
+
+        Args:
+            messages: List of message dictionaries
+            model: Model identifier
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
+
+        Returns:
+            str: The generated response content
+        """
+        limiter = self._limiter_for(model)
+        reserved = estimate_tokens(messages, max_tokens)
+        limiter.acquire(reserved)
+        _last_usage.set(None)
+        response = self.client.create_completion(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop
+        )
+        limiter.settle(reserved, self._actual_tokens())
+        return response
+
+    async def acreate_completion(self,
+                                messages: List[Dict[str, str]],
+                                model: Optional[str] = None,
+                                temperature: float = 0,
+                                max_tokens: int = 1000,
+                                stop: Optional[List[str]] = None) -> str:
+        """Async variant of create_completion() for wrapped async clients."""
+        limiter = self._limiter_for(model)
+        reserved = estimate_tokens(messages, max_tokens)
+        await limiter.aacquire(reserved)
+        _last_usage.set(None)
+        response = await self.client.acreate_completion(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop
+        )
+        limiter.settle(reserved, self._actual_tokens())
+        return response
@@ -0,0 +1,263 @@
+"""Record and replay LLM traffic for deterministic, offline reprocessing."""
+
+import gzip
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from .cache import completion_key, _key_variant
+from .clients import (LLMClient, detect_client_type, get_last_confidence,
+                      _confidence_requested, _last_confidence)
+
+
+LOG_FORMAT_VERSION = 1
+
+
+class ReplayMissError(KeyError):
+    """Raised by ReplayClient for a request that is not in the log."""
+
+
+def _open_log(path: str, mode: str) -> Any:
+    """Open a log file, gzip-compressed if the path ends in .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _request_key(messages: List[Dict[str, str]], model: Optional[str],
+                 temperature: float, max_tokens: int,
+                 stop: Optional[List[str]] = None) -> str:
+    # Ordinary requests keep an empty namespace, so older logs still replay
+    return completion_key(messages, model, temperature, max_tokens, _key_variant(), stop)
+
+
+class RecordingClient(LLMClient):
+    """LLM client wrapper that appends every request/response pair to a log.
+
+    The log is JSON Lines: a header line naming the wrapped client type,
+    then one {"key", "response"} line per completion, where key is the
+    hash of the request. Completions requested under request_confidence()
+    also store their "confidence". Paths ending in .gz are gzip-compressed.
+    """
+
+    def __init__(self, client: Any, path: str, include_requests: bool = False):
+        """Wrap a client and open the log for appending.
+
+        Args:
+            client: LLM client instance to wrap
+            path: Log file to append to, created if missing
+            include_requests: Also store the messages and model of each
+                request, which makes the log larger but human-readable
+        """
+        self.client = client
+        self.path = path
+        self.include_requests = include_requests
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = _open_log(path, "a")
+        if new_file:
+            self._write({"version": LOG_FORMAT_VERSION, "client_type": self.client_type})
+
+    @property
+    def client_type(self) -> str:
+        """Return the type of the wrapped client."""
+        return detect_client_type(self.client)
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def _record(self, messages: List[Dict[str, str]], model: Optional[str],
+                temperature: float, max_tokens: int, stop: Optional[List[str]],
+                response: str) -> None:
+        entry = {"key": _request_key(messages, model, temperature, max_tokens, stop),
+                 "response": response}
+        if _confidence_requested.get():
+            entry["confidence"] = get_last_confidence()
+        if self.include_requests:
+            entry["model"] = model
+            entry["messages"] = messages
+        self._write(entry)
+        with self._lock:
+            self.recorded += 1
+
+    def create_completion(self,
+                         messages: List[Dict[str, str]],
+                         model: Optional[str] = None,
+                         temperature: float = 0,
+                         max_tokens: int = 1000,
+                         stop: Optional[List[str]] = None) -> str:
+        """Call the wrapped client and record the exchange.
+
+        Args:
+            messages: List of message dictionaries
+            model: Model identifier
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
+
+        Returns:
+            str: The generated response content
+        """
+        response = self.client.create_completion(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop
+        )
+        self._record(messages, model, temperature, max_tokens, stop, response)
+        return response
+
+    async def acreate_completion(self,
+                                messages: List[Dict[str, str]],
+                                model: Optional[str] = None,
+                                temperature: float = 0,
+                                max_tokens: int = 1000,
+                                stop: Optional[List[str]] = None) -> str:
+        """Async variant of create_completion() for wrapped async clients."""
+        response = await self.client.acreate_completion(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop
+        )
+        self._record(messages, model, temperature, max_tokens, stop, response)
+        return response
+
+    def close(self) -> None:
+        """Close the log file."""
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> 'RecordingClient':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.close()
+        return False
+
+
+class ReplayClient(LLMClient):
+    """LLM client that answers from a RecordingClient log without network access.
+
+    The log is loaded into a dictionary keyed by request hash, so every
+    lookup is O(1) and a replayed run is bound only by local CPU work.
+    """
+
+    def __init__(self, path: str, fallback: Optional[Any] = None,
+                 client_type: Optional[str] = None):
+        """Load a recorded log.
+
+        Args:
+            path: Log written by RecordingClient
+            fallback: Optional client called for requests missing from the
+                log; without one, a miss raises ReplayMissError
+            client_type: Client type to report, defaults to the type
+                recorded in the log header (it drives model mapping, so it
+                must match the recording for keys to line up)
+        """
+        self.path = path
+        self.fallback = fallback
+        self.responses: Dict[str, str] = {}
+        self.confidences: Dict[str, Optional[float]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        recorded_type = None
+        with _open_log(path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if "key" in entry:
+                    # Later entries win, as they would in a fresh recording
+                    self.responses[entry["key"]] = entry["response"]
+                    if "confidence" in entry:
+                        self.confidences[entry["key"]] = entry["confidence"]
+                elif "client_type" in entry:
+                    recorded_type = entry["client_type"]
+        self._client_type = client_type or recorded_type or "unknown"
+
+    @property
+    def client_type(self) -> str:
+        """Return the client type the log was recorded with."""
+        return self._client_type
+
+    def _lookup(self, messages: List[Dict[str, str]], model: Optional[str],
+                temperature: float, max_tokens: int,
+                stop: Optional[List[str]] = None) -> Optional[str]:
+        key = _request_key(messages, model, temperature, max_tokens, stop)
+        response = self.responses.get(key)
+        if response is not None and _confidence_requested.get():
+            _last_confidence.set(self.confidences.get(key))
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if response is None and self.fallback is None:
+            raise ReplayMissError(f"Request not found in replay log {self.path}")
+        return response
+
+    def create_completion(self,
+                         messages: List[Dict[str, str]],
+                         model: Optional[str] = None,
+                         temperature: float = 0,
+                         max_tokens: int = 1000,
+                         stop: Optional[List[str]] = None) -> str:
+        """Return the recorded response for a request.
+
+        Args:
+            messages: List of message dictionaries
+            model: Model identifier
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens in the response
+            stop: Sequences that end the response early
+
+        Returns:
+            str: The recorded response content
+
+        Raises:
+            ReplayMissError: If the request was not recorded and there is no fallback
+        """
+        response = self._lookup(messages, model, temperature, max_tokens, stop)
+        if response is not None:
+            return response
+        return self.fallback.create_completion(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop
+        )
+
+    async def acreate_completion(self,
+                                messages: List[Dict[str, str]],
+                                model: Optional[str] = None,
+                                temperature: float = 0,
+                                max_tokens: int = 1000,
+                                stop: Optional[List[str]] = None) -> str:
+        """Async variant of create_completion()."""
+        response = self._lookup(messages, model, temperature, max_tokens, stop)
+        if response is not None:
+            return response
+        return await self.fallback.acreate_completion(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop
+        )
+
+    def __len__(self) -> int:
+        return len(self.responses)
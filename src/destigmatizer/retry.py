@@ -0,0 +1,278 @@
+"""Retry policy with error classification, backoff, jitter and a shared budget."""
+
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+from .instrumentation import record_retry
+
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+# Exception class names (from the provider SDKs and httpx) for transport failures
+_TRANSIENT_ERROR_NAMES = frozenset({
+    "APIConnectionError", "APITimeoutError", "ConnectError", "ConnectTimeout",
+    "ReadTimeout", "ReadError", "RemoteProtocolError", "ServiceUnavailableError",
+    "RateLimitError", "InternalServerError", "OverloadedError", "Timeout",
+})
+
+
+def _error_chain(error: BaseException) -> Iterator[BaseException]:
+    """Yield an error and the errors it was raised from."""
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        yield current
+        current = current.__cause__ or current.__context__
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """Return the HTTP status behind an error, searching wrapped causes.
+
+    Args:
+        error: Exception raised by a completion call
+
+    Returns:
+        int: Status code, or None if the error carries none
+    """
+    for current in _error_chain(error):
+        status = getattr(current, "status_code", None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def _parse_retry_after(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Return the server-requested delay before retrying, if any.
+
+    Reads a retry_after attribute or the Retry-After / retry-after-ms
+    headers of the HTTP response attached to the error or its causes.
+
+    Args:
+        error: Exception raised by a completion call
+
+    Returns:
+        float: Seconds to wait, or None if the server gave no hint
+    """
+    for current in _error_chain(error):
+        value = getattr(current, "retry_after", None)
+        if value is not None:
+            return _parse_retry_after(value)
+        headers = getattr(getattr(current, "response", None), "headers", None)
+        if headers is None:
+            continue
+        try:
+            milliseconds = headers.get("retry-after-ms")
+            if milliseconds is not None:
+                return max(0.0, float(milliseconds) / 1000)
+            seconds = _parse_retry_after(headers.get("retry-after"))
+            if seconds is not None:
+                return seconds
+        except (AttributeError, TypeError, ValueError):
+            continue
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Classify an error as transient (retry) or fatal (give up at once).
+
+    Errors carrying an HTTP status are retryable only for RETRYABLE_STATUSES,
+    so 400, 401, 403, 404 and 422 fail fast. Transport errors and timeouts
+    are retryable. Errors with no status information are assumed transient.
+
+    Args:
+        error: Exception raised by a completion call
+
+    Returns:
+        bool: Whether retrying could succeed
+    """
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    for current in _error_chain(error):
+        if isinstance(current, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+            return True
+        if type(current).__name__ in _TRANSIENT_ERROR_NAMES:
+            return True
+    return not isinstance(error, (ValueError, TypeError, KeyError))
+
+
+class RetryBudget:
+    """Process-wide allowance that caps retries to a fraction of traffic.
+
+    Every first attempt deposits `ratio` tokens and every retry withdraws
+    one, so during an outage retries add at most `ratio` extra load on top
+    of the normal request rate. A small floor of min_per_second retries is
+    always available for low-traffic processes.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0,
+                 max_balance: float = 100.0):
+        """Create a budget.
+
+        Args:
+            ratio: Retries allowed per first attempt
+            min_per_second: Retries allowed per second regardless of traffic
+            max_balance: Most retries that can be saved up
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self._balance = max_balance
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.exhausted = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._balance = min(self.max_balance,
+                            self._balance + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self) -> None:
+        """Record a first attempt."""
+        with self._lock:
+            self._refill()
+            self._balance = min(self.max_balance, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Try to spend one retry.
+
+        Returns:
+            bool: False if the budget is exhausted and the retry must be skipped
+        """
+        with self._lock:
+            self._refill()
+            if self._balance >= 1:
+                self._balance -= 1
+                return True
+            self.exhausted += 1
+            return False
+
+    @property
+    def balance(self) -> float:
+        """Retries currently available."""
+        with self._lock:
+            self._refill()
+            return self._balance
+
+
+# Budget shared by every policy that does not bring its own
+DEFAULT_RETRY_BUDGET = RetryBudget()
+
+
+class RetryPolicy:
+    """Decides whether, and after how long, a failed call is retried.
+
+    Delays grow exponentially from base_delay with full jitter (a uniform
+    draw between zero and the exponential delay), are capped at max_delay,
+    and are replaced by the server's Retry-After hint when one is given.
+    """
+
+    def __init__(self, base_delay: float = 0.5, max_delay: float = 30.0,
+                 multiplier: float = 2.0, jitter: bool = True,
+                 budget: Optional[RetryBudget] = None,
+                 retryable: Callable[[BaseException], bool] = is_retryable):
+        """Configure the policy.
+
+        Args:
+            base_delay: Delay before the first retry, in seconds
+            max_delay: Upper bound on any delay, including Retry-After hints
+            multiplier: Growth factor of the delay per retry
+            jitter: Randomize each delay between zero and its nominal value
+            budget: Retry budget to draw from, DEFAULT_RETRY_BUDGET if None
+            retryable: Function classifying errors as retryable
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.budget = budget if budget is not None else DEFAULT_RETRY_BUDGET
+        self.retryable = retryable
+
+    def delay(self, retry_number: int, error: Optional[BaseException] = None) -> float:
+        """Return the wait before a retry.
+
+        Args:
+            retry_number: 1 for the first retry, 2 for the second, ...
+            error: The error being retried, checked for a Retry-After hint
+
+        Returns:
+            float: Seconds to wait
+        """
+        hint = retry_after(error) if error is not None else None
+        if hint is not None:
+            return min(hint, self.max_delay)
+        nominal = min(self.max_delay, self.base_delay * self.multiplier ** (retry_number - 1))
+        return random.uniform(0, nominal) if self.jitter else nominal
+
+    def _should_retry(self, error: BaseException, attempt: int, attempts: int) -> bool:
+        if attempt >= attempts or not self.retryable(error):
+            return False
+        return self.budget.withdraw()
+
+    def call(self, func: Callable[[], Any], attempts: int = 3) -> Any:
+        """Call a function, retrying transient failures.
+
+        Args:
+            func: Callable taking no arguments
+            attempts: Total number of attempts, including the first
+
+        Returns:
+            Any: Result of func
+
+        Raises:
+            Exception: The last error, once it is fatal, attempts run out or
+                the retry budget is exhausted
+        """
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            try:
+                return func()
+            except Exception as e:
+                if not self._should_retry(e, attempt, attempts):
+                    raise
+                wait = self.delay(attempt, e)
+                print(f"An error occurred: {e}. Retrying in {wait:.1f}s...")
+                record_retry()
+                time.sleep(wait)
+                attempt += 1
+
+    async def acall(self, func: Callable[[], Awaitable[Any]], attempts: int = 3) -> Any:
+        """Async variant of call() for coroutine functions."""
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            try:
+                return await func()
+            except Exception as e:
+                if not self._should_retry(e, attempt, attempts):
+                    raise
+                wait = self.delay(attempt, e)
+                print(f"An error occurred: {e}. Retrying in {wait:.1f}s...")
+                record_retry()
+                await asyncio.sleep(wait)
+                attempt += 1
+
+
+# Policy used by the classifiers, analyzers and rewriter unless given another
+DEFAULT_RETRY_POLICY = RetryPolicy()
@@ -1,9 +1,11 @@
 """Text rewriters for destigmatizing content."""
 
-import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
-from .utils import get_model_mapping
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from .utils import get_model_mapping, get_generation_settings, generation_kwargs
+from .batch import BatchResult, run_batch, DEFAULT_MAX_WORKERS
+from .instrumentation import stage
+from .retry import DEFAULT_RETRY_POLICY
 
 from .clients import LLMClient, detect_client_type
 
@@ -25,9 +27,35 @@ class TextRewriter(ABC):
         pass
 
 
+_REWRITE_PROMPT_TEMPLATE = """
+        {instruction}; 
+        {definition};
+        Only rewrite the relevant parts of the post, do not rewrite the whole post. Do not change the meaning of the post or add any new information.
+        Also, match the output to the given stylistic profile.
+        Example:
+        post: "My mom is an addict."; This post uses the term 'addict'; [('tone': 'negative'),('punctuation_usage': 'moderate, with . being most frequent'),('passive_voice_usage': 'none'),('sentence_length_variation': 'ranging from short (5 words) to long (5 words) with an average of 5.0 words per sentence'),('lexical_diversity': 'moderately high')]
+        rewrite: "My mom has a substance use disorder."
+
+        Do not include "Here is the rewritten post:" in your response. Just return the rewritten post. Nothing more.
+        """
+
+_PASS_INSTRUCTIONS = {
+    1: ("Rewrite this post to remove any and all labeling.",
+        "Labeling includes the use of derogatory or othering language related to drug use/addiction."),
+    2: ("Rewrite this post to remove any and all instances of stereotyping, insinuations of separation, and/or discriminatory language.",
+        "Stereotyping reinforces negative generalizations about people who use drugs. Separation creates a divide between people who use drugs and those who don't. Discrimination implies or suggests unfair treatment based on drug use."),
+}
+
+
 class DestigmatizingRewriter(TextRewriter):
     """Rewriter that removes stigmatizing language."""
     
+    # System prompt for each rewrite pass, rendered once
+    pass_prompts = {
+        pass_type: _REWRITE_PROMPT_TEMPLATE.format(instruction=instruction, definition=definition)
+        for pass_type, (instruction, definition) in _PASS_INSTRUCTIONS.items()
+    }
+    
     def __init__(self, client: Any):
         """Initialize with an LLM client.
         
@@ -35,7 +63,12 @@ class DestigmatizingRewriter(TextRewriter):
             client: LLM client instance
         """
         self.client = client
-        self.retry_wait_time = 5  # seconds between retries
+        self.retry_policy = DEFAULT_RETRY_POLICY
+        # Generation settings per rewrite pass, see get_generation_settings()
+        self.generation = {
+            pass_type: get_generation_settings(f"rewrite_pass_{pass_type}")
+            for pass_type in _PASS_INSTRUCTIONS
+        }
         
     def _parse_explanation(self, explanation: str) -> Dict[str, str]:
         """Parse stigma explanation into components.
@@ -99,7 +132,7 @@ class DestigmatizingRewriter(TextRewriter):
         """
         # Determine client type and map model if needed
         client_type = detect_client_type(self.client)
-        mapped_model = get_model_mapping(model, client_type)
+        mapped_model = get_model_mapping(model, client_type) if model is not None else None
         components = self._parse_explanation(explanation)
         
         # First pass: remove labeling
@@ -125,32 +158,82 @@ class DestigmatizingRewriter(TextRewriter):
         )
         
         return final_text
+
+    async def arewrite(self, text: str, explanation: str, style_instruct: str,
+                       model: Optional[str] = None, retries: int = 2) -> str:
+        """Rewrite text to remove stigmatizing language using an async client.
+        
+        Args:
+            text: Text to rewrite
+            explanation: Explanation of stigma from classifier
+            style_instruct: Style instructions to maintain
+            model: Model to use for rewriting
+            retries: Number of retries on failure
+            
+        Returns:
+            str: Rewritten text
+        """
+        client_type = detect_client_type(self.client)
+        mapped_model = get_model_mapping(model, client_type) if model is not None else None
+        components = self._parse_explanation(explanation)
+        
+        intermediate_text = await self._aperform_rewrite_pass(
+            text=text,
+            components=components,
+            explanation=explanation,
+            style_instruct=style_instruct,
+            mapped_model=mapped_model,
+            retries=retries,
+            pass_type=1
+        )
+        
+        return await self._aperform_rewrite_pass(
+            text=intermediate_text,
+            components=components,
+            explanation=explanation,
+            style_instruct=style_instruct,
+            mapped_model=mapped_model,
+            retries=retries,
+            pass_type=2
+        )
+
+    def rewrite_many(self, items: Iterable[Tuple[str, str, str]],
+                     model: Optional[str] = None, retries: int = 2,
+                     max_workers: int = DEFAULT_MAX_WORKERS) -> List[BatchResult]:
+        """Rewrite many texts concurrently.
+        
+        Args:
+            items: Iterable of (text, explanation, style_instruct) tuples
+            model: Model to use for rewriting
+            retries: Number of retries on failure, per rewrite pass
+            max_workers: Maximum number of texts in flight at once
+            
+        Returns:
+            list: One BatchResult per item, in input order
+        """
+        return run_batch(
+            lambda item: self.rewrite(*item, model=model, retries=retries),
+            items,
+            max_workers=max_workers
+        )
     
-    def _perform_rewrite_pass(self, text: str, components: Dict, explanation: str, 
-                              style_instruct: str, mapped_model: str, retries: int, 
-                              pass_type: int) -> str:
-        """Perform a single rewrite pass.
+    def build_pass_messages(self, text: str, components: Dict, explanation: str,
+                            style_instruct: str, pass_type: int) -> List[Dict[str, str]]:
+        """Build the messages for a single rewrite pass.
         
         Args:
             text: Text to rewrite
             components: Parsed explanation components
             explanation: Original explanation text
             style_instruct: Style instructions to maintain
-            mapped_model: Mapped model name for current client
-            retries: Number of retries on failure
             pass_type: Pass type (1=remove labeling, 2=remove stereotyping/separation/discrimination)
             
         Returns:
-            str: Rewritten text for this pass
+            list: Messages to send to the LLM
         """
         if pass_type == 1:
-            instruction = "Rewrite this post to remove any and all labeling."
-            definition = "Labeling includes the use of derogatory or othering language related to drug use/addiction."
             explanation_part = components.get("labeling", explanation.lower())
         else:
-            instruction = "Rewrite this post to remove any and all instances of stereotyping, insinuations of separation, and/or discriminatory language."
-            definition = "Stereotyping reinforces negative generalizations about people who use drugs. Separation creates a divide between people who use drugs and those who don't. Discrimination implies or suggests unfair treatment based on drug use."
-            
             # Combine the non-labeling components for pass 2
             component_parts = []
             if "stereotyping" in components:
@@ -161,35 +244,83 @@ class DestigmatizingRewriter(TextRewriter):
                 component_parts.append(f"Discrimination: {components['discrimination']}")
             
             explanation_part = "; ".join(component_parts) if component_parts else explanation.lower()
-
-        prompt = f"""
-        {instruction}; 
-        {definition};
-        Only rewrite the relevant parts of the post, do not rewrite the whole post. Do not change the meaning of the post or add any new information.
-        Also, match the output to the given stylistic profile.
-        Example:
-        post: "My mom is an addict."; This post uses the term 'addict'; [('tone': 'negative'),('punctuation_usage': 'moderate, with . being most frequent'),('passive_voice_usage': 'none'),('sentence_length_variation': 'ranging from short (5 words) to long (5 words) with an average of 5.0 words per sentence'),('lexical_diversity': 'moderately high')]
-        rewrite: "My mom has a substance use disorder."
-
-        Do not include "Here is the rewritten post:" in your response. Just return the rewritten post. Nothing more.
-        """
         ex = f"This post uses {explanation_part}"
         
-        retry_count = retries
-        while retry_count > 0:
+        return [
+            {"role": "system", "content": self.pass_prompts[1 if pass_type == 1 else 2]},
+            {"role": "user", "content": text + ";" + ex + ";" + style_instruct}
+        ]
+    
+    def _pass_kwargs(self, pass_type: int, mapped_model: Optional[str]) -> Dict[str, Any]:
+        """Return the create_completion() generation arguments for a pass."""
+        kwargs = generation_kwargs(self.generation[1 if pass_type == 1 else 2],
+                                   mapped_model, self.client)
+        if kwargs["model"] is None:
+            kwargs["model"] = get_model_mapping(None, detect_client_type(self.client))
+        return kwargs
+    
+    def _perform_rewrite_pass(self, text: str, components: Dict, explanation: str, 
+                              style_instruct: str, mapped_model: str, retries: int, 
+                              pass_type: int) -> str:
+        """Perform a single rewrite pass.
+        
+        Args:
+            text: Text to rewrite
+            components: Parsed explanation components
+            explanation: Original explanation text
+            style_instruct: Style instructions to maintain
+            mapped_model: Mapped model name for current client, None for the
+                model configured for the pass or the client default
+            retries: Number of retries on failure
+            pass_type: Pass type (1=remove labeling, 2=remove stereotyping/separation/discrimination)
+            
+        Returns:
+            str: Rewritten text for this pass
+        """
+        messages = self.build_pass_messages(text, components, explanation,
+                                            style_instruct, pass_type)
+        kwargs = self._pass_kwargs(pass_type, mapped_model)
+        
+        with stage(f"rewrite_pass_{pass_type}"):
+            try:
+                rewritten = self.retry_policy.call(
+                    lambda: self.client.create_completion(messages=messages, **kwargs),
+                    attempts=retries
+                )
+            except Exception as e:
+                print(f"An error occurred: {e}. Giving up on this pass.")
+                return "Error rewriting text"
+            return rewritten.lower().strip()
+    
+    async def _aperform_rewrite_pass(self, text: str, components: Dict, explanation: str,
+                                     style_instruct: str, mapped_model: str, retries: int,
+                                     pass_type: int) -> str:
+        """Perform a single rewrite pass using an async client.
+        
+        Args:
+            text: Text to rewrite
+            components: Parsed explanation components
+            explanation: Original explanation text
+            style_instruct: Style instructions to maintain
+            mapped_model: Mapped model name for current client, None for the
+                model configured for the pass or the client default
+            retries: Number of retries on failure
+            pass_type: Pass type (1=remove labeling, 2=remove stereotyping/separation/discrimination)
+            
+        Returns:
+            str: Rewritten text for this pass
+        """
+        messages = self.build_pass_messages(text, components, explanation,
+                                            style_instruct, pass_type)
+        kwargs = self._pass_kwargs(pass_type, mapped_model)
+        
+        with stage(f"rewrite_pass_{pass_type}"):
             try:
-                rewritten = self.client.create_completion(
-                    messages=[
-                        {"role": "system", "content": prompt},
-                        {"role": "user", "content": text + ";" + ex + ";" + style_instruct}
-                    ],
-                    model=mapped_model
+                rewritten = await self.retry_policy.acall(
+                    lambda: self.client.acreate_completion(messages=messages, **kwargs),
+                    attempts=retries
                 )
-                return rewritten.lower().strip()
-                
             except Exception as e:
-                print(f"An error occurred: {e}. Retrying...")
-                retry_count -= 1
-                time.sleep(self.retry_wait_time)
-                
-        return "Error rewriting text"
+                print(f"An error occurred: {e}. Giving up on this pass.")
+                return "Error rewriting text"
+            return rewritten.lower().strip()
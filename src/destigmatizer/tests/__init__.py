@@ -10,6 +10,28 @@ from .test_stigma_classifier import test_stigma_classifier
 from .test_text_analyzer import test_text_analyzer
 from .test_rewriter import test_rewriter
 from .test_workflow import test_workflow
+from .test_batch import test_batch
+from .test_async import test_async
+from .test_cache import test_cache
+from .test_config_cache import test_config_cache
+from .test_prefilter import test_prefilter
+from .test_pipeline import test_combined_mode, test_pipeline, test_lazy_imports
+from .test_style_features import test_style_features
+from .test_prompt_caching import test_prompt_caching
+from .test_instrumentation import test_instrumentation
+from .test_fake_server import test_fake_server
+from .test_recording import test_recording
+from .test_ratelimit import test_ratelimit
+from .test_concurrency import test_concurrency
+from .test_retry import test_retry
+from .test_generation import test_generation
+from .test_cascade import test_cascade
+from .test_batch_jobs import test_batch_jobs
+from .test_packing import test_packing
+from .test_cli import test_cli
+from .test_frame import test_frame
+from .test_dedup import test_dedup
+from .test_stage_overlap import test_stage_overlap
 from .run_all_tests import run_all_tests, main
 
 __all__ = [
@@ -18,6 +40,30 @@ __all__ = [
     'test_text_analyzer',
     'test_rewriter',
     'test_workflow',
+    'test_batch',
+    'test_async',
+    'test_cache',
+    'test_config_cache',
+    'test_prefilter',
+    'test_combined_mode',
+    'test_pipeline',
+    'test_lazy_imports',
+    'test_style_features',
+    'test_prompt_caching',
+    'test_instrumentation',
+    'test_fake_server',
+    'test_recording',
+    'test_ratelimit',
+    'test_concurrency',
+    'test_retry',
+    'test_generation',
+    'test_cascade',
+    'test_batch_jobs',
+    'test_packing',
+    'test_cli',
+    'test_frame',
+    'test_dedup',
+    'test_stage_overlap',
     'run_all_tests',
     'main'
 ]
@@ -0,0 +1,32 @@
+import asyncio
+
+import destigmatizer
+
+from destigmatizer.tests.utils import FakeClient
+
+
+def test_async():
+    """
+    Test the async classifiers and pipeline against an offline client.
+    """
+    client = FakeClient()
+
+    async def run():
+        print("\nTesting async drug and stigma classification...")
+        drug_result = await destigmatizer.aclassify_if_drug("junkies everywhere", client)
+        stigma_result = await destigmatizer.aclassify_if_stigma("junkies everywhere", client)
+        assert drug_result == "d"
+        assert stigma_result.startswith("s, labeling")
+
+        print("\nTesting async pipeline on non-drug posts...")
+        results = await destigmatizer.aanalyze_and_rewrite_many(
+            ["nice weather", "lovely day"], client, max_concurrency=2
+        )
+        assert [r.value for r in results] == ["nice weather", "lovely day"]
+
+    asyncio.run(run())
+    print("✓ Async entry points returned expected results")
+
+
+if __name__ == "__main__":
+    test_async()
@@ -0,0 +1,39 @@
+import destigmatizer
+
+from destigmatizer.tests.utils import FakeClient
+
+
+def test_batch():
+    """
+    Test the concurrent batch entry points against an offline client.
+    """
+    client = FakeClient(fail_on="boom")
+    texts = [
+        "I smoked weed all weekend",
+        "The weather is lovely today",
+        "junkies are everywhere",
+        "boom",
+    ]
+
+    print("\nTesting batch drug classification...")
+    results = destigmatizer.classify_if_drug_many(texts, client, max_workers=4, retries=1)
+    assert [r.index for r in results] == [0, 1, 2, 3]
+    assert [r.value for r in results[:3]] == ["d", "nd", "d"]
+    # Classifier failures are reported as 'skipped', not raised
+    assert results[3].value == "skipped"
+    print(f"Drug classification results: {results}")
+
+    print("\nTesting per-item failure capture...")
+    def flaky(text):
+        if text == "boom":
+            raise ValueError("bad item")
+        return text.upper()
+    results = destigmatizer.run_batch(flaky, texts, max_workers=3)
+    assert [r.ok for r in results] == [True, True, True, False]
+    assert isinstance(results[3].error, ValueError)
+    assert results[0].value == texts[0].upper()
+    print("✓ Failures recorded per item in input order")
+
+
+if __name__ == "__main__":
+    test_batch()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+
+import destigmatizer
+
+from destigmatizer.batch_jobs import (
+    BatchJobRunner, LocalBatchBackend, OpenAIBatchBackend, AnthropicBatchBackend, BatchRequest,
+    get_batch_backend
+)
+from destigmatizer.clients import OpenAIClient, ClaudeClient
+from destigmatizer.fake_server import FakeProviderServer
+from destigmatizer.tests.utils import FakeClient
+
+
+POSTS = [
+    "The junkies downtown should all be locked up.",
+    "I smoke weed to relax after work.",
+    "Went hiking with my dog this weekend.",
+]
+
+
+class _StubStyle:
+    """Style analyzer that does not need NLTK data."""
+
+    def analyze(self, text):
+        return {"tone": "negative"}
+
+
+def _check(results):
+    assert [r.ok for r in results] == [True, True, True]
+    junkies, weed, hiking = (r.value for r in results)
+    assert junkies["drug"] == "d" and junkies["stigma"].startswith("s")
+    assert "people who use drugs" in junkies["output"]
+    assert junkies["style"]["top_emotions"] == "anger"
+    assert weed["drug"] == "d" and weed["stigma"] == "ns" and weed["output"] == POSTS[1]
+    assert hiking["drug"] == "nd" and hiking["stigma"] is None
+
+
+def test_batch_jobs():
+    """
+    Test the staged batch-job flow with local, OpenAI and Anthropic backends.
+    """
+    print("\nTesting the local backend...")
+    client = FakeClient()
+    runner = BatchJobRunner(client, backend=LocalBatchBackend(client), poll_interval=0)
+    runner.style_analyzer = _StubStyle()
+    results = runner.run(POSTS)
+    assert [r.value["drug"] for r in results] == ["d", "d", "nd"]
+    # Drug for every post, stigma for two, then emotion and two rewrite passes for one
+    assert client.calls == 3 + 2 + 3
+
+    with FakeProviderServer(batch_delay=0.05) as server:
+        print("\nTesting the OpenAI Batch backend against the stand-in server...")
+        openai_client = OpenAIClient(api_key="test", base_url=server.openai_base_url)
+        runner = BatchJobRunner(openai_client, model="gpt-4o-mini", poll_interval=0.02,
+                                timeout=10)
+        assert isinstance(runner.backend, OpenAIBatchBackend)
+        runner.style_analyzer = _StubStyle()
+        _check(runner.run(POSTS))
+
+        print("\nTesting batches through wrapped clients...")
+        wrapped = destigmatizer.initialize(api_key="test", client_type="openai",
+                                           base_url=server.openai_base_url,
+                                           cache_path=":memory:", rpm=6000)
+        runner = BatchJobRunner(wrapped, model="gpt-4o-mini", poll_interval=0.02, timeout=10)
+        assert isinstance(runner.backend, OpenAIBatchBackend)
+        assert runner.backend.sdk is wrapped.client.client.client
+        runner.style_analyzer = _StubStyle()
+        _check(runner.run(POSTS))
+        with tempfile.TemporaryDirectory() as tmp:
+            log = os.path.join(tmp, "log.jsonl")
+            destigmatizer.RecordingClient(openai_client, log).close()
+            assert isinstance(get_batch_backend(destigmatizer.ReplayClient(log)), LocalBatchBackend)
+
+        print("\nTesting the Anthropic Message Batches backend...")
+        claude_client = ClaudeClient(api_key="test", base_url=server.anthropic_base_url)
+        runner = BatchJobRunner(destigmatizer.CachedClient(claude_client, path=":memory:"),
+                                poll_interval=0.02, timeout=10)
+        assert isinstance(runner.backend, AnthropicBatchBackend)
+        runner.style_analyzer = _StubStyle()
+        _check(runner.run(POSTS))
+
+    print("\nTesting failed requests within a batch...")
+    with FakeProviderServer(error_rate=1.0) as server:
+        backend = OpenAIBatchBackend(OpenAIClient(api_key="test", base_url=server.openai_base_url))
+        answers = backend.run([BatchRequest("drug-0", [{"role": "user", "content": "hi"}],
+                                            "gpt-4o-mini")], poll_interval=0)
+        assert answers == {"drug-0": None}
+    print("✓ Batch jobs ran every stage and gated each on the previous one")
+
+
+if __name__ == "__main__":
+    test_batch_jobs()
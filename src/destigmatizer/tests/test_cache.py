@@ -0,0 +1,71 @@
+import asyncio
+import os
+import tempfile
+
+import destigmatizer
+
+from destigmatizer.classifiers import DrugClassifier
+
+from destigmatizer.tests.utils import FakeClient
+
+
+def test_cache():
+    """
+    Test that the completion cache serves repeated requests locally.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite")
+        fake = FakeClient()
+        client = destigmatizer.initialize(client=fake, cache_path=path, cache_max_entries=2)
+
+        print("\nTesting cache hits on repeated posts...")
+        first = destigmatizer.classify_if_drug("smoking weed", client)
+        second = destigmatizer.classify_if_drug("smoking weed", client)
+        assert first == second == "d"
+        assert fake.calls == 1
+        assert client.stats()["hits"] == 1
+
+        print("\nTesting persistence across client instances...")
+        reopened = destigmatizer.CachedClient(FakeClient(), path=path)
+        assert destigmatizer.classify_if_drug("smoking weed", reopened) == "d"
+        assert reopened.client.calls == 0
+
+        print("\nTesting LRU eviction and prompt versioning...")
+        destigmatizer.classify_if_drug("post two", client)
+        destigmatizer.classify_if_drug("post three", client)
+        assert len(client.cache) == 2
+        bumped = destigmatizer.CachedClient(FakeClient(), cache=client.cache,
+                                            prompt_version="edited")
+        destigmatizer.classify_if_drug("post three", bumped)
+        assert bumped.client.calls == 1
+
+        print("\nTesting sampled completions and the async path...")
+        calls = fake.calls
+        messages = [{"role": "user", "content": "tell me a story"}]
+        for _ in range(2):
+            client.create_completion(messages, temperature=0.7)
+        assert fake.calls == calls + 2 and len(client.cache) == 2
+        assert asyncio.run(DrugClassifier(client).aclassify("post three")) == "nd"
+        assert fake.calls == calls + 2
+
+        print("\nTesting coarse access times...")
+        lru = destigmatizer.CompletionCache(":memory:", max_entries=2, touch_interval=0)
+        lru.set("a", "1")
+        lru.set("b", "2")
+        assert lru.get("a") == "1"
+        lru.set("c", "3")
+        assert lru.get("b") is None and lru.get("a") == "1" and len(lru) == 2
+        lazy = destigmatizer.CompletionCache(":memory:", max_entries=2)
+        lazy.set("a", "1")
+        lazy.set("b", "2")
+        lazy.get("a")
+        lazy.set("c", "3")
+        # Within touch_interval the hit is not recorded, so "a" is still the oldest
+        assert lazy.get("a") is None and lazy.get("b") == "2"
+        reopened.cache.close()
+        client.cache.close()
+    print("✓ Cache served repeats, evicted old entries and honored prompt versions")
+
+
+if __name__ == "__main__":
+    test_cache()
@@ -0,0 +1,88 @@
+import asyncio
+
+import destigmatizer
+
+from destigmatizer.classifiers import DrugClassifier, StigmaClassifier
+from destigmatizer.clients import OpenAIClient
+from destigmatizer.fake_server import FakeProviderServer
+from destigmatizer.tests.utils import FakeClient
+
+
+class _UnsureSmallModel(FakeClient):
+    """Fake client whose small model flips its label when sampled."""
+
+    def create_completion(self, messages, model=None, temperature=0, max_tokens=1000, stop=None):
+        answer = super().create_completion(messages, model, temperature, max_tokens, stop)
+        small = destigmatizer.get_model_mapping("small", "openai")
+        if model == small and temperature > 0 and "Labeling Drug References" in messages[0]["content"]:
+            return "ND" if answer == "D" else "D"
+        return answer
+
+
+class _AlternatingSamples(FakeClient):
+    """Fake client whose sampled drug answers alternate between labels."""
+
+    def create_completion(self, messages, model=None, temperature=0, max_tokens=1000, stop=None):
+        answer = super().create_completion(messages, model, temperature, max_tokens, stop)
+        if temperature > 0 and self.calls % 2 == 0:
+            return "ND" if answer == "D" else "D"
+        return answer
+
+
+def test_cascade():
+    """
+    Test confidence scoring, escalation and escalation statistics.
+    """
+    print("\nTesting self-consistency when logprobs are unavailable...")
+    client = _UnsureSmallModel()
+    small = destigmatizer.get_model_mapping("small", "openai")
+    label, confidence = DrugClassifier(client).classify_with_confidence("I smoke weed", model=small)
+    assert label == "d" and abs(confidence - 1 / 3) < 1e-9
+    label, confidence = StigmaClassifier(client).classify_with_confidence("junkies", model=small)
+    assert label.startswith("s") and confidence == 1.0
+
+    print("\nTesting self-consistency through a cache...")
+    inner = _AlternatingSamples()
+    cached = destigmatizer.CachedClient(inner, cache=destigmatizer.CompletionCache(":memory:"),
+                                        cache_sampled=True)
+    for _ in range(2):
+        label, confidence = DrugClassifier(cached).classify_with_confidence("I smoke weed")
+        assert label == "d" and abs(confidence - 2 / 3) < 1e-9
+    # Each sample has its own entry, so the second round is served from the cache
+    assert inner.calls == 3 and cached.stats()["hits"] == 3
+
+    print("\nTesting escalation of uncertain answers...")
+    policy = destigmatizer.CascadePolicy(threshold=0.9)
+    drug = destigmatizer.CascadeClassifier(DrugClassifier(client), policy)
+    stigma = destigmatizer.CascadeClassifier(StigmaClassifier(client), policy)
+    assert drug.classify("I smoke weed") == "d"
+    assert stigma.classify("junkies everywhere").startswith("s")
+    stats = policy.stats()
+    assert stats["drug_classification"]["escalated"] == 1
+    assert stats["drug_classification"]["decided_by"]["medium"] == 1
+    assert stats["stigma_classification"]["escalation_rate"] == 0.0
+    assert 'tier="small"' in policy.to_prometheus()
+    assert asyncio.run(drug.aclassify("I smoke weed")) == "d"
+    assert policy.stats()["drug_classification"]["calls"] == 2
+
+    print("\nTesting logprob confidence from an OpenAI-compatible server...")
+    with FakeProviderServer() as server:
+        openai_client = OpenAIClient(api_key="test", base_url=server.openai_base_url)
+        label, confidence = DrugClassifier(openai_client).classify_with_confidence(
+            "I smoke weed every day", model="gpt-4o-mini")
+        assert label == "d" and 0.9 < confidence < 1.0
+        cached = destigmatizer.CachedClient(openai_client, cache=destigmatizer.CompletionCache(":memory:"))
+        for _ in range(2):
+            _, cached_confidence = DrugClassifier(cached).classify_with_confidence(
+                "I smoke weed every day", model="gpt-4o-mini")
+            assert cached_confidence == confidence
+        assert cached.stats()["hits"] == 1
+        strict = destigmatizer.CascadePolicy(threshold=0.99)
+        pipeline = destigmatizer.Pipeline(openai_client, cascade=strict)
+        pipeline.process("I smoke weed every day")
+        assert strict.stats()["drug_classification"]["decided_by"]["large"] == 1
+    print("✓ Cascade escalated uncertain answers and reported escalation rates")
+
+
+if __name__ == "__main__":
+    test_cascade()
@@ -0,0 +1,116 @@
+import csv
+import json
+import os
+import tempfile
+
+import destigmatizer
+
+from destigmatizer.cli import Checkpoint, main, process_file
+from destigmatizer.fake_server import FakeProviderServer
+from destigmatizer.tests.utils import FakeClient
+
+
+POSTS = [
+    "The junkies downtown should all be locked up.",
+    "I smoke weed to relax after work.",
+    "Went hiking with my dog this weekend.",
+    "Made pancakes for the kids this morning.",
+    "Those junkies by the station again.",
+]
+
+
+class _StubStyle:
+    """Style analyzer that does not need NLTK data."""
+
+    def analyze(self, text):
+        return {"tone": "negative"}
+
+
+def _pipeline(client):
+    pipeline = destigmatizer.Pipeline(client)
+    pipeline.analyzer.style_analyzer = _StubStyle()
+    return pipeline
+
+
+def _fail_on_junkies(process):
+    def _process(text):
+        if "junkies" in text:
+            raise RuntimeError("worker crashed")
+        return process(text)
+    return _process
+
+
+def _read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_cli():
+    """
+    Test streaming a file through the pipeline, checkpointing and resuming.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "posts.jsonl")
+        with open(source, "w", encoding="utf-8") as f:
+            for i, post in enumerate(POSTS):
+                f.write(json.dumps({"post_id": f"p{i}", "body": post}) + "\n")
+        output = os.path.join(tmp, "results.jsonl")
+
+        print("\nTesting an interrupted run...")
+        client = FakeClient()
+        stats = process_file(_pipeline(client), source, output, text_field="body",
+                             id_field="post_id", concurrency=2, limit=2)
+        assert stats["written"] == 2 and stats["failed"] == 0
+        # A record written without a journal entry and a torn journal line, as after a kill
+        with open(output, "a", encoding="utf-8") as f:
+            f.write('{"id": "p2", "text": "half')
+        with open(output + ".journal", "a", encoding="utf-8") as f:
+            f.write('{"id": "p2", "off')
+
+        print("\nTesting resume...")
+        client.calls = 0
+        stats = process_file(_pipeline(client), source, output, text_field="body",
+                             id_field="post_id", concurrency=2)
+        assert stats["resumed"] == 2 and stats["written"] == 3
+        # Drug for three posts, then stigma, emotion and two rewrites for the last one
+        assert client.calls == 3 + 4
+        results = {r["id"]: r for r in _read_jsonl(output)}
+        assert sorted(results) == ["p0", "p1", "p2", "p3", "p4"]
+        assert "people who use drugs" in results["p4"]["output"]
+        assert results["p2"]["drug"] == "nd" and results["p2"]["output"] == POSTS[2]
+        done, _ = Checkpoint(output + ".journal").load()
+        assert done == set(results)
+
+        print("\nTesting failed records are retried on the next run...")
+        pipeline = _pipeline(FakeClient())
+        pipeline.process = _fail_on_junkies(pipeline.process)
+        csv_output = os.path.join(tmp, "results.csv")
+        stats = process_file(pipeline, source, csv_output, text_field="body",
+                             id_field="post_id")
+        assert stats["failed"] == 2 and set(stats["failures"]) == {"p0", "p4"}
+        stats = process_file(_pipeline(FakeClient()), source, csv_output, text_field="body",
+                             id_field="post_id")
+        assert stats["resumed"] == 3 and stats["written"] == 2
+        with open(csv_output, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        assert sorted(row["id"] for row in rows) == ["p0", "p1", "p2", "p3", "p4"]
+        assert json.loads(next(r for r in rows if r["id"] == "p0")["style"])["top_emotions"] == "anger"
+
+        print("\nTesting the command against the stand-in server...")
+        plain = os.path.join(tmp, "plain.csv")
+        with open(plain, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["text"])
+            writer.writerows([[POSTS[1]], [POSTS[2]], [POSTS[3]]])
+        with FakeProviderServer() as server:
+            code = main(["run", plain, "-o", os.path.join(tmp, "plain.jsonl"),
+                         "--client", "openai", "--api-key", "test", "--model", "gpt-4o-mini",
+                         "--base-url", server.openai_base_url, "--prefilter"])
+        assert code == 0
+        records = _read_jsonl(os.path.join(tmp, "plain.jsonl"))
+        assert sorted((r["id"], r["drug"]) for r in records) == [("1", "d"), ("2", "nd"), ("3", "nd")]
+    print("✓ Bulk run streamed results, checkpointed them and resumed without rework")
+
+
+if __name__ == "__main__":
+    test_cli()
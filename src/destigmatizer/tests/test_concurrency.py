@@ -0,0 +1,112 @@
+import time
+import asyncio
+
+import destigmatizer
+
+from destigmatizer.tests.utils import FakeClient
+
+
+class _HangingClient(FakeClient):
+    """Async client whose requests never finish on their own."""
+
+    async def acreate_completion(self, messages, model=None, temperature=0, max_tokens=1000, stop=None):
+        await asyncio.sleep(60)
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_concurrency():
+    """
+    Test AIMD growth and back-off, error classification and request gating.
+    """
+    print("\nTesting error classification...")
+    try:
+        try:
+            raise _StatusError(429)
+        except Exception as e:
+            raise Exception(f"Error creating completion with OpenAI: {str(e)}")
+    except Exception as wrapped:
+        assert destigmatizer.is_overload_error(wrapped)
+    assert not destigmatizer.is_overload_error(_StatusError(400))
+    assert destigmatizer.is_overload_error(Exception("Request timed out"))
+
+    print("\nTesting additive increase and multiplicative decrease...")
+    controller = destigmatizer.AIMDController(initial=4, max_limit=16)
+    for _ in range(40):
+        controller.release(controller.acquire())
+    grown = controller.limit
+    assert grown > 4
+    # Concurrent failures from one window only halve the limit once
+    starts = [controller.acquire() for _ in range(3)]
+    for started in starts:
+        controller.release(started, _StatusError(503))
+    assert controller.limit == grown // 2 or controller.limit == int(grown * 0.5)
+    assert controller.stats()["decreases"] == 1
+    controller.release(controller.acquire(), _StatusError(400))
+    assert controller.stats()["decreases"] == 1
+    assert "destigmatizer_concurrency_limit" in controller.to_prometheus()
+
+    print("\nTesting per-kind latency baselines...")
+    mixed = destigmatizer.AIMDController(initial=4, max_limit=16, min_spike=0.01)
+    for _ in range(3):
+        mixed.release(mixed.acquire(), key=("m", 5))
+    # A rewrite is far slower than a classification but is not a spike
+    mixed.release(mixed.acquire() - 0.1, key=("m", 1000))
+    mixed.release(mixed.acquire() - 0.1, key=("m", 1000))
+    assert mixed.stats()["decreases"] == 0
+    # Against its own baseline, a slow classification still is
+    mixed.release(mixed.acquire() - 0.1, key=("m", 5))
+    assert mixed.stats()["decreases"] == 1
+
+    print("\nTesting that async callers are gated by the limit...")
+    gate = destigmatizer.AIMDController(initial=2, max_limit=2)
+    peak = 0
+    async def request():
+        nonlocal peak
+        started = await gate.aacquire()
+        peak = max(peak, gate.in_flight)
+        await asyncio.sleep(0.01)
+        gate.release(started)
+    async def burst():
+        await asyncio.gather(*(request() for _ in range(10)))
+    asyncio.run(burst())
+    assert peak == 2 and gate.in_flight == 0
+
+    print("\nTesting that cancelled requests release their slot...")
+    wrapped = destigmatizer.AdaptiveConcurrencyClient(
+        _HangingClient(), destigmatizer.AIMDController(initial=1, max_limit=1))
+    async def cancel_in_flight():
+        messages = [{"role": "user", "content": "hi"}]
+        task = asyncio.ensure_future(wrapped.acreate_completion(messages))
+        await asyncio.sleep(0.01)
+        assert wrapped.controller.in_flight == 1
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # The freed slot admits the next request
+        second = asyncio.ensure_future(wrapped.acreate_completion(messages))
+        await asyncio.sleep(0.01)
+        assert wrapped.controller.in_flight == 1
+        second.cancel()
+        await asyncio.gather(second, return_exceptions=True)
+    asyncio.run(cancel_in_flight())
+    assert wrapped.controller.in_flight == 0
+    assert wrapped.controller.stats()["decreases"] == 0
+
+    print("\nTesting the pipeline with adaptive concurrency...")
+    results = destigmatizer.analyze_and_rewrite_many(
+        ["nice weather", "I smoked weed"] * 5, FakeClient(),
+        concurrency=destigmatizer.AIMDController(initial=1, max_limit=4)
+    )
+    assert all(r.ok for r in results)
+    print("✓ The controller grew on success and backed off once per overload window")
+
+
+if __name__ == "__main__":
+    test_concurrency()
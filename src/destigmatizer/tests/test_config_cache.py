@@ -0,0 +1,40 @@
+import os
+import json
+import tempfile
+
+import destigmatizer
+
+
+def test_config_cache():
+    """
+    Test that the user config is cached and reloaded when the file changes.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "reframe_config.json")
+        with open(path, "w") as f:
+            json.dump({"default_models": {"openai": "model-a"}}, f)
+
+        old_env = os.environ.get("REFRAME_CONFIG_PATH")
+        os.environ["REFRAME_CONFIG_PATH"] = path
+        try:
+            print("\nTesting cached config lookups...")
+            destigmatizer.reload_config()
+            assert destigmatizer.get_default_model("openai") == "model-a"
+            first = destigmatizer.load_user_model_configs()
+            assert destigmatizer.load_user_model_configs() is first
+
+            print("\nTesting invalidation on file change...")
+            with open(path, "w") as f:
+                json.dump({"default_models": {"openai": "model-bb"}}, f)
+            assert destigmatizer.get_default_model("openai") == "model-bb"
+        finally:
+            if old_env is None:
+                del os.environ["REFRAME_CONFIG_PATH"]
+            else:
+                os.environ["REFRAME_CONFIG_PATH"] = old_env
+            destigmatizer.reload_config()
+    print("✓ Config cached and invalidated on change")
+
+
+if __name__ == "__main__":
+    test_config_cache()
@@ -0,0 +1,77 @@
+import asyncio
+
+import destigmatizer
+
+from destigmatizer.batch_jobs import BatchJobRunner, LocalBatchBackend
+from destigmatizer.dedup import expand_results
+from destigmatizer.tests.utils import FakeClient
+
+
+JUNKIES = ("The junkies downtown should all be locked up, they ruin every street "
+           "corner and nobody in this city does anything about it.")
+
+POSTS = [
+    JUNKIES,
+    "  the JUNKIES downtown should all be locked up, they ruin every street\n"
+    "corner and nobody in this city does anything about it.",
+    "> " + JUNKIES,
+    JUNKIES.replace("every street", "every single street"),
+    "I smoke weed to relax after work.",
+    "Went hiking with my dog this weekend.",
+]
+
+
+class _StubStyle:
+    """Style analyzer that does not need NLTK data."""
+
+    def analyze(self, text):
+        return {"tone": "negative"}
+
+
+def test_dedup():
+    """
+    Test exact and near-duplicate grouping and its use by the pipelines.
+    """
+    print("\nTesting exact and near-duplicate grouping...")
+    exact = destigmatizer.Deduplicator()
+    assert exact.group(POSTS) == [0, 0, 0, 3, 4, 5]
+    near = destigmatizer.Deduplicator(near_duplicates=True, threshold=0.7)
+    assert near.group(POSTS) == [0, 0, 0, 0, 4, 5]
+    assert near.stats()["near_duplicates"] == 1 and near.stats()["exact_duplicates"] == 2
+    strict = destigmatizer.Deduplicator(near_duplicates=True, threshold=1.0)
+    assert strict.group(POSTS)[3] == 3
+    representatives, positions = near.collapse(POSTS)
+    assert representatives == [POSTS[0], POSTS[4], POSTS[5]] and positions == [0, 0, 0, 0, 1, 2]
+
+    print("\nTesting a deduplicating pipeline...")
+    client = FakeClient()
+    pipeline = destigmatizer.Pipeline(client, dedup=destigmatizer.Deduplicator(near_duplicates=True,
+                                                                               threshold=0.7))
+    pipeline.analyzer.style_analyzer = _StubStyle()
+    records = [r.value for r in pipeline.process_many(POSTS)]
+    # Drug for three representatives, stigma for two, emotion and two rewrites for one
+    assert client.calls == 3 + 2 + 3
+    assert [r["text"] for r in records] == POSTS
+    assert all("people who use drugs" in r["output"] for r in records[:4])
+    assert records[4]["output"] == POSTS[4] and records[4]["stigma"] == "ns"
+    outputs = asyncio.run(pipeline.arun_many(POSTS))
+    assert [r.value for r in outputs][4:] == POSTS[4:]
+
+    print("\nTesting deduplicated batch jobs...")
+    client = FakeClient()
+    runner = BatchJobRunner(client, backend=LocalBatchBackend(client), poll_interval=0,
+                            dedup=destigmatizer.Deduplicator())
+    runner.style_analyzer = _StubStyle()
+    results = runner.run(POSTS)
+    assert client.calls == 4 + 3 + 2 * 3
+    assert [r.value["drug"] for r in results] == ["d", "d", "d", "d", "d", "nd"]
+
+    print("\nTesting that errors are copied to every member...")
+    failed = expand_results(["a", "A"], [0, 0], [destigmatizer.batch.BatchResult(
+        0, "a", error=RuntimeError("boom"))])
+    assert [r.ok for r in failed] == [False, False] and failed[1].input == "A"
+    print("✓ Duplicates were collapsed before any LLM call and results copied back")
+
+
+if __name__ == "__main__":
+    test_dedup()
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import destigmatizer
+
+from destigmatizer.fake_server import FakeProviderServer
+from destigmatizer.benchmark import run_benchmark
+
+
+def test_fake_server():
+    """
+    Test the stand-in provider server through the real SDK clients.
+    """
+    posts = ["nice weather today", "I smoked weed yesterday"]
+    with FakeProviderServer(latency=0.001) as server:
+        print("\nTesting the OpenAI-compatible endpoint...")
+        client = destigmatizer.get_client("openai", "offline", base_url=server.openai_base_url)
+        results = destigmatizer.Pipeline(client).process_many(posts, max_workers=2)
+        assert [r.value["drug"] for r in results] == ["nd", "d"]
+        assert results[1].value["stigma"] == "ns"
+        assert server.requests == 3
+
+        print("\nTesting injected errors...")
+        server.error_rate = 1.0
+        client.client = client.client.with_options(max_retries=0)
+        try:
+            client.create_completion([{"role": "user", "content": "hi"}], model="m")
+            assert False, "Expected an injected error"
+        except Exception as e:
+            assert "Injected error" in str(e)
+        assert server.errors == 1
+
+    print("\nTesting the server is only imported on use...")
+    check = ("import sys, destigmatizer; assert 'http.server' not in sys.modules; "
+             "assert destigmatizer.FakeProviderServer is not None")
+    source = os.path.dirname(os.path.dirname(destigmatizer.__file__))
+    subprocess.run([sys.executable, "-c", check], check=True,
+                   env=dict(os.environ, PYTHONPATH=source))
+
+    print("\nTesting the benchmark runner...")
+    reports = run_benchmark(posts * 4, scenarios=["sequential", "batch", "async"],
+                            concurrency=4, latency=0.001, trace_memory=False)
+    assert [r["scenario"] for r in reports] == ["sequential", "batch", "async"]
+    assert all(r["posts"] == 8 and r["errors"] == 0 and r["posts_per_sec"] > 0 for r in reports)
+    print(f"Benchmark: {reports}")
+    print("✓ Stand-in server answered SDK requests and the benchmark ran offline")
+
+
+if __name__ == "__main__":
+    test_fake_server()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+
+import destigmatizer
+
+from destigmatizer.cli import main
+from destigmatizer.fake_server import FakeProviderServer
+from destigmatizer.tests.utils import FakeClient
+
+
+class _StubStyle:
+    """Style analyzer that does not need NLTK data."""
+
+    def analyze(self, text):
+        return {"tone": "negative"}
+
+
+def _pipeline(client):
+    pipeline = destigmatizer.Pipeline(client)
+    pipeline.analyzer.style_analyzer = _StubStyle()
+    return pipeline
+
+
+def test_frame():
+    """
+    Test column-wise processing of DataFrames, Arrow tables and Parquet files.
+    """
+    print("\nTesting a DataFrame with duplicate and missing texts...")
+    df = pd.DataFrame({
+        "post_id": [1, 2, 3, 4, 5],
+        "body": ["The junkies downtown should all be locked up.", "I smoke weed daily.",
+                 "The junkies downtown should all be locked up.", None, "Went hiking today."],
+    })
+    client = FakeClient()
+    result = destigmatizer.destigmatize_frame(df, "body", pipeline=_pipeline(client))
+    assert "drug" not in df.columns
+    # Three distinct texts: drug for each, stigma for two, emotion and rewrites for one
+    assert client.calls == 3 + 2 + 3
+    assert list(result["drug"].fillna("-")) == ["d", "d", "d", "-", "nd"]
+    assert result.loc[0, "emotion"] == "anger" and result.loc[0, "style"] == '{"tone": "negative"}'
+    assert "people who use drugs" in result.loc[2, "output"]
+    assert result.loc[1, "output"] == "I smoke weed daily." and result.loc[1, "stigma"] == "ns"
+    assert result["error"].isna().all()
+
+    print("\nTesting Arrow tables and prefixed columns...")
+    table = pa.Table.from_pandas(df)
+    out = destigmatizer.destigmatize_frame(table, "body", pipeline=_pipeline(FakeClient()),
+                                           prefix="reframe_")
+    assert isinstance(out, pa.Table) and "reframe_rewritten" in out.column_names
+
+    print("\nTesting Parquet round trips through the command line...")
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "posts.parquet")
+        target = os.path.join(tmp, "results.arrow")
+        # Stigmatizing posts need NLTK style data, so only write the others
+        destigmatizer.write_frame(df[df["post_id"].isin([2, 4, 5])], source)
+        with FakeProviderServer() as server:
+            code = main(["frame", source, "-o", target, "--text-col", "body",
+                         "--client", "openai", "--api-key", "test", "--model", "gpt-4o-mini",
+                         "--base-url", server.openai_base_url, "--prefilter"])
+        assert code == 0
+        written = destigmatizer.read_frame(target)
+        assert list(written["drug"].fillna("-")) == ["d", "-", "nd"]
+        assert written.loc[0, "stigma"] == "ns" and list(written["post_id"]) == [2, 4, 5]
+    print("✓ Frames were deduplicated, processed concurrently and written back as columns")
+
+
+if __name__ == "__main__":
+    test_frame()
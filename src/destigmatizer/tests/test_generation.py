@@ -0,0 +1,91 @@
+import os
+import json
+import tempfile
+
+import destigmatizer
+
+from destigmatizer.classifiers import DrugClassifier, StigmaClassifier
+from destigmatizer.clients import OpenAIClient, _claude_params
+from destigmatizer.fake_server import FakeProviderServer
+from destigmatizer.rewriters import DestigmatizingRewriter
+from destigmatizer.tests.utils import FakeClient
+
+
+class _CapturingServer(FakeProviderServer):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.bodies = []
+
+    def handle(self, path, body):
+        self.bodies.append(body)
+        return super().handle(path, body)
+
+
+def test_generation():
+    """
+    Test per-stage generation settings and that they reach the provider.
+    """
+    print("\nTesting built-in stage defaults...")
+    drug = destigmatizer.get_generation_settings("drug_classification", config={})
+    assert drug["max_tokens"] == 5 and drug["stop"] == ["\n"] and drug["model_name"] is None
+    assert destigmatizer.get_generation_settings("unknown_stage", config={})["max_tokens"] == 1000
+
+    print("\nTesting named and inline stage configs...")
+    config = {
+        "named_configs": {"creative": {"model_name": "medium", "temperature": 0.7,
+                                       "max_tokens": 2000, "top_p": 0.9}},
+        "stage_configs": {
+            "stigma_classification": "creative",
+            "rewrite_pass_2": {"config": "creative", "max_tokens": 800, "stop": "###"},
+        },
+    }
+    stigma = destigmatizer.get_generation_settings("stigma_classification", config)
+    assert stigma == {"model_name": "medium", "temperature": 0.7, "max_tokens": 2000, "stop": None}
+    rewrite = destigmatizer.get_generation_settings("rewrite_pass_2", config)
+    assert rewrite["max_tokens"] == 800 and rewrite["stop"] == ["###"]
+    assert "top_p" not in rewrite
+
+    print("\nTesting that classifiers forward the stage settings...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "reframe_config.json")
+        with open(path, "w") as f:
+            json.dump(config, f)
+        old_env = os.environ.get("REFRAME_CONFIG_PATH")
+        os.environ["REFRAME_CONFIG_PATH"] = path
+        try:
+            destigmatizer.reload_config()
+            client = FakeClient()
+            assert DrugClassifier(client).classify("I smoke weed", model="gpt-4o-mini") == "d"
+            assert client.requests[-1]["max_tokens"] == 5
+            assert client.requests[-1]["stop"] == ["\n"]
+            StigmaClassifier(client).classify("junkies everywhere")
+            # The stage's model applies only when the caller gives none
+            assert client.requests[-1]["model"] == destigmatizer.get_model_mapping("medium", "openai")
+            assert client.requests[-1]["temperature"] == 0.7
+            DestigmatizingRewriter(client).rewrite("junkies", "labeling: 'junkies'", "")
+            assert [r["max_tokens"] for r in client.requests[-2:]] == [1000, 800]
+            assert client.requests[-1]["stop"] == ["###"]
+        finally:
+            if old_env is None:
+                del os.environ["REFRAME_CONFIG_PATH"]
+            else:
+                os.environ["REFRAME_CONFIG_PATH"] = old_env
+            destigmatizer.reload_config()
+
+    print("\nTesting that the OpenAI client sends max_tokens and stop...")
+    with _CapturingServer() as server:
+        client = OpenAIClient(api_key="test", base_url=server.openai_base_url)
+        client.create_completion([{"role": "user", "content": "hi"}], model="gpt-4o-mini",
+                                 max_tokens=7, stop=["\n"])
+        assert server.bodies[-1]["max_tokens"] == 7
+        assert server.bodies[-1]["stop"] == ["\n"]
+
+    print("\nTesting Claude stop sequence filtering...")
+    params = _claude_params(0, 5, ["\n", "END"])
+    assert params == {"temperature": 0, "max_tokens": 5, "stop_sequences": ["END"]}
+    assert "stop_sequences" not in _claude_params(0, 5, ["\n"])
+    print("✓ Stage generation settings resolved and forwarded")
+
+
+if __name__ == "__main__":
+    test_generation()
@@ -0,0 +1,48 @@
+import destigmatizer
+
+from destigmatizer.tests.utils import FakeClient
+
+
+def test_instrumentation():
+    """
+    Test per-stage events, the metrics aggregator and the Prometheus exporter.
+    """
+    metrics = destigmatizer.MetricsAggregator()
+    events = []
+    instrumentation = destigmatizer.Instrumentation([metrics, events.append])
+    client = destigmatizer.CachedClient(FakeClient(fail_on="boom"), path=":memory:")
+    pipeline = destigmatizer.Pipeline(client, instrumentation=instrumentation,
+                                      retry_policy=destigmatizer.RetryPolicy(base_delay=0))
+
+    print("\nTesting stage events from the pipeline...")
+    pipeline.run("I smoked weed")
+    pipeline.run("I smoked weed")
+    assert [e.stage for e in events] == ["drug_classification", "stigma_classification"] * 2
+    assert events[2].cache_hits == 1 and events[0].cache_hits == 0
+
+    print("\nTesting retries and rewrite passes...")
+    assert pipeline.run("boom weed") == "boom weed"
+    assert events[-1].stage == "drug_classification" and events[-1].retries == 1
+    with instrumentation.activate():
+        pipeline.rewriter.rewrite("junkies everywhere", "labeling: 'junkies'", "{}")
+    assert [e.stage for e in events[-2:]] == ["rewrite_pass_1", "rewrite_pass_2"]
+
+    print("\nTesting aggregation and export...")
+    summary = metrics.summary()
+    assert summary["drug_classification"]["latency"]["count"] == 3
+    assert summary["drug_classification"]["retries"] == 1
+    assert summary["stigma_classification"]["cache_hits"] == 1
+    assert summary["rewrite_pass_1"]["latency"]["p99"] >= summary["rewrite_pass_1"]["latency"]["p50"]
+    exposition = metrics.to_prometheus()
+    assert 'destigmatizer_stage_duration_seconds_count{stage="drug_classification"} 3' in exposition
+    assert 'destigmatizer_stage_retries_total{stage="drug_classification"} 1' in exposition
+
+    print("\nTesting that nothing is recorded without activation...")
+    before = len(events)
+    pipeline.drug_classifier.classify("smoking weed")
+    assert len(events) == before
+    print("✓ Stages reported timing, retries and cache hits")
+
+
+if __name__ == "__main__":
+    test_instrumentation()
@@ -0,0 +1,95 @@
+import asyncio
+
+import destigmatizer
+
+from destigmatizer.classifiers import DrugClassifier, StigmaClassifier
+from destigmatizer.clients import OpenAIClient
+from destigmatizer.fake_server import FakeProviderServer
+from destigmatizer.ratelimit import estimate_tokens
+from destigmatizer.tests.utils import FakeClient
+
+
+POSTS = [
+    "The junkies downtown should all be locked up.",
+    "I smoke weed to relax after work.",
+    "Went hiking with my dog this weekend.",
+    "Made pancakes for the kids\nthis morning.",
+]
+
+
+class _StubStyle:
+    """Style analyzer that does not need NLTK data."""
+
+    def analyze(self, text):
+        return {"tone": "negative"}
+
+
+class _ShuffledAnswers(FakeClient):
+    """Fake client that drops the last line of every packed answer."""
+
+    def create_completion(self, messages, model=None, temperature=0, max_tokens=1000, stop=None):
+        answer = super().create_completion(messages, model, temperature, max_tokens, stop)
+        if "several posts at once" in messages[0]["content"]:
+            return "\n".join(answer.splitlines()[:-1])
+        return answer
+
+
+def test_packing():
+    """
+    Test packing posts into shared requests, strict parsing and fallback.
+    """
+    print("\nTesting packed drug and stigma classification...")
+    client = FakeClient()
+    drug = destigmatizer.PackedClassifier(DrugClassifier(client))
+    results = drug.classify_many(POSTS)
+    assert [r.value for r in results] == ["d", "d", "nd", "nd"]
+    assert client.calls == 1 and client.requests[0]["stop"] is None
+    assert drug.stats()["posts_per_pack"] == 4.0
+    stigma = destigmatizer.PackedClassifier(StigmaClassifier(client))
+    labels = [r.value for r in stigma.classify_many(POSTS[:2])]
+    assert labels[0].startswith("s, labeling") and labels[1] == "ns"
+
+    print("\nTesting the token budget...")
+    tight = destigmatizer.PackedClassifier(DrugClassifier(client), token_budget=1)
+    assert tight.pack(POSTS) == [[0], [1], [2], [3]]
+    prefix = estimate_tokens(list(drug.prefix_messages()), 0)
+    two = destigmatizer.PackedClassifier(DrugClassifier(client), token_budget=prefix + 30)
+    assert two.pack(POSTS) == [[0, 1], [2, 3]]
+    assert destigmatizer.PackedClassifier(DrugClassifier(client), max_pack_size=3).pack(POSTS) == [[0, 1, 2], [3]]
+
+    print("\nTesting strict parsing...")
+    assert drug.parse("[1] D\n[2] ND", 2) == ["d", "nd"]
+    assert drug.parse("[2] D\n[1] ND", 2) is None
+    assert drug.parse("[1] D\n[2] maybe", 2) is None
+    assert drug.parse("[1] D", 2) is None
+
+    print("\nTesting fallback to single-post requests...")
+    broken = _ShuffledAnswers()
+    fallback = destigmatizer.PackedClassifier(DrugClassifier(broken))
+    assert [r.value for r in fallback.classify_many(POSTS)] == ["d", "d", "nd", "nd"]
+    assert broken.calls == 1 + len(POSTS) and fallback.stats()["fallbacks"] == 1
+
+    print("\nTesting prefilter short circuits and async packing...")
+    prefiltered = destigmatizer.PackedClassifier(
+        DrugClassifier(client, prefilter=destigmatizer.LexiconPrefilter()))
+    client.calls = 0
+    results = asyncio.run(prefiltered.aclassify_many(POSTS))
+    assert [r.value for r in results] == ["d", "d", "nd", "nd"]
+    assert client.calls == 1
+
+    print("\nTesting packed pipelines against the stand-in server...")
+    with FakeProviderServer() as server:
+        openai_client = OpenAIClient(api_key="test", base_url=server.openai_base_url)
+        pipeline = destigmatizer.Pipeline(openai_client, model="gpt-4o-mini", packed=True)
+        pipeline.analyzer.style_analyzer = _StubStyle()
+        records = [r.value for r in pipeline.process_many(POSTS)]
+        assert [r["drug"] for r in records] == ["d", "d", "nd", "nd"]
+        assert "people who use drugs" in records[0]["output"]
+        assert records[1]["stigma"] == "ns"
+        # One packed drug request, one packed stigma request, emotion and two rewrite passes
+        assert server.requests == 5
+    print("✓ Packed classification shared requests and fell back on malformed answers")
+
+
+if __name__ == "__main__":
+    test_packing()
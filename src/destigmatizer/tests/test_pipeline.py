@@ -0,0 +1,68 @@
+import os
+import sys
+import subprocess
+
+import destigmatizer
+
+from destigmatizer.tests.utils import FakeClient
+
+
+def test_combined_mode():
+    """
+    Test single-request drug and stigma classification in the pipeline.
+    """
+    client = FakeClient()
+
+    print("\nTesting combined classification...")
+    result = destigmatizer.classify_drug_and_stigma("junkies everywhere", client)
+    assert result["drug"] == "d" and result["stigma"] == "s"
+    assert result["attributes"]["separation"] == "us vs them"
+    assert result["explanation"].startswith("labeling: 'junkies', stereotyping:")
+
+    print("\nTesting combined mode in the pipeline...")
+    assert destigmatizer.analyze_and_rewrite_text("nice weather", client, combined=True) == "nice weather"
+    assert destigmatizer.analyze_and_rewrite_text("I smoked weed", client, combined=True) == "I smoked weed"
+    assert client.calls == 3
+    print("✓ Combined mode used one request per post")
+
+
+
+def test_pipeline():
+    """
+    Test the reusable Pipeline object and its shared prompt prefixes.
+    """
+    client = FakeClient()
+    pipeline = destigmatizer.Pipeline(client)
+
+    print("\nTesting shared few-shot prefixes...")
+    first = pipeline.drug_classifier.build_messages("one")
+    second = pipeline.drug_classifier.build_messages("two")
+    assert first[0] is second[0] and first[-1]["content"] == "one"
+    assert len(first) == 2 * len(destigmatizer.DrugClassifier.examples) + 2
+
+    print("\nTesting per-stage records...")
+    results = pipeline.process_many(["nice weather", "I smoked weed"], max_workers=2)
+    assert results[0].value["drug"] == "nd" and results[0].value["stigma"] is None
+    assert results[1].value["drug"] == "d" and results[1].value["stigma"] == "ns"
+    assert results[1].value["output"] == "I smoked weed"
+    print(f"Pipeline records: {[r.value for r in results]}")
+
+
+def test_lazy_imports():
+    """
+    Test that importing the package does not import NLTK or lexicalrichness.
+    """
+    print("\nTesting import cost...")
+    code = ("import sys, destigmatizer; "
+            "print(any(m.split('.')[0] in ('nltk', 'lexicalrichness') for m in sys.modules))")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                            text=True, check=True, env=env).stdout.strip()
+    assert output == "False"
+    print("✓ Heavy analyzer dependencies are imported on first use")
+
+
+if __name__ == "__main__":
+    test_combined_mode()
+    test_pipeline()
+    test_lazy_imports()
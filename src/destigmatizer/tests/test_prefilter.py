@@ -0,0 +1,35 @@
+import destigmatizer
+
+from destigmatizer.tests.utils import FakeClient
+
+
+def test_prefilter():
+    """
+    Test that the lexicon prefilter skips the LLM for posts without drug terms.
+    """
+    prefilter = destigmatizer.LexiconPrefilter(extra_terms=["zaza"])
+
+    print("\nTesting lexicon matching...")
+    assert prefilter.find_terms("He's a Junkie who relapsed on heroin") == ["junkie", "relapsed", "heroin"]
+    assert prefilter.matches("smoking some zaza tonight")
+    assert not prefilter.matches("The weather is lovely and the potatoes are done")
+
+    print("\nTesting short-circuited classification...")
+    prefilter.reset()
+    client = FakeClient()
+    results = destigmatizer.classify_if_drug_many(
+        ["I smoked weed", "nice weather", "great game last night"],
+        client,
+        prefilter=prefilter
+    )
+    assert [r.value for r in results] == ["d", "nd", "nd"]
+    assert client.calls == 1
+    report = prefilter.report()
+    assert report["calls_saved"] == 2 and report["sent_to_llm"] == 1
+    assert prefilter.is_candidate("I smoked weed") and not prefilter.is_candidate("nice weather")
+    assert prefilter.report() == report
+    print(f"Prefilter report: {report}")
+
+
+if __name__ == "__main__":
+    test_prefilter()
@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import destigmatizer
+
+from destigmatizer.clients import _to_claude_messages, _openai_usage, _claude_usage
+from destigmatizer.classifiers import DrugClassifier
+
+
+def test_prompt_caching():
+    """
+    Test Claude cache_control markers and normalized usage reporting.
+    """
+    messages = DrugClassifier(None).build_messages("smoking weed")
+
+    print("\nTesting few-shot answers are kept as assistant turns...")
+    system, plain = _to_claude_messages(messages)
+    assert system == messages[0]["content"]
+    assert len(plain) == len(messages) - 1
+    assert [m["role"] for m in plain[:2]] == ["user", "assistant"]
+    assert plain[-1] == {"role": "user", "content": "smoking weed"}
+
+    print("\nTesting cache_control marks the static prefix...")
+    system, cached = _to_claude_messages(messages, cache_prefix=True)
+    assert system[0]["cache_control"] == {"type": "ephemeral"}
+    assert cached[-2]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert cached[-1] == plain[-1]
+
+    print("\nTesting the client factories forward prompt_caching...")
+    assert destigmatizer.get_client("claude", "offline", prompt_caching=True).prompt_caching
+    assert destigmatizer.get_async_client("claude", "offline", prompt_caching=True).prompt_caching
+    assert not destigmatizer.get_client("claude", "offline").prompt_caching
+    client = destigmatizer.initialize(api_key="offline", client_type="claude", prompt_caching=True)
+    assert client.prompt_caching
+
+    print("\nTesting usage normalization...")
+    openai_response = SimpleNamespace(usage=SimpleNamespace(
+        prompt_tokens=1200, completion_tokens=2,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=1024)
+    ))
+    assert _openai_usage(openai_response)["cached_tokens"] == 1024
+    claude_response = SimpleNamespace(usage=SimpleNamespace(
+        input_tokens=10, output_tokens=2,
+        cache_read_input_tokens=1500, cache_creation_input_tokens=0
+    ))
+    usage = _claude_usage(claude_response)
+    assert usage["input_tokens"] == 1510 and usage["cached_tokens"] == 1500
+    print("✓ Static prefixes were marked for caching and cached tokens were reported")
+
+
+if __name__ == "__main__":
+    test_prompt_caching()
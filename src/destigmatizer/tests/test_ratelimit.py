@@ -0,0 +1,51 @@
+import time
+import asyncio
+
+import destigmatizer
+
+from destigmatizer.tests.utils import FakeClient
+
+
+def test_ratelimit():
+    """
+    Test token-bucket pacing, token settlement and the shared limiter registry.
+    """
+    print("\nTesting request pacing across threads...")
+    limiter = destigmatizer.RateLimiter(rpm=6000)
+    client = destigmatizer.RateLimitedClient(FakeClient(), limiter=limiter)
+    start = time.monotonic()
+    results = destigmatizer.classify_if_drug_many(["smoking weed"] * 150, client, max_workers=8)
+    elapsed = time.monotonic() - start
+    assert all(r.value == "d" for r in results)
+    # 100 requests fit the one-second burst, the remaining 50 refill at 100/s
+    assert 0.4 <= elapsed < 2.0, elapsed
+    assert limiter.stats()["acquired"] == 150
+
+    print("\nTesting token reservations and refunds...")
+    tokens = destigmatizer.RateLimiter(tpm=60000)
+    assert tokens.acquire(1000) == 0
+    assert tokens.tokens.level < 1
+    tokens.settle(1000, 200)
+    assert tokens.tokens.level >= 799
+
+    print("\nTesting async pacing...")
+    async_limiter = destigmatizer.RateLimiter(rpm=1200)
+    async def burst():
+        return await asyncio.gather(*(async_limiter.aacquire() for _ in range(30)))
+    start = time.monotonic()
+    asyncio.run(burst())
+    assert time.monotonic() - start >= 0.45
+
+    print("\nTesting the shared registry...")
+    destigmatizer.reset_rate_limiters()
+    first = destigmatizer.get_rate_limiter("openai", "gpt-4o", rpm=100)
+    assert destigmatizer.get_rate_limiter("openai", "gpt-4o") is first
+    assert destigmatizer.get_rate_limiter("openai", "gpt-4o-mini", rpm=100) is not first
+    wrapped = destigmatizer.initialize(client=FakeClient(), rpm=100)
+    assert isinstance(wrapped, destigmatizer.RateLimitedClient)
+    destigmatizer.reset_rate_limiters()
+    print("✓ Requests were paced to the configured budget")
+
+
+if __name__ == "__main__":
+    test_ratelimit()
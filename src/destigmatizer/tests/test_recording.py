@@ -0,0 +1,88 @@
+import os
+import asyncio
+import tempfile
+
+import destigmatizer
+
+from destigmatizer.classifiers import DrugClassifier
+from destigmatizer.clients import OpenAIClient
+from destigmatizer.fake_server import FakeProviderServer
+from destigmatizer.tests.utils import FakeClient
+
+
+class _AlternatingSamples(FakeClient):
+    """Fake client whose sampled drug answers alternate between labels."""
+
+    def create_completion(self, messages, model=None, temperature=0, max_tokens=1000, stop=None):
+        answer = super().create_completion(messages, model, temperature, max_tokens, stop)
+        if temperature > 0 and self.calls % 2 == 0:
+            return "ND" if answer == "D" else "D"
+        return answer
+
+
+def test_recording():
+    """
+    Test recording LLM traffic and replaying it without the original client.
+    """
+    posts = ["nice weather", "I smoked weed", "junkies everywhere"]
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("log.jsonl", "log.jsonl.gz"):
+            path = os.path.join(tmp, name)
+            fake = FakeClient()
+
+            print(f"\nTesting recording to {name}...")
+            with destigmatizer.RecordingClient(fake, path) as recorder:
+                recorded = destigmatizer.classify_if_drug_many(posts, recorder)
+                destigmatizer.classify_if_stigma("junkies everywhere", recorder)
+            assert recorder.recorded == fake.calls == 4
+
+            print("\nTesting replay...")
+            replay = destigmatizer.ReplayClient(path)
+            assert replay.client_type == "openai" and len(replay) == 4
+            replayed = destigmatizer.classify_if_drug_many(posts, replay)
+            assert [r.value for r in replayed] == [r.value for r in recorded]
+            stigma = asyncio.run(destigmatizer.aclassify_if_stigma("junkies everywhere", replay))
+            assert stigma.startswith("s, labeling")
+
+            print("\nTesting misses...")
+            try:
+                replay.create_completion([{"role": "user", "content": "unseen"}])
+                assert False, "Expected a replay miss"
+            except destigmatizer.ReplayMissError:
+                pass
+            backed = destigmatizer.ReplayClient(path, fallback=FakeClient())
+            assert backed.create_completion([{"role": "system", "content": "emotion recognition"},
+                                             {"role": "user", "content": "unseen"}]) == "anger"
+            assert backed.misses == 1
+
+        print("\nTesting replay of confidence samples under a cascade...")
+        path = os.path.join(tmp, "cascade.jsonl")
+        recorded_policy = destigmatizer.CascadePolicy(threshold=0.6)
+        with destigmatizer.RecordingClient(_AlternatingSamples(), path) as recorder:
+            recorded = DrugClassifier(recorder).classify_with_confidence("I smoke weed")
+            cascade = destigmatizer.CascadeClassifier(DrugClassifier(recorder), recorded_policy)
+            recorded_label = cascade.classify("I smoke weed")
+        replay = destigmatizer.ReplayClient(path)
+        assert DrugClassifier(replay).classify_with_confidence("I smoke weed") == recorded
+        replayed_policy = destigmatizer.CascadePolicy(threshold=0.6)
+        cascade = destigmatizer.CascadeClassifier(DrugClassifier(replay), replayed_policy)
+        assert cascade.classify("I smoke weed") == recorded_label == "d"
+        assert replayed_policy.stats() == recorded_policy.stats()
+        assert replay.misses == 0
+
+        print("\nTesting replay of logprob confidence...")
+        path = os.path.join(tmp, "logprobs.jsonl")
+        with FakeProviderServer() as server:
+            openai_client = OpenAIClient(api_key="test", base_url=server.openai_base_url)
+            with destigmatizer.RecordingClient(openai_client, path) as recorder:
+                recorded = DrugClassifier(recorder).classify_with_confidence(
+                    "I smoke weed every day", model="gpt-4o-mini")
+        assert 0.9 < recorded[1] < 1.0
+        replay = destigmatizer.ReplayClient(path)
+        assert DrugClassifier(replay).classify_with_confidence(
+            "I smoke weed every day", model="gpt-4o-mini") == recorded
+    print("✓ Replayed runs matched the recording without calling the client")
+
+
+if __name__ == "__main__":
+    test_recording()
@@ -0,0 +1,79 @@
+import time
+from types import SimpleNamespace
+
+import destigmatizer
+
+from destigmatizer.fake_server import FakeProviderServer
+
+
+class _SDKError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def test_retry():
+    """
+    Test error classification, Retry-After, attempt limits and the retry budget.
+    """
+    print("\nTesting error classification...")
+    assert destigmatizer.is_retryable(_SDKError(429))
+    assert destigmatizer.is_retryable(_SDKError(503))
+    assert not destigmatizer.is_retryable(_SDKError(400))
+    assert destigmatizer.is_retryable(TimeoutError())
+    wrapped = destigmatizer.LLMClientError.wrap("OpenAI", _SDKError(429, {"retry-after": "7"}))
+    assert wrapped.status_code == 429 and wrapped.retry_after == 7.0
+    assert str(wrapped) == "Error creating completion with OpenAI: HTTP 429"
+
+    print("\nTesting backoff, Retry-After and attempt limits...")
+    policy = destigmatizer.RetryPolicy(base_delay=0.01, max_delay=0.05,
+                                       budget=destigmatizer.RetryBudget())
+    assert policy.delay(1, wrapped) == 0.05
+    assert 0 <= policy.delay(3) <= 0.04
+    calls = []
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise _SDKError(503)
+        return "ok"
+    assert policy.call(flaky, attempts=3) == "ok" and len(calls) == 3
+
+    print("\nTesting that fatal errors are not retried...")
+    calls.clear()
+    def bad_request():
+        calls.append(1)
+        raise _SDKError(400)
+    try:
+        policy.call(bad_request, attempts=5)
+        assert False, "Expected the fatal error"
+    except _SDKError:
+        pass
+    assert len(calls) == 1
+
+    print("\nTesting the retry budget...")
+    tight = destigmatizer.RetryPolicy(base_delay=0, budget=destigmatizer.RetryBudget(
+        ratio=0, min_per_second=0, max_balance=2))
+    calls.clear()
+    def always_down():
+        calls.append(1)
+        raise _SDKError(503)
+    for _ in range(3):
+        try:
+            tight.call(always_down, attempts=3)
+        except _SDKError:
+            pass
+    assert len(calls) == 5 and tight.budget.exhausted == 2
+
+    print("\nTesting status codes from a real SDK client...")
+    with FakeProviderServer(error_rate=1.0, error_status=400) as server:
+        client = destigmatizer.get_client("openai", "offline", base_url=server.openai_base_url)
+        classifier = destigmatizer.DrugClassifier(client)
+        start = time.monotonic()
+        assert classifier.classify("smoking weed", retries=3) == "skipped"
+        assert time.monotonic() - start < 2 and server.requests == 1
+    print("✓ Transient errors were retried with backoff and fatal errors failed fast")
+
+
+if __name__ == "__main__":
+    test_retry()
@@ -0,0 +1,110 @@
+import asyncio
+import contextlib
+import io
+import threading
+import time
+
+import destigmatizer
+
+from destigmatizer.tests.utils import FakeClient
+
+
+class _SlowClient(FakeClient):
+    """Fake client whose every request takes the same time."""
+
+    delay = 0.1
+
+    def create_completion(self, messages, model=None, temperature=0, max_tokens=1000, stop=None):
+        time.sleep(self.delay)
+        return super().create_completion(messages, model, temperature, max_tokens, stop)
+
+    async def acreate_completion(self, messages, model=None, temperature=0, max_tokens=1000,
+                                 stop=None):
+        await asyncio.sleep(self.delay)
+        return FakeClient.create_completion(self, messages, model, temperature, max_tokens, stop)
+
+
+class _SlowStyle:
+    """Style analyzer taking as long as one request, without NLTK data."""
+
+    def __init__(self):
+        self.threads = []
+
+    def analyze(self, text):
+        self.threads.append(threading.current_thread().name)
+        time.sleep(_SlowClient.delay)
+        return {"tone": "negative"}
+
+
+def _pipeline(client, **options):
+    pipeline = destigmatizer.Pipeline(client, **options)
+    pipeline.analyzer.style_analyzer = _SlowStyle()
+    return pipeline
+
+
+def test_stage_overlap():
+    """
+    Test that independent stages overlap and speculative results are discarded.
+    """
+    post = "The junkies downtown should all be locked up."
+    print("\nTesting style and emotion overlap...")
+    events = []
+    instrumentation = destigmatizer.Instrumentation(callbacks=[events.append])
+    pipeline = _pipeline(_SlowClient(), instrumentation=instrumentation)
+    start = time.perf_counter()
+    record = pipeline.process(post)
+    sequential = time.perf_counter() - start
+    assert record["style"] == {"tone": "negative", "top_emotions": "anger"}
+    assert pipeline.analyzer.style_analyzer.threads[0].startswith("destigmatizer-stage")
+    # Drug, stigma, emotion alongside style, and two rewrite passes
+    assert sequential < 5.8 * _SlowClient.delay
+    stages = {event.stage for event in events}
+    assert {"style", "emotion"} <= stages
+
+    print("\nTesting speculative stigma classification...")
+    client = _SlowClient()
+    pipeline = _pipeline(client, speculative=True)
+    start = time.perf_counter()
+    assert pipeline.process(post)["stigma"].startswith("s")
+    assert time.perf_counter() - start < sequential - 0.5 * _SlowClient.delay
+    client.calls = 0
+    record = pipeline.process("Went hiking with my dog this weekend.")
+    assert record["drug"] == "nd" and record["stigma"] is None
+    record = asyncio.run(pipeline.aprocess("Went hiking with my dog this weekend."))
+    assert record["stigma"] is None
+    record = asyncio.run(pipeline.aprocess(post))
+    assert record["stigma"].startswith("s") and "people who use drugs" in record["output"]
+
+    print("\nTesting that prefiltered posts are not speculated on...")
+    client = _SlowClient()
+    pipeline = _pipeline(client, speculative=True, verbose=True,
+                         prefilter=destigmatizer.LexiconPrefilter())
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        assert pipeline.process("Went hiking with my dog this weekend.")["drug"] == "nd"
+    assert "speculative" not in log.getvalue()
+    started = []
+    aclassify = pipeline.stigma_classifier.aclassify
+    def spy(*args, **kwargs):
+        started.append(args)
+        return aclassify(*args, **kwargs)
+    pipeline.stigma_classifier.aclassify = spy
+    assert asyncio.run(pipeline.aprocess("Made pancakes for the kids."))["drug"] == "nd"
+    assert started == [] and client.calls == 0
+
+    print("\nTesting prefilter statistics are unchanged by speculation...")
+    posts = ["Went hiking with my dog this weekend.", "I smoke weed to relax after work."]
+    reports = []
+    for speculative in (False, True):
+        prefilter = destigmatizer.LexiconPrefilter()
+        pipeline = _pipeline(FakeClient(), speculative=speculative, prefilter=prefilter)
+        for text in posts:
+            pipeline.process(text)
+            asyncio.run(pipeline.aprocess(text))
+        reports.append(prefilter.report())
+    assert reports[0] == reports[1] and reports[1]["checked"] == 4
+    print("✓ Independent stages ran concurrently")
+
+
+if __name__ == "__main__":
+    test_stage_overlap()
@@ -0,0 +1,30 @@
+from destigmatizer.analyzers import style_features
+
+
+def test_style_features():
+    """
+    Test single-pass style feature extraction on pre-tagged sentences.
+    """
+    text = "The house was sold. Why?! He ran, fast."
+    sentences = ["The house was sold.", "Why?!", "He ran, fast."]
+    tagged = [
+        [("The", "DT"), ("house", "NN"), ("was", "VBD"), ("sold", "VBN"), (".", ".")],
+        [("Why", "WRB"), ("?", "."), ("!", ".")],
+        [("He", "PRP"), ("ran", "VBD"), (",", ","), ("fast", "RB"), (".", ".")],
+    ]
+
+    print("\nTesting style features...")
+    result = style_features(text, sentences, tagged)
+    assert result["punctuation_usage"] == "moderate, with !, ,, ., ? being most frequent"
+    assert result["passive_voice_usage"] == "some"
+    assert result["sentence_length_variation"] == (
+        "ranging from short (1 words) to long (4 words) with an average of 2.7 words per sentence"
+    )
+
+    result = style_features("He ran.", ["He ran."], [[("He", "PRP"), ("ran", "VBD"), (".", ".")]])
+    assert result["passive_voice_usage"] == "none"
+    print(f"Style features: {result}")
+
+
+if __name__ == "__main__":
+    test_style_features()
@@ -1,13 +1,92 @@
 """Common utilities for tests."""
 
 import os
+import re
 import sys
 import argparse
-from typing import Optional, Tuple, Any
+import threading
+from typing import Optional, Tuple, Any, List, Dict
 
+from destigmatizer.clients import LLMClient
 from destigmatizer.utils import load_api_key, get_default_model, get_api_key_with_fallbacks
 
 
+class FakeClient(LLMClient):
+    """Offline stand-in for an LLM client that returns canned responses.
+    
+    Responses are chosen from the system prompt of each request, so the
+    classifiers, analyzers and rewriter can be exercised without an API key.
+    """
+    
+    def __init__(self, fail_on: Optional[str] = None):
+        """Initialize the fake client.
+        
+        Args:
+            fail_on: Raise an error for any user message containing this string
+        """
+        self.fail_on = fail_on
+        self.calls = 0
+        self.requests: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+    
+    @property
+    def client_type(self) -> str:
+        """Return the type of this client."""
+        return "openai"
+    
+    def create_completion(self, 
+                         messages: List[Dict[str, str]], 
+                         model: Optional[str] = None, 
+                         temperature: float = 0, 
+                         max_tokens: int = 1000,
+                         stop: Optional[List[str]] = None) -> str:
+        """Return a canned completion for the given messages."""
+        with self._lock:
+            self.calls += 1
+            self.requests.append({"system": messages[0]["content"], "model": model,
+                                  "temperature": temperature, "max_tokens": max_tokens,
+                                  "stop": stop})
+        system = messages[0]["content"]
+        text = messages[-1]["content"]
+        if self.fail_on and self.fail_on in text:
+            raise Exception("Fake provider error")
+        if "several posts at once" in system:
+            system = system.split("**Multiple posts:**", 1)[0]
+            return "\n".join(f"[{number}] {self._answer(system, post)}"
+                             for number, post in re.findall(r"^\[(\d+)\] (.*)$", text, re.MULTILINE))
+        return self._answer(system, text)
+
+    @staticmethod
+    def _answer(system: str, text: str) -> str:
+        """Return the canned answer for a single post."""
+        if "two steps and answer with a single JSON object" in system:
+            if "junk" in text.lower():
+                return ('{"drug": "D", "stigma": "S", "explanation": {"labeling": "\'junkies\'", '
+                        '"stereotyping": "blames people", "separation": "us vs them", '
+                        '"discrimination": "exclusion"}}')
+            if "weed" in text.lower():
+                return '{"drug": "D", "stigma": "NS", "explanation": {}}'
+            return '{"drug": "ND", "stigma": null, "explanation": {}}'
+        if "Labeling Drug References" in system:
+            return "D" if "junk" in text.lower() or "weed" in text.lower() else "ND"
+        if "identifying stigma" in system:
+            if "junk" in text.lower():
+                return "S, Labeling: 'junkies', Stereotyping: blames people, Separation: us vs them, Discrimination: exclusion"
+            return "NS"
+        if "emotion recognition" in system:
+            return "anger"
+        return "people who use drugs are causing problems"
+    
+    async def acreate_completion(self, 
+                                messages: List[Dict[str, str]], 
+                                model: Optional[str] = None, 
+                                temperature: float = 0, 
+                                max_tokens: int = 1000,
+                                stop: Optional[List[str]] = None) -> str:
+        """Return a canned completion without blocking the event loop."""
+        return self.create_completion(messages, model, temperature, max_tokens, stop)
+
+
 def get_api_key_for_testing(api_key: Optional[str] = None, client_type: str = "openai") -> str:
     """
     Get API key for testing from parameter, environment variables, or secrets file.
@@ -3,7 +3,8 @@
 import os
 import json
 import time
-from typing import Dict, Any, Optional, Tuple, Union
+import threading
+from typing import Dict, Any, List, Optional, Tuple, Union
 
 
 def load_api_key(client_type: str) -> Optional[str]:
@@ -156,6 +157,10 @@ def retry_with_backoff(func, max_retries: int = 3, initial_wait: float = 1.0,
     """
     Execute a function with exponential backoff retry logic.
     
+    Uses RetryPolicy, so fatal errors (e.g. HTTP 400) are raised at once,
+    delays are jittered, Retry-After hints are honored and retries draw
+    from the shared retry budget.
+    
     Args:
         func: Function to execute
         max_retries: Maximum number of retries
@@ -169,22 +174,9 @@ def retry_with_backoff(func, max_retries: int = 3, initial_wait: float = 1.0,
     Raises:
         Exception: Last exception encountered if all retries fail
     """
-    wait_time = initial_wait
-    last_exception = None
-    
-    for attempt in range(max_retries + 1):
-        try:
-            return func(**kwargs)
-        except Exception as e:
-            last_exception = e
-            if attempt == max_retries:
-                break
-                
-            print(f"Attempt {attempt + 1} failed: {e}, retrying in {wait_time:.1f}s...")
-            time.sleep(wait_time)
-            wait_time *= backoff_factor
-    
-    raise last_exception
+    from .retry import RetryPolicy
+    policy = RetryPolicy(base_delay=initial_wait, multiplier=backoff_factor)
+    return policy.call(lambda: func(**kwargs), attempts=max_retries + 1)
 
 
 def get_api_key_with_fallbacks(api_key: Optional[str] = None, client_type: Optional[str] = None) -> Tuple[str, str]:
@@ -260,18 +252,17 @@ def identify_client(client: Any) -> str:
     
     return "unknown"
 
-def load_user_model_configs() -> Dict[str, Any]:
+# In-process cache of the user configuration, see load_user_model_configs()
+_config_cache: Dict[str, Any] = {"key": None, "path": None, "mtime": None, "config": {}}
+_config_lock = threading.Lock()
+
+
+def _config_locations() -> List[str]:
     """
-    Load user configuration from standard locations.
-    
-    Checks multiple locations in this order:
-    1. Environment variable REFRAME_CONFIG_PATH
-    2. User's home directory ~/.reframe/config.json
-    3. Current working directory reframe_config.json or config/reframe_config.json
-    4. Package directory
+    Return the candidate configuration file locations in priority order.
     
     Returns:
-        dict: Configuration dictionary, empty dict if no config found
+        list: Candidate paths (entries may be None)
     """
     # Standard locations to check
     locations = [
@@ -293,13 +284,164 @@ def load_user_model_configs() -> Dict[str, Any]:
     except Exception:
         pass
     
-    # Try each location
-    for location in locations:
+    return locations
+
+
+def _file_mtime(path: str) -> Optional[Tuple[int, int]]:
+    """Return a file's (mtime in nanoseconds, size), None if missing.
+    
+    The size is included so an edit within the filesystem's timestamp
+    granularity is still noticed.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_user_model_configs() -> Tuple[Dict[str, Any], Optional[str], Optional[Tuple[int, int]]]:
+    """
+    Scan the standard locations and parse the first valid configuration file.
+    
+    Returns:
+        tuple: (config, path, mtime), with path and mtime None if no config found
+    """
+    for location in _config_locations():
         if location and os.path.exists(location):
             try:
+                mtime = _file_mtime(location)
                 with open(location, 'r') as f:
-                    return json.load(f)
+                    return json.load(f), location, mtime
             except (json.JSONDecodeError, PermissionError):
                 continue
     
-    return {}
\ No newline at end of file
+    return {}, None, None
+
+
+def load_user_model_configs() -> Dict[str, Any]:
+    """
+    Load user configuration from standard locations.
+    
+    Checks multiple locations in this order:
+    1. Environment variable REFRAME_CONFIG_PATH
+    2. User's home directory ~/.reframe/config.json
+    3. Current working directory reframe_config.json or config/reframe_config.json
+    4. Package directory
+    
+    The result is cached in-process. Later calls only stat the file that was
+    loaded and re-read it when its modification time changes; use
+    reload_config() to pick up a config file created in a new location.
+    The returned dictionary is shared and should not be modified.
+    
+    Returns:
+        dict: Configuration dictionary, empty dict if no config found
+    """
+    key = (os.environ.get("REFRAME_CONFIG_PATH"), os.getcwd())
+    with _config_lock:
+        if _config_cache["key"] == key:
+            path = _config_cache["path"]
+            if path is None or _file_mtime(path) == _config_cache["mtime"]:
+                return _config_cache["config"]
+        
+        config, path, mtime = _read_user_model_configs()
+        _config_cache.update(key=key, path=path, mtime=mtime, config=config)
+        return config
+
+
+def reload_config() -> Dict[str, Any]:
+    """
+    Discard the cached configuration and load it again from disk.
+    
+    Returns:
+        dict: Configuration dictionary, empty dict if no config found
+    """
+    with _config_lock:
+        _config_cache.update(key=None, path=None, mtime=None, config={})
+    return load_user_model_configs()
+
+
+# Generation settings for each pipeline stage, before any user config. The
+# classification labels are a few tokens long, so tight max_tokens values
+# bound latency and cost even when a model starts to explain itself.
+DEFAULT_STAGE_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "drug_classification": {"temperature": 0, "max_tokens": 5, "stop": ["\n"]},
+    "stigma_classification": {"temperature": 0, "max_tokens": 300, "stop": None},
+    "combined_classification": {"temperature": 0, "max_tokens": 400, "stop": None},
+    "emotion": {"temperature": 0, "max_tokens": 10, "stop": ["\n"]},
+    "rewrite_pass_1": {"temperature": 0, "max_tokens": 1000, "stop": None},
+    "rewrite_pass_2": {"temperature": 0, "max_tokens": 1000, "stop": None},
+}
+
+GENERATION_FIELDS = ("model_name", "temperature", "max_tokens", "stop")
+
+
+def get_generation_settings(stage: str, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Resolve the generation settings for a pipeline stage.
+    
+    Built-in defaults are overridden by the "stage_configs" config section,
+    which maps stage names to either the name of an entry in "named_configs"
+    or an inline dictionary. An inline dictionary may name a base entry
+    under "config" and override individual fields. Only model_name,
+    temperature, max_tokens and stop are used.
+    
+    Example:
+        "stage_configs": {
+            "drug_classification": "low_quality",
+            "rewrite_pass_2": {"config": "creative", "max_tokens": 800}
+        }
+    
+    Args:
+        stage: Stage name, e.g. "drug_classification" or "rewrite_pass_1"
+        config: Configuration dictionary, loaded from the standard locations if None
+        
+    Returns:
+        dict: "model_name" (None to use the caller's model), "temperature",
+            "max_tokens" and "stop"
+    """
+    if config is None:
+        config = load_user_model_configs()
+    settings: Dict[str, Any] = {"model_name": None, "temperature": 0, "max_tokens": 1000, "stop": None}
+    settings.update(DEFAULT_STAGE_SETTINGS.get(stage, {}))
+    
+    entry = config.get("stage_configs", {}).get(stage)
+    named_configs = config.get("named_configs", {})
+    if isinstance(entry, str):
+        entry = {"config": entry}
+    if isinstance(entry, dict):
+        base_name = entry.get("config")
+        if base_name is not None:
+            if base_name not in named_configs:
+                print(f"Warning: stage '{stage}' refers to unknown named config '{base_name}'")
+            base = named_configs.get(base_name, {})
+            settings.update({k: base[k] for k in GENERATION_FIELDS if k in base})
+        settings.update({k: entry[k] for k in GENERATION_FIELDS if k in entry})
+    
+    if isinstance(settings["stop"], str):
+        settings["stop"] = [settings["stop"]]
+    return settings
+
+
+def generation_kwargs(settings: Dict[str, Any], model: Optional[str], client: Any) -> Dict[str, Any]:
+    """
+    Build the create_completion() keyword arguments for a stage.
+    
+    Args:
+        settings: Stage settings from get_generation_settings()
+        model: Model requested by the caller; the stage's model_name is
+            only used when this is None
+        client: LLM client the request is sent to, used to map generic
+            model names such as "small"
+        
+    Returns:
+        dict: "model", "temperature", "max_tokens" and "stop"
+    """
+    if model is None and settings.get("model_name"):
+        model = get_model_mapping(settings["model_name"], identify_client(client))
+    return {
+        "model": model,
+        "temperature": settings["temperature"],
+        "max_tokens": settings["max_tokens"],
+        "stop": settings["stop"],
+    }